@@ -0,0 +1,166 @@
+from decimal import ROUND_HALF_UP
+from operator import itemgetter
+
+from django.utils import timezone
+
+from stocks.models import CENT
+
+
+def decimal_to_string(value):
+    """Entspricht `serializers.DecimalField(decimal_places=2)` mit `COERCE_DECIMAL_TO_STRING`."""
+    return None if value is None else f"{value:.2f}"
+
+
+def datetime_to_string(value):
+    """Entspricht `serializers.DateTimeField` im ISO-8601-Format in der aktuellen Zeitzone."""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+class Computed:
+    """Ein berechnetes Feld: `function` erhält die Werte der `lookups` in dieser Reihenfolge."""
+
+    def __init__(self, function, *lookups):
+        self.function = function
+        self.lookups = lookups
+
+
+class FastSerializer:
+    """
+    Baut Antwort-Dicts direkt aus `.values()`-Zeilen, ohne Model-Instanzen und DRF-Felder.
+
+    `fields` ordnet jedem Ausgabefeld (in Ausgabereihenfolge) eine Quelle zu:
+
+    - ein Lookup, dessen Wert unverändert übernommen wird,
+    - ein Tupel `(lookup, umwandlung)`,
+    - ein `Computed` für Felder, die aus mehreren Werten berechnet werden,
+    - eine FastSerializer-Klasse für verschachtelte Objekte, deren Lookups den Feldnamen als
+      Präfix erhalten.
+
+    Die Zugriffsfunktionen werden einmal beim Erstellen vorbereitet. Die Ausgabe muss der des
+    entsprechenden ModelSerializers gleichen, das prüfen die Tests.
+    """
+
+    fields = {}
+
+    def __init__(self, prefix=""):
+        lookups = []
+        self.getters = []
+        for name, source in self.fields.items():
+            if isinstance(source, type) and issubclass(source, FastSerializer):
+                nested = source(prefix=f"{prefix}{name}__")
+                lookups += nested.lookups
+                getter = nested.to_representation
+            elif isinstance(source, Computed):
+                keys = [prefix + lookup for lookup in source.lookups]
+                lookups += keys
+                getter = self._computed_getter(source.function, keys)
+            else:
+                lookup, convert = (source, None) if isinstance(source, str) else source
+                key = prefix + lookup
+                lookups.append(key)
+                getter = self._field_getter(key, convert)
+            self.getters.append((name, getter))
+        self.lookups = list(dict.fromkeys(lookups))
+
+    @staticmethod
+    def _field_getter(key, convert):
+        if convert is None:
+            return itemgetter(key)
+        return lambda row: convert(row[key])
+
+    @staticmethod
+    def _computed_getter(function, keys):
+        return lambda row: function(*[row[key] for key in keys])
+
+    def values(self, queryset):
+        """Gibt die QuerySet als `.values()` mit genau den benötigten Spalten zurück."""
+        return queryset.values(*self.lookups)
+
+    def to_representation(self, row):
+        return {name: getter(row) for name, getter in self.getters}
+
+    def serialize(self, rows):
+        """Serialisiert Zeilen aus `values`, z.B. eine Seite der Pagination."""
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+def total_price(transaction_type, amount, price, fee):
+    """Entspricht `Transaction.get_total_price`."""
+    return amount * price + (fee if transaction_type == "buy" else -fee)
+
+
+def average_cost(amount, total_invested):
+    """Entspricht `StockHolding.average_cost`, als String wie der DecimalField."""
+    if not amount:
+        return "0.00"
+    return decimal_to_string((total_invested / amount).quantize(CENT, ROUND_HALF_UP))
+
+
+def unrealized_profit(amount, current_price, total_invested):
+    """Entspricht `StockHolding.get_unrealized_profit`, als String wie der DecimalField."""
+    return decimal_to_string(amount * current_price - total_invested)
+
+
+class StockInfoFastSerializer(FastSerializer):
+    """Schnelle Variante des `StockInfoSerializer`."""
+
+    fields = {
+        "id": "id",
+        "name": "name",
+        "ticker": "ticker",
+        "current_price": ("current_price", decimal_to_string),
+    }
+
+
+class WatchlistFastSerializer(FastSerializer):
+    """Schnelle Variante des `WatchlistSerializer`."""
+
+    fields = {
+        "id": "id",
+        "stock": StockInfoFastSerializer,
+        "note": "note",
+        "date": ("date", datetime_to_string),
+    }
+
+
+class StockHoldingFastSerializer(FastSerializer):
+    """Schnelle Variante des `StockHoldingSerializer`."""
+
+    fields = {
+        "id": "id",
+        "stock": StockInfoFastSerializer,
+        "amount": "amount",
+        "average_cost": Computed(average_cost, "amount", "total_invested"),
+        "total_invested": ("total_invested", decimal_to_string),
+        "realized_profit": ("realized_profit", decimal_to_string),
+        "unrealized_profit": Computed(
+            unrealized_profit, "amount", "stock__current_price", "total_invested"
+        ),
+    }
+
+
+class TransactionListFastSerializer(FastSerializer):
+    """Schnelle Variante des `TransactionListSerializer`."""
+
+    fields = {
+        "id": "id",
+        "stock": StockInfoFastSerializer,
+        "status": "status",
+        "transaction_type": "transaction_type",
+        "order_type": "order_type",
+        "trigger_price": ("trigger_price", decimal_to_string),
+        "amount": "amount",
+        "price": ("price", decimal_to_string),
+        "fee": ("fee", decimal_to_string),
+        "total_price": Computed(
+            total_price, "transaction_type", "amount", "price", "fee"
+        ),
+        "description": "description",
+        "date": ("date", datetime_to_string),
+    }
@@ -0,0 +1,125 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import views
+from api.renderers import ORJSONRenderer
+from stocks.models import History, Stock, StockHolding, Team, Transaction, Watchlist
+
+BENCHMARK_NAME = "benchmark"
+HISTORY_LENGTH = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the responses of the main endpoints with DRF's JSONRenderer and with the "
+        "orjson renderer and reports the encoding time of both. The benchmark data is created "
+        "in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stocks", type=int, default=100)
+        parser.add_argument("--transactions", type=int, default=10000)
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Renders per endpoint."
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.benchmark(options)
+            transaction.set_rollback(True)
+
+    def benchmark(self, options):
+        user = self.create_data(options["stocks"], options["transactions"])
+        stock = Stock.objects.filter(name__startswith=BENCHMARK_NAME).first()
+        endpoints = [
+            ("stock detail", views.StockDetailView, {"pk": stock.pk}, {}),
+            ("team", views.TeamDetailView, {}, {}),
+            ("transactions", views.TransactionListView, {}, {}),
+            ("holdings", views.StockHoldingListView, {}, {}),
+            ("watchlist", views.WatchlistListView, {}, {}),
+            ("analysis", views.AnalysisView, {}, {}),
+            ("search", views.SearchStocksView, {}, {"q": BENCHMARK_NAME}),
+        ]
+
+        factory = APIRequestFactory()
+        renderers = [("drf", JSONRenderer()), ("orjson", ORJSONRenderer())]
+        for name, view, kwargs, params in endpoints:
+            request = factory.get("/", params)
+            force_authenticate(request, user=user)
+            data = view.as_view()(request, **kwargs).data
+
+            timings = {}
+            for renderer_name, renderer in renderers:
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    body = renderer.render(data)
+                timings[renderer_name] = (time.perf_counter() - start) / options[
+                    "repeat"
+                ]
+
+            self.stdout.write(
+                f"{name:>13} {len(body):>9} bytes: drf {timings['drf'] * 1000:.2f}ms, "
+                f"orjson {timings['orjson'] * 1000:.2f}ms "
+                f"({timings['drf'] / timings['orjson']:.1f}x)"
+            )
+
+    def create_data(self, stock_count, transaction_count):
+        team = Team.objects.create(
+            name=BENCHMARK_NAME,
+            portfolio_history=[
+                100000 + random.uniform(-5000, 5000) for _ in range(HISTORY_LENGTH)
+            ],
+        )
+        user = get_user_model().objects.create_user(username=f"{BENCHMARK_NAME}-user")
+        user.profile.team = team
+        user.profile.save()
+
+        stocks = Stock.objects.bulk_create(
+            Stock(
+                name=f"{BENCHMARK_NAME} {i}",
+                ticker=f"B{i}",
+                current_price=Decimal("10.00") + i,
+            )
+            for i in range(stock_count)
+        )
+        History.objects.bulk_create(
+            History(
+                stock=stock,
+                name=name,
+                period=period,
+                interval=interval,
+                values=[random.uniform(5, 500) for _ in range(HISTORY_LENGTH)],
+            )
+            for stock in stocks
+            for name, period, interval in [("Day", "1d", "5m"), ("Year", "1y", "1wk")]
+        )
+        StockHolding.objects.bulk_create(
+            StockHolding(team=team, stock=stock, amount=10, total_invested=Decimal(99))
+            for stock in stocks
+        )
+        Watchlist.objects.bulk_create(
+            Watchlist(team=team, stock=stock, note="") for stock in stocks
+        )
+        Transaction.objects.bulk_create(
+            (
+                Transaction(
+                    team=team,
+                    stock=stocks[i % len(stocks)],
+                    status="closed",
+                    transaction_type="buy",
+                    amount=1,
+                    price=Decimal("9.90"),
+                    fee=Decimal("15.00"),
+                )
+                for i in range(transaction_count)
+            ),
+            batch_size=2000,
+        )
+        return user
@@ -0,0 +1,133 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.fast_serializers import (
+    StockHoldingFastSerializer,
+    StockInfoFastSerializer,
+    TransactionListFastSerializer,
+    WatchlistFastSerializer,
+)
+from api.serializers import (
+    StockHoldingSerializer,
+    StockInfoSerializer,
+    TransactionListSerializer,
+    WatchlistSerializer,
+)
+from stocks.models import Stock, StockHolding, Team, Transaction, Watchlist
+
+BENCHMARK_NAME = "benchmark"
+STOCKS_PER_TEAM = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Serializes lists of transactions, holdings, watchlist entries and stocks with the "
+        "ModelSerializers and with the fast `.values()` serializers and reports both timings. "
+        "The benchmark data is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[1000, 10000, 100000]
+        )
+
+    def handle(self, *args, **options):
+        for rows in options["rows"]:
+            with transaction.atomic():
+                self.benchmark(rows)
+                transaction.set_rollback(True)
+
+    def benchmark(self, rows):
+        stocks = Stock.objects.bulk_create(
+            Stock(
+                name=f"{BENCHMARK_NAME} {i}",
+                ticker=f"B{i}",
+                current_price=Decimal("10.00") + i % 100,
+            )
+            for i in range(min(rows, STOCKS_PER_TEAM))
+        )
+        teams = Team.objects.bulk_create(
+            Team(name=BENCHMARK_NAME, code=f"b{i:07d}")
+            for i in range(-(-rows // len(stocks)))
+        )
+        pairs = [(team, stock) for team in teams for stock in stocks][:rows]
+        StockHolding.objects.bulk_create(
+            (
+                StockHolding(
+                    team=team,
+                    stock=stock,
+                    amount=7,
+                    total_invested=Decimal("71.15"),
+                    realized_profit=Decimal("-1.20"),
+                )
+                for team, stock in pairs
+            ),
+            batch_size=2000,
+        )
+        Watchlist.objects.bulk_create(
+            (Watchlist(team=team, stock=stock, note="") for team, stock in pairs),
+            batch_size=2000,
+        )
+        Transaction.objects.bulk_create(
+            (
+                Transaction(
+                    team=team,
+                    stock=stock,
+                    status="closed",
+                    transaction_type="buy",
+                    amount=3,
+                    price=stock.current_price,
+                    fee=Decimal("15.00"),
+                )
+                for team, stock in pairs
+            ),
+            batch_size=2000,
+        )
+
+        team_ids = [team.pk for team in teams]
+        cases = [
+            (
+                "transactions",
+                TransactionListSerializer,
+                TransactionListFastSerializer(),
+                Transaction.objects.filter(team_id__in=team_ids).select_related(
+                    "stock"
+                ),
+            ),
+            (
+                "holdings",
+                StockHoldingSerializer,
+                StockHoldingFastSerializer(),
+                StockHolding.objects.filter(team_id__in=team_ids).select_related(
+                    "stock"
+                ),
+            ),
+            (
+                "watchlist",
+                WatchlistSerializer,
+                WatchlistFastSerializer(),
+                Watchlist.objects.filter(team_id__in=team_ids).select_related("stock"),
+            ),
+            (
+                "stocks",
+                StockInfoSerializer,
+                StockInfoFastSerializer(),
+                Stock.objects.filter(name__startswith=BENCHMARK_NAME),
+            ),
+        ]
+        for name, serializer_class, fast_serializer, queryset in cases:
+            start = time.perf_counter()
+            count = len(serializer_class(queryset.all(), many=True).data)
+            serializer_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            fast_serializer.serialize(fast_serializer.values(queryset.all()))
+            fast_time = time.perf_counter() - start
+
+            self.stdout.write(
+                f"{name:>12} {count:>7} rows: serializer {serializer_time:.3f}s, "
+                f"fast {fast_time:.3f}s ({serializer_time / fast_time:.1f}x)"
+            )
@@ -0,0 +1,167 @@
+import orjson
+from django.db import IntegrityError, transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from stocks.cache import get_or_compute
+from stocks.idempotency import HEADER, get_expiry_cutoff, get_stored_response
+from stocks.models import IdempotencyKey
+from stocks.versions import get_versions
+
+from .renderers import ORJSONRenderer
+
+
+class ConditionalGetMixin:
+    """
+    Beantwortet bedingte GET-Anfragen (If-None-Match / If-Modified-Since) anhand von Versionszählern.
+
+    Die Versionen werden vor dem eigentlichen `get` geladen, sodass bei einem 304 weder Serializer
+    noch Portfolio-Aggregationen ausgeführt werden. Mit `cache_responses` werden die Antwortdaten
+    zusätzlich unter denselben Versionen im Cache abgelegt.
+    """
+
+    etag_prefix = None
+    cache_responses = False
+
+    def get_version_keys(self):
+        """Gibt die Versionsschlüssel zurück, von denen die Antwort abhängt, oder None für keine Validatoren."""
+        raise NotImplementedError
+
+    def get_etag_parts(self):
+        """Zusätzliche Bestandteile des ETags, z.B. der Primärschlüssel des Objekts."""
+        return []
+
+    def get_cache_control(self):
+        """Die Cache-Control-Direktiven; standardmäßig darf nur der Client speichern und muss prüfen."""
+        return {"private": True, "no_cache": True}
+
+    def get_validators(self):
+        keys = self.version_keys = self.get_version_keys()
+        if keys is None:
+            return None, None
+
+        self.versions = versions = get_versions(*keys)
+        parts = [self.etag_prefix, *self.get_etag_parts()]
+        parts += [versions[key][0] for key in keys]
+        tag = "-".join(str(part) for part in parts)
+        etag = f'W/"{tag}"'
+
+        timestamps = [updated_at for _, updated_at in versions.values() if updated_at]
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        response = None
+        if etag is not None:
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+        if response is None:
+            response = self.get_response(request, *args, **kwargs)
+
+        if etag is not None and response.status_code in (200, 304):
+            response.headers["ETag"] = etag
+            if last_modified is not None:
+                response.headers["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, **self.get_cache_control())
+        return response
+
+    def get_response(self, request, *args, **kwargs):
+        """Führt das eigentliche `get` aus, mit `cache_responses` nur bei einem Cache-Miss."""
+        get = super().get
+        if not self.cache_responses or self.version_keys is None:
+            return get(request, *args, **kwargs)
+        data = get_or_compute(
+            self.etag_prefix,
+            self.version_keys,
+            lambda: get(request, *args, **kwargs).data,
+            parts=self.get_etag_parts(),
+            versions=self.versions,
+        )
+        return Response(data)
+
+
+class IdempotentPostMixin:
+    """
+    Speichert erfolgreiche POST-Antworten unter dem `Idempotency-Key`-Header des Clients.
+
+    Eine Wiederholung mit demselben Schlüssel liefert die gespeicherte Antwort, ohne die Anfrage
+    erneut zu validieren oder auszuführen. Anfrage und Schlüssel werden in derselben
+    Datenbanktransaktion geschrieben, sodass auch eine vom RetryOnOperationalErrorMiddleware
+    wiederholte Anfrage keine doppelten Trades erzeugt.
+    """
+
+    def get_idempotent_transaction(self):
+        """Die von der Anfrage erzeugte Transaktion, die mit dem Schlüssel gespeichert wird."""
+        return None
+
+    def handle_post(self, request, *args, **kwargs):
+        """Führt die eigentliche Anfrage aus; Views ohne eigenes `post` überschreiben diese Methode."""
+        return super().post(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return self.handle_post(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            return Response(
+                {"detail": f"Der {HEADER}-Header ist zu lang."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stored = get_stored_response(request.user, key)
+        if stored is not None:
+            if stored.created_at >= get_expiry_cutoff():
+                return self.replay(stored)
+            stored.delete()
+
+        try:
+            with transaction.atomic():
+                response = self.handle_post(request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key,
+                        transaction=self.get_idempotent_transaction(),
+                        status_code=response.status_code,
+                        # Gespeichert wird die ausgelieferte Darstellung, damit eine Wiederholung
+                        # z.B. Decimals ebenfalls als Zahlen enthält.
+                        response=orjson.loads(ORJSONRenderer().render(response.data)),
+                    )
+        except IntegrityError:
+            # A concurrent request with the same key committed first; its trade wins.
+            stored = get_stored_response(request.user, key)
+            if stored is None:
+                raise
+            return self.replay(stored)
+        return response
+
+    def replay(self, stored):
+        response = Response(stored.response, status=stored.status_code)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+
+class FastListMixin:
+    """
+    Listet über `fast_serializer_class` direkt aus `.values()`-Zeilen statt über Model-Instanzen.
+
+    Views aktivieren den schnellen Pfad, indem sie einen FastSerializer angeben. Filter und
+    Pagination arbeiten auf den Zeilen; `serializer_class` bleibt für alles andere zuständig.
+    """
+
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.fast_serializer_class()
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
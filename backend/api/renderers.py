@@ -0,0 +1,42 @@
+import datetime
+import decimal
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Datumswerte und UUIDs kodiert orjson selbst, im selben Format wie der `JSONEncoder` von DRF.
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+_fallback = JSONEncoder().default
+
+
+def default(obj):
+    """Wandelt Werte um, die orjson nicht selbst kodiert, genau wie der `JSONEncoder` von DRF."""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    return _fallback(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer auf Basis von orjson mit derselben Ausgabe wie der Renderer von DRF.
+
+    Nur eingerückte Ausgabe (z.B. in der Browsable API) wird weiterhin von DRF erzeugt, da
+    orjson nur zwei Leerzeichen Einrückung kennt.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=default, option=OPTIONS)
+        # Wie bei DRF werden U+2028 und U+2029 escaped, damit die Ausgabe gültiges JavaScript ist.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
@@ -1,7 +1,10 @@
 from datetime import timedelta
+from decimal import Decimal
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
@@ -12,11 +15,14 @@ from stocks.models import (
     RegistrationRequest,
     Stock,
     StockHolding,
+    StockStats,
     Team,
     Transaction,
     UserProfile,
     Watchlist,
 )
+from stocks.price_store import get_price_store
+from stocks.services import execute_transaction
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -53,22 +59,44 @@ class RegistrationRequestSerializer(serializers.ModelSerializer):
 
 
 class HistorySerializer(serializers.ModelSerializer):
-    """Serializer für Aktienhistorie."""
+    """
+    Serializer für Aktienhistorie.
+
+    Die Kurse werden aus dem Price Store gelesen, den der Stock-Updater mit jedem Durchlauf
+    schreibt. Nur solange dort keine Matrix für den Zeitraum oder die Aktie existiert, werden die
+    in `History.values` gespeicherten Kurse verwendet.
+    """
 
     name = serializers.CharField(source="get_name_display")
+    values = serializers.SerializerMethodField()
 
     class Meta:
         model = History
         fields = ["id", "name", "values"]
         read_only_fields = fields
 
+    def get_values(self, obj):
+        values = get_price_store().history(obj.name, obj.stock.ticker)
+        return obj.values if values is None else values
+
+
+class StockStatsSerializer(serializers.ModelSerializer):
+    """Serializer für die technischen Kennzahlen einer Aktie."""
+
+    class Meta:
+        model = StockStats
+        exclude = ["stock"]
+        read_only_fields = [field.name for field in StockStats._meta.fields]
+
 
 class StockSerializer(serializers.ModelSerializer):
     """Serializer für Aktien."""
 
     history_entries = HistorySerializer(many=True, read_only=True)
-    amount = serializers.SerializerMethodField()
-    watchlist_id = serializers.SerializerMethodField()
+    stats = StockStatsSerializer(read_only=True)
+    # Werden von `StockDetailView` als Subqueries für das Team des Benutzers annotiert.
+    amount = serializers.IntegerField(read_only=True)
+    watchlist_id = serializers.IntegerField(read_only=True, allow_null=True)
 
     class Meta:
         model = Stock
@@ -78,26 +106,11 @@ class StockSerializer(serializers.ModelSerializer):
             "ticker",
             "current_price",
             "history_entries",
+            "stats",
             "amount",
             "watchlist_id",
         ]
 
-    def get_amount(self, obj):
-        team = self.context["request"].user.profile.team
-        try:
-            stock_holding = StockHolding.objects.get(team=team, stock=obj)
-            return stock_holding.amount
-        except StockHolding.DoesNotExist:
-            return 0
-
-    def get_watchlist_id(self, obj):
-        team = self.context["request"].user.profile.team
-        try:
-            watchlist_entry = Watchlist.objects.get(team=team, stock=obj)
-            return watchlist_entry.pk
-        except Watchlist.DoesNotExist:
-            return None
-
 
 class MemberSerializer(serializers.ModelSerializer):
     """Serializer für Team Members"""
@@ -112,12 +125,19 @@ class MemberSerializer(serializers.ModelSerializer):
 
 
 class TeamSerializer(serializers.ModelSerializer):
-    """Serializer für Teams."""
+    """
+    Serializer für Teams.
+
+    Mit `fields` lässt sich die Ausgabe auf einzelne Felder beschränken, z.B. um die lange
+    `portfolio_history` beim Polling des Dashboards auszulassen.
+    """
 
     members = MemberSerializer(many=True, read_only=True)
     portfolio_value = serializers.SerializerMethodField()
-    trades = serializers.SerializerMethodField()
-    admin = serializers.SerializerMethodField()
+    rank = serializers.IntegerField(source="get_rank", read_only=True)
+    admin = serializers.CharField(
+        source="team_admin.user.username", read_only=True, default=None
+    )
     is_admin = serializers.SerializerMethodField()
     edit_timeout = serializers.SerializerMethodField()
 
@@ -139,20 +159,17 @@ class TeamSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     def get_portfolio_value(self, obj):
         return obj.get_portfolio_value()
 
-    def get_trades(self, obj):
-        return Transaction.objects.filter(team=obj).count()
-
-    def get_admin(self, obj):
-        try:
-            return obj.team_admin.user.username
-        except AttributeError:
-            return None
-
     def get_is_admin(self, obj):
-        return self.context["request"].user.profile == obj.team_admin
+        return self.context["request"].user.profile.pk == obj.team_admin_id
 
     def get_edit_timeout(self, obj):
         return timedelta(minutes=30) - (timezone.now() - obj.last_edited)
@@ -202,15 +219,19 @@ class TeamUpdateSerializer(serializers.ModelSerializer):
         if new_admin:
             instance.team_admin = new_admin
 
+        if "name" in validated_data:
+            instance.name = validated_data["name"]
         instance.last_edited = timezone.now()
-        instance.save()
-        return super().update(instance, validated_data)
+        # Nur die bearbeiteten Felder schreiben, sonst würde ein zwischenzeitlich ausgeführter
+        # Trade mit dem zu Beginn der Anfrage geladenen `balance`, `trades` und `rank` überschrieben.
+        instance.save(update_fields=["name", "team_admin", "last_edited"])
+        return instance
 
 
 class TeamRankingSerializer(serializers.ModelSerializer):
     """Serializer für die Rangliste der Teams."""
 
-    total_balance = serializers.FloatField()
+    total_balance = serializers.SerializerMethodField()
     rank = serializers.IntegerField(read_only=True)
     members = MemberSerializer(many=True, read_only=True)
     stocks = serializers.SerializerMethodField()
@@ -219,6 +240,13 @@ class TeamRankingSerializer(serializers.ModelSerializer):
         model = Team
         fields = ("id", "name", "total_balance", "rank", "members", "stocks")
 
+    def get_total_balance(self, obj):
+        """Verwendet die Portfoliowerte aus dem Kontext, mit denen die Rangliste sortiert wurde."""
+        portfolio_values = self.context.get("portfolio_values", {})
+        if obj.pk in portfolio_values:
+            return float(portfolio_values[obj.pk])
+        return float(obj.total_balance)
+
     def get_stocks(self, obj):
         stocks = obj.holdings.filter(amount__gt=0)
         return [{"id": stock.stock.id, "name": stock.stock.name} for stock in stocks]
@@ -232,6 +260,15 @@ class StockInfoSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "ticker", "current_price"]
 
 
+class StockSearchSerializer(StockInfoSerializer):
+    """Serializer für Suchergebnisse inklusive der technischen Kennzahlen."""
+
+    stats = StockStatsSerializer(read_only=True)
+
+    class Meta(StockInfoSerializer.Meta):
+        fields = StockInfoSerializer.Meta.fields + ["stats"]
+
+
 class WatchlistSerializer(serializers.ModelSerializer):
     """Serializer für die Watchlist."""
 
@@ -474,10 +511,27 @@ class StockHoldingSerializer(serializers.ModelSerializer):
     """Serializer für Aktienbestände."""
 
     stock = StockInfoSerializer(read_only=True)
+    average_cost = serializers.DecimalField(
+        max_digits=20, decimal_places=2, read_only=True
+    )
+    unrealized_profit = serializers.DecimalField(
+        max_digits=20,
+        decimal_places=2,
+        source="get_unrealized_profit",
+        read_only=True,
+    )
 
     class Meta:
         model = StockHolding
-        fields = ["id", "stock", "amount"]
+        fields = [
+            "id",
+            "stock",
+            "amount",
+            "average_cost",
+            "total_invested",
+            "realized_profit",
+            "unrealized_profit",
+        ]
 
 
 class TransactionListSerializer(serializers.ModelSerializer):
@@ -493,6 +547,8 @@ class TransactionListSerializer(serializers.ModelSerializer):
             "stock",
             "status",
             "transaction_type",
+            "order_type",
+            "trigger_price",
             "amount",
             "price",
             "fee",
@@ -506,6 +562,23 @@ class TransactionListSerializer(serializers.ModelSerializer):
         return obj.get_total_price()
 
 
+class TransactionFilterSerializer(serializers.Serializer):
+    """Query-Parameter zum Filtern der Transaktionsliste. `date_to` ist exklusiv."""
+
+    DATE_FORMATS = ["iso-8601", "%Y-%m-%d"]
+
+    stock = serializers.IntegerField(required=False)
+    transaction_type = serializers.ChoiceField(
+        choices=Transaction.TRANSACTION_TYPE_CHOICES, required=False
+    )
+    order_type = serializers.ChoiceField(
+        choices=Transaction.ORDER_TYPE_CHOICES, required=False
+    )
+    status = serializers.ChoiceField(choices=Transaction.STATUS_CHOICES, required=False)
+    date_from = serializers.DateTimeField(input_formats=DATE_FORMATS, required=False)
+    date_to = serializers.DateTimeField(input_formats=DATE_FORMATS, required=False)
+
+
 class TransactionUpdateSerializer(serializers.ModelSerializer):
     """Serializer zum Aktualisieren der Beschreibung."""
 
@@ -515,7 +588,13 @@ class TransactionUpdateSerializer(serializers.ModelSerializer):
 
 
 class TransactionCreateSerializer(serializers.ModelSerializer):
-    """Serializer für das Erstellen von Transaktionen."""
+    """
+    Serializer für das Erstellen von Transaktionen.
+
+    Das Team wird über den Kontext `team` übergeben (sonst über das Profil des Benutzers geladen).
+    Die Aktie wird zusammen mit dem Bestand des Teams in einer Abfrage geladen, sodass Validierung
+    und Ausführung keine weiteren Lesezugriffe benötigen.
+    """
 
     stock = serializers.PrimaryKeyRelatedField(queryset=Stock.objects.all())
     description = serializers.CharField(required=False, allow_blank=True)
@@ -523,10 +602,45 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
     transaction_type = serializers.ChoiceField(
         choices=Transaction.TRANSACTION_TYPE_CHOICES
     )
+    order_type = serializers.ChoiceField(
+        choices=Transaction.ORDER_TYPE_CHOICES, default="market"
+    )
+    trigger_price = serializers.DecimalField(
+        max_digits=20,
+        decimal_places=2,
+        min_value=Decimal("0.01"),
+        required=False,
+        allow_null=True,
+    )
 
     class Meta:
         model = Transaction
-        fields = ["stock", "transaction_type", "amount", "description"]
+        fields = [
+            "id",
+            "status",
+            "stock",
+            "transaction_type",
+            "order_type",
+            "trigger_price",
+            "amount",
+            "description",
+        ]
+        read_only_fields = ["id", "status"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["stock"].queryset = Stock.objects.annotate(
+            held_amount=Subquery(
+                StockHolding.objects.filter(
+                    team=self.get_team(), stock=OuterRef("pk")
+                ).values("amount")[:1]
+            )
+        )
+
+    def get_team(self):
+        if "team" not in self.context:
+            self.context["team"] = self.context["request"].user.profile.team
+        return self.context["team"]
 
     def validate_amount(self, amount):
         """Validiert die Anzahl der Aktien."""
@@ -536,37 +650,84 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """Validiert die Transaktionsdaten."""
-        team = self.context["request"].user.profile.team
+        team = self.get_team()
         stock = data["stock"]
         amount = data["amount"]
         transaction_type = data["transaction_type"]
 
+        if data["order_type"] == "market":
+            data["trigger_price"] = None
+            reference_price = stock.current_price
+        elif data.get("trigger_price") is None:
+            raise serializers.ValidationError(
+                "Bitte geben Sie einen Auslösekurs für die Order an."
+            )
+        else:
+            reference_price = data["trigger_price"]
+
         if transaction_type == "buy":
-            price = amount * stock.current_price + stock.calculate_fee(amount)
+            price = amount * reference_price + stock.calculate_fee(
+                amount, reference_price
+            )
             if team.balance < price:
                 raise serializers.ValidationError("Nicht genügend Guthaben.")
 
+        elif stock.held_amount is None:
+            raise serializers.ValidationError("Sie besitzen keine Aktien dieses Typs.")
+        elif stock.held_amount < amount:
+            raise serializers.ValidationError("Nicht genügend Aktien im Depot.")
+
+        return data
+
+    def create(self, validated_data):
+        """
+        Legt die Transaktion an und führt Market-Orders direkt aus.
+
+        Market-Orders werden erst nach der Ausführung gespeichert, sodass die Transaktion nur
+        einmal mit ihrem endgültigen Status geschrieben wird. Mit `ASYNC_ORDERS` bleiben sie offen
+        und werden vom Order-Queue-Worker ausgeführt.
+        """
+        ta = Transaction(**validated_data)
+        if ta.order_type == "market" and not settings.ASYNC_ORDERS:
+            execute_transaction(ta)
         else:
-            try:
-                stock_holding = StockHolding.objects.get(team=team, stock=stock)
-                if stock_holding.amount < amount:
-                    raise serializers.ValidationError("Nicht genügend Aktien im Depot.")
+            ta.save()
+        return ta
 
-            except StockHolding.DoesNotExist:
-                raise serializers.ValidationError(
-                    "Sie besitzen keine Aktien dieses Typs."
-                )
 
-        return data
+class TransactionBatchOrderSerializer(serializers.Serializer):
+    """Serializer für eine einzelne Market-Order innerhalb eines Batches."""
+
+    stock = serializers.IntegerField()
+    transaction_type = serializers.ChoiceField(
+        choices=Transaction.TRANSACTION_TYPE_CHOICES
+    )
+    amount = serializers.IntegerField(min_value=1)
+    description = serializers.CharField(required=False, allow_blank=True)
+
+
+class TransactionBatchSerializer(serializers.Serializer):
+    """
+    Serializer für mehrere Orders, die gemeinsam ausgeführt werden.
+
+    Die Aktien werden hier bewusst nur als IDs validiert, damit nicht jede Order eine eigene
+    Abfrage auslöst; `execute_batch` lädt alle Aktien mit einer Abfrage.
+    """
+
+    orders = serializers.ListField(
+        child=TransactionBatchOrderSerializer(), min_length=1, max_length=50
+    )
 
 
 class StockAnalysisSerializer(serializers.Serializer):
     """Serializer for stock analysis data."""
 
-    id = serializers.IntegerField()
+    id = serializers.IntegerField(source="stock_id")
     name = serializers.CharField()
     ticker = serializers.CharField()
     total_profit = serializers.DecimalField(max_digits=20, decimal_places=2)
+    realized_profit = serializers.DecimalField(max_digits=20, decimal_places=2)
+    unrealized_profit = serializers.DecimalField(max_digits=20, decimal_places=2)
     current_holding = serializers.DecimalField(max_digits=20, decimal_places=2)
 
 
@@ -0,0 +1,99 @@
+import json
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.utils.encoders import JSONEncoder
+
+from stocks.models import Stock, StockHolding, Team, Transaction, Watchlist
+
+from ..fast_serializers import (
+    StockHoldingFastSerializer,
+    StockInfoFastSerializer,
+    TransactionListFastSerializer,
+    WatchlistFastSerializer,
+)
+from ..serializers import (
+    StockHoldingSerializer,
+    StockInfoSerializer,
+    TransactionListSerializer,
+    WatchlistSerializer,
+)
+
+
+class FastSerializerTests(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name="Test Team")
+        self.stock1 = Stock.objects.create(
+            name="Stock 1", ticker="STK1", current_price=Decimal("100.00")
+        )
+        self.stock2 = Stock.objects.create(
+            name="Stock 2", ticker="STK2", current_price=Decimal("12.5")
+        )
+
+    def assertSameOutput(self, fast_serializer, serializer_class, queryset):
+        """Compares values and key order of the rendered JSON of both serializers."""
+        expected = serializer_class(queryset, many=True).data
+        actual = fast_serializer.serialize(fast_serializer.values(queryset))
+        self.assertEqual(
+            json.dumps(actual, cls=JSONEncoder), json.dumps(expected, cls=JSONEncoder)
+        )
+
+    def test_stock_info(self):
+        self.assertSameOutput(
+            StockInfoFastSerializer(), StockInfoSerializer, Stock.objects.order_by("id")
+        )
+
+    def test_watchlist(self):
+        Watchlist.objects.create(team=self.team, stock=self.stock1, note="Beobachten")
+        Watchlist.objects.create(team=self.team, stock=self.stock2, note=None)
+        self.assertSameOutput(
+            WatchlistFastSerializer(),
+            WatchlistSerializer,
+            Watchlist.objects.select_related("stock").order_by("id"),
+        )
+
+    def test_stock_holding(self):
+        StockHolding.objects.create(
+            team=self.team,
+            stock=self.stock1,
+            amount=8,
+            total_invested=Decimal("81.00"),
+            realized_profit=Decimal("-3.50"),
+        )
+        StockHolding.objects.create(team=self.team, stock=self.stock2, amount=0)
+        self.assertSameOutput(
+            StockHoldingFastSerializer(),
+            StockHoldingSerializer,
+            StockHolding.objects.select_related("stock").order_by("id"),
+        )
+
+    def test_transaction_list(self):
+        Transaction.objects.create(
+            team=self.team,
+            stock=self.stock1,
+            transaction_type="buy",
+            amount=3,
+            price=Decimal("99.99"),
+            fee=Decimal("15.00"),
+            status="closed",
+        )
+        Transaction.objects.create(
+            team=self.team,
+            stock=self.stock2,
+            transaction_type="sell",
+            order_type="limit",
+            trigger_price=Decimal("13.10"),
+            amount=2,
+            description="Limit",
+        )
+        self.assertSameOutput(
+            TransactionListFastSerializer(),
+            TransactionListSerializer,
+            Transaction.objects.select_related("stock").order_by("id"),
+        )
+
+    def test_nested_lookups_are_prefixed(self):
+        self.assertEqual(
+            TransactionListFastSerializer().lookups[:5],
+            ["id", "stock__id", "stock__name", "stock__ticker", "stock__current_price"],
+        )
@@ -0,0 +1,86 @@
+import io
+import json
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from ..parsers import ORJSONParser
+from ..renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def setUp(self):
+        self.renderer = ORJSONRenderer()
+
+    def assertSameAsDRF(self, data):
+        expected = JSONRenderer().render(data)
+        actual = self.renderer.render(data)
+        self.assertEqual(json.loads(actual), json.loads(expected))
+        return actual
+
+    def test_native_types(self):
+        self.assertSameAsDRF(
+            {
+                "decimal": Decimal("12.50"),
+                "utc": datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+                "berlin": datetime(2026, 7, 1, 12, tzinfo=ZoneInfo("Europe/Berlin")),
+                "naive": datetime(2026, 1, 2, 3, 4, 5, 123),
+                "date": date(2026, 1, 2),
+                "timedelta": timedelta(minutes=29, seconds=3),
+                "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+                "lazy": gettext_lazy("Tag"),
+                "values": [1.5, 2, None, "ä"],
+            }
+        )
+
+    def test_datetime_format(self):
+        data = {"date": datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc)}
+        self.assertEqual(
+            self.renderer.render(data), b'{"date":"2026-01-02T03:04:05.678901Z"}'
+        )
+
+    def test_integer_keys(self):
+        self.assertSameAsDRF({1: "a", 2: {3: "b"}})
+
+    def test_line_separators_are_escaped(self):
+        rendered = self.assertSameAsDRF({"text": "a\u2028b\u2029c"})
+        self.assertEqual(rendered, b'{"text":"a\\u2028b\\u2029c"}')
+
+    def test_none(self):
+        self.assertEqual(self.renderer.render(None), b"")
+
+    def test_indent_falls_back_to_drf(self):
+        data = {"a": [1, 2]}
+        self.assertEqual(
+            self.renderer.render(data, "application/json; indent=4"),
+            JSONRenderer().render(data, "application/json; indent=4"),
+        )
+
+
+class ORJSONParserTests(SimpleTestCase):
+    def setUp(self):
+        self.parser = ORJSONParser()
+
+    def test_parse(self):
+        stream = io.BytesIO('{"amount": 5, "name": "Müller"}'.encode())
+        self.assertEqual(self.parser.parse(stream), {"amount": 5, "name": "Müller"})
+
+    def test_parse_other_encoding(self):
+        stream = io.BytesIO('{"name": "Müller"}'.encode("latin-1"))
+        data = self.parser.parse(stream, parser_context={"encoding": "latin-1"})
+        self.assertEqual(data, {"name": "Müller"})
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            self.parser.parse(io.BytesIO(b'{"amount": }'))
+
+    def test_parse_rejects_nan(self):
+        with self.assertRaises(ParseError):
+            self.parser.parse(io.BytesIO(b'{"amount": NaN}'))
@@ -1,22 +1,40 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
 import uuid
 from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
+import zstandard
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import AccessToken
 
+from backend.middleware import parse_accept_encoding
 from stocks.models import (
     History,
+    IdempotencyKey,
     RegistrationRequest,
     Stock,
     StockHolding,
+    StockStats,
     Team,
     Transaction,
     Watchlist,
 )
+from stocks.order_queue import drain_order_queue
+from stocks.price_store import get_price_store
+from stocks.services import calculate_stock_profit
+from stocks.versions import MARKET_KEY, bump_version
+
+from ..views import TeamRankingListView
 
 User = get_user_model()
 
@@ -95,6 +113,12 @@ class RegistrationRequestViewTests(APITestCase):
 
 class StockDetailViewTests(APITestCase):
     def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PRICE_STORE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
         self.user = User.objects.create_user(
             username="testuser", password="testpassword"
         )
@@ -127,6 +151,32 @@ class StockDetailViewTests(APITestCase):
         self.assertEqual(response.data["history_entries"][0]["values"], [1, 2, 3])
         self.assertEqual(response.data["amount"], 5)
 
+    def test_retrieve_stock_history_from_price_store(self):
+        get_price_store().write(
+            "Day",
+            ["STK1", "OTHER"],
+            [100, 200, 300],
+            [[4, 1], [float("nan"), 1], [6, 1]],
+        )
+        url = reverse("stock-detail", kwargs={"pk": self.stock1.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.data["history_entries"][0]["values"], [4.0, 6.0])
+
+    def test_retrieve_stock_with_stats(self):
+        StockStats.objects.create(stock=self.stock1, sma_20=98.5, rsi_14=55.0)
+        url = reverse("stock-detail", kwargs={"pk": self.stock1.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["stats"]["sma_20"], 98.5)
+        self.assertEqual(response.data["stats"]["rsi_14"], 55.0)
+        self.assertIsNone(response.data["stats"]["sma_200"])
+
+    def test_retrieve_stock_without_stats(self):
+        url = reverse("stock-detail", kwargs={"pk": self.stock1.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["stats"])
+
     def test_retrieve_stock_with_no_holding(self):
         stock3 = Stock.objects.create(
             name="Stock 3", ticker="STK3", current_price=50.00
@@ -163,6 +213,56 @@ class StockDetailViewTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_retrieve_stock_query_count(self):
+        Watchlist.objects.create(team=self.team, stock=self.stock1)
+        url = reverse("stock-detail", kwargs={"pk": self.stock1.pk})
+        # Middleware ping and versions, then the stock with the holding amount and watchlist id
+        # and the history prefetch.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["amount"], 5)
+        self.assertEqual(len(response.data["history_entries"]), 1)
+
+    def test_retrieve_stock_cached(self):
+        bump_version(MARKET_KEY)
+        url = reverse("stock-detail", kwargs={"pk": self.stock1.pk})
+        self.client.get(url)
+        # Middleware ping and versions.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data["amount"], 5)
+
+        Watchlist.objects.create(team=self.team, stock=self.stock1)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.data["watchlist_id"])
+
+    def test_retrieve_stock_not_modified(self):
+        url = reverse("stock-detail", kwargs={"pk": self.stock1.pk})
+        response = self.client.get(url)
+        self.assertIn("ETag", response.headers)
+        self.assertIn("Last-Modified", response.headers)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_stock_modified_after_market_update(self):
+        url = reverse("stock-detail", kwargs={"pk": self.stock1.pk})
+        etag = self.client.get(url)["ETag"]
+        bump_version(MARKET_KEY)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_retrieve_stock_modified_after_watchlist_change(self):
+        url = reverse("stock-detail", kwargs={"pk": self.stock1.pk})
+        etag = self.client.get(url)["ETag"]
+        watchlist_entry = Watchlist.objects.create(team=self.team, stock=self.stock1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["watchlist_id"], watchlist_entry.pk)
+
 
 class TeamDetailViewTests(APITestCase):
     def setUp(self):
@@ -199,6 +299,110 @@ class TeamDetailViewTests(APITestCase):
         self.assertIsNotNone(response.data["portfolio_value"])
         self.assertIsNotNone(response.data["rank"])
 
+    def test_retrieve_team_detail_query_count(self):
+        other = User.objects.create_user(username="other", password="testpassword")
+        other.profile.team = self.team
+        other.profile.save()
+        self.team.team_admin = self.user.profile
+        self.team.rank = 1
+        self.team.save()
+        url = reverse("team-detail")
+        # Middleware ping, team with admin, members with users and the portfolio value.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["members"]), 2)
+        self.assertEqual(response.data["admin"], "testuser")
+        self.assertTrue(response.data["is_admin"])
+        self.assertEqual(response.data["rank"], 1)
+
+    def test_retrieve_team_detail_rank_before_first_update(self):
+        url = reverse("team-detail")
+        response = self.client.get(url)
+        self.assertEqual(response.data["rank"], self.team.calculate_rank())
+
+    def test_retrieve_team_detail_fields(self):
+        url = reverse("team-detail")
+        response = self.client.get(url, {"fields": "id,name,balance,trades"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"id", "name", "balance", "trades"})
+        self.assertEqual(response.data["trades"], 1)
+
+    def test_retrieve_team_detail_etag_depends_on_fields(self):
+        Team.objects.filter(pk=self.team.pk).update(
+            last_edited=timezone.now() - timedelta(hours=1)
+        )
+        self.team.refresh_from_db()
+        url = reverse("team-detail")
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(
+            url, {"fields": "id,balance"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("portfolio_history", response.data)
+
+    def test_retrieve_team_detail_not_modified(self):
+        Team.objects.filter(pk=self.team.pk).update(
+            last_edited=timezone.now() - timedelta(hours=1)
+        )
+        self.team.refresh_from_db()
+        url = reverse("team-detail")
+        response = self.client.get(url)
+        self.assertIn("ETag", response.headers)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_team_detail_modified_after_trade(self):
+        Team.objects.filter(pk=self.team.pk).update(
+            last_edited=timezone.now() - timedelta(hours=1)
+        )
+        self.team.refresh_from_db()
+        url = reverse("team-detail")
+        etag = self.client.get(url)["ETag"]
+        Transaction.objects.create(
+            team=self.team,
+            stock=self.stock,
+            transaction_type="buy",
+            amount=1,
+            price=100,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["trades"], 2)
+
+    def test_retrieve_team_detail_cached_edit_timeout_is_current(self):
+        last_edited = timezone.now() - timedelta(hours=1)
+        Team.objects.filter(pk=self.team.pk).update(last_edited=last_edited)
+        self.team.refresh_from_db()
+        url = reverse("team-detail")
+        first = self.client.get(url).data["edit_timeout"]
+        with mock.patch(
+            "api.views.timezone.now", return_value=timezone.now() + timedelta(hours=1)
+        ):
+            second = self.client.get(url).data["edit_timeout"]
+        self.assertLessEqual(second, first - timedelta(minutes=59))
+
+    def test_retrieve_team_detail_after_member_rename(self):
+        Team.objects.filter(pk=self.team.pk).update(
+            last_edited=timezone.now() - timedelta(hours=1)
+        )
+        self.team.refresh_from_db()
+        url = reverse("team-detail")
+        etag = self.client.get(url)["ETag"]
+        self.user.username = "renamed"
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["members"][0]["username"], "renamed")
+
+    def test_retrieve_team_detail_without_etag_during_edit_timeout(self):
+        url = reverse("team-detail")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response.headers)
+
     def test_retrieve_team_detail_unauthenticated(self):
         self.client.force_authenticate(user=None)
         url = reverse("team-detail")
@@ -245,6 +449,17 @@ class TeamUpdateViewTests(APITestCase):
         self.team.refresh_from_db()
         self.assertEqual(self.team.team_admin, self.other_profile)
 
+    def test_update_team_keeps_concurrent_trade(self):
+        self.team.last_edited = timezone.now() - timedelta(days=1)
+        # A trade commits after the team was loaded for the request.
+        Team.objects.filter(pk=self.team.pk).update(balance=1234, trades=7)
+        response = self.client.patch(self.url, {"name": "Renamed"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.name, "Renamed")
+        self.assertEqual(self.team.balance, 1234)
+        self.assertEqual(self.team.trades, 7)
+
     def test_update_team_name_exists(self):
         self.team.last_edited = timezone.now() - timedelta(days=1)
         Team.objects.create(name="Existing Team")
@@ -343,15 +558,15 @@ class TeamRankingListViewTests(APITestCase):
         url = reverse("ranking")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data["results"]), 2)
-        self.assertEqual(response.data["count"], 2)
-        self.assertEqual(response.data["num_pages"], 1)
-        self.assertEqual(response.data["current_page"], 1)
-        self.assertEqual(response.data["page_size"], 10)
-        self.assertEqual(response.data["results"][0]["name"], "Team 2")
-        self.assertEqual(response.data["results"][0]["rank"], 1)
-        self.assertEqual(response.data["results"][1]["name"], "Team 1")
-        self.assertEqual(response.data["results"][1]["rank"], 2)
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertEqual(response.json()["count"], 2)
+        self.assertEqual(response.json()["num_pages"], 1)
+        self.assertEqual(response.json()["current_page"], 1)
+        self.assertEqual(response.json()["page_size"], 10)
+        self.assertEqual(response.json()["results"][0]["name"], "Team 2")
+        self.assertEqual(response.json()["results"][0]["rank"], 1)
+        self.assertEqual(response.json()["results"][1]["name"], "Team 1")
+        self.assertEqual(response.json()["results"][1]["rank"], 2)
 
     def test_retrieve_team_ranking_list_pagination(self):
         for i in range(12):
@@ -365,15 +580,71 @@ class TeamRankingListViewTests(APITestCase):
         url = reverse("ranking")
         response = self.client.get(f"{url}?page=2")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data["results"]), 4)
-        self.assertEqual(response.data["count"], 14)
-        self.assertEqual(response.data["num_pages"], 2)
-        self.assertEqual(response.data["current_page"], 2)
-        self.assertEqual(response.data["page_size"], 10)
-        self.assertEqual(response.data["results"][0]["name"], "Team 5")
-        self.assertEqual(response.data["results"][0]["rank"], 11)
-        self.assertEqual(response.data["results"][3]["name"], "Team 3")
-        self.assertEqual(response.data["results"][3]["rank"], 14)
+        self.assertEqual(len(response.json()["results"]), 4)
+        self.assertEqual(response.json()["count"], 14)
+        self.assertEqual(response.json()["num_pages"], 2)
+        self.assertEqual(response.json()["current_page"], 2)
+        self.assertEqual(response.json()["page_size"], 10)
+        self.assertEqual(response.json()["results"][0]["name"], "Team 5")
+        self.assertEqual(response.json()["results"][0]["rank"], 11)
+        self.assertEqual(response.json()["results"][3]["name"], "Team 3")
+        self.assertEqual(response.json()["results"][3]["rank"], 14)
+
+    def test_retrieve_team_ranking_list_last_page(self):
+        response = self.client.get(reverse("ranking"), {"page": "last"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["current_page"], 1)
+        self.assertEqual(response.json()["results"][1]["rank"], 2)
+
+    def test_retrieve_team_ranking_list_invalid_page(self):
+        bump_version(MARKET_KEY)
+        url = reverse("ranking")
+        for page in ("abc", "0", "-1", "2"):
+            response = self.client.get(url, {"page": page})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertNotIn("ETag", response.headers)
+
+    def test_ranking_is_cached_until_market_update(self):
+        bump_version(MARKET_KEY)
+        url = reverse("ranking")
+        self.client.get(url)
+
+        Team.objects.filter(pk=self.team1.pk).update(balance=200000)
+        # Middleware ping and market version.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["results"][0]["name"], "Team 2")
+
+        bump_version(MARKET_KEY)
+        response = self.client.get(url)
+        self.assertEqual(response.json()["results"][0]["name"], "Team 1")
+
+    def test_ranking_cache_headers(self):
+        bump_version(MARKET_KEY)
+        url = reverse("ranking")
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=30", response["Cache-Control"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        etag = response["ETag"]
+
+        self.assertTrue(etag.startswith('W/"ranking-1-json-'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn("public", response["Cache-Control"])
+
+        bump_version(MARKET_KEY)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_ranking_served_from_cached_bytes(self):
+        bump_version(MARKET_KEY)
+        url = reverse("ranking")
+        content = self.client.get(url).content
+        with mock.patch.object(TeamRankingListView, "get_ranking_page") as compute:
+            self.assertEqual(self.client.get(url).content, content)
+        compute.assert_not_called()
 
 
 class WatchlistViewTests(APITestCase):
@@ -924,6 +1195,58 @@ class TransactionViewTests(APITestCase):
         self.assertEqual(response.data[0]["amount"], 2)
         self.assertEqual(float(response.data[0]["total_price"]), 215.00)
 
+    def test_transaction_list_filters(self):
+        Transaction.objects.create(
+            team=self.team,
+            stock=self.stock2,
+            transaction_type="sell",
+            status="closed",
+            amount=1,
+            price=50.00,
+        )
+        url = reverse("transaction-list")
+
+        response = self.client.get(url, {"stock": self.stock2.pk})
+        self.assertEqual([t["stock"]["id"] for t in response.data], [self.stock2.pk])
+        response = self.client.get(url, {"transaction_type": "buy", "status": "open"})
+        self.assertEqual([t["id"] for t in response.data], [self.transaction1.pk])
+
+        tomorrow = (timezone.now() + timedelta(days=1)).date().isoformat()
+        response = self.client.get(url, {"date_from": tomorrow})
+        self.assertEqual(response.data, [])
+        response = self.client.get(url, {"date_to": tomorrow})
+        self.assertEqual(len(response.data), 2)
+
+    def test_transaction_list_invalid_filter(self):
+        url = reverse("transaction-list")
+        response = self.client.get(url, {"date_from": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"stock": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transaction_list_cursor_pagination(self):
+        for _ in range(4):
+            Transaction.objects.create(
+                team=self.team,
+                stock=self.stock2,
+                transaction_type="buy",
+                amount=1,
+                price=50.00,
+            )
+        url = reverse("transaction-list")
+        ids = []
+        response = self.client.get(url, {"page_size": 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            ids += [t["id"] for t in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        expected = Transaction.objects.filter(team=self.team).order_by("-date", "-id")
+        self.assertEqual(ids, [t.pk for t in expected])
+
     def test_transaction_list_unauthenticated(self):
         self.client.force_authenticate(user=None)
         url = reverse("transaction-list")
@@ -960,6 +1283,61 @@ class TransactionViewTests(APITestCase):
         self.assertEqual(response.data["amount"], 2)
         self.assertIn("description", response.data)
 
+    def test_transaction_create_buy_query_budget(self):
+        # Middleware ping, team, stock with holding, savepoint, balance, holding,
+        # transaction, trade counter, team version, ledger entry and savepoint release.
+        url = reverse("transaction-create")
+        data = {"stock": self.stock1.pk, "transaction_type": "buy", "amount": 2}
+        with self.assertNumQueries(11):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        transaction = Transaction.objects.latest("id")
+        self.assertEqual(transaction.status, "closed")
+        self.stock_holding.refresh_from_db()
+        self.assertEqual(self.stock_holding.amount, 7)
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, 100000 - transaction.get_total_price())
+
+    def test_transaction_create_sell_query_budget(self):
+        url = reverse("transaction-create")
+        data = {"stock": self.stock1.pk, "transaction_type": "sell", "amount": 2}
+        with self.assertNumQueries(11):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        transaction = Transaction.objects.latest("id")
+        self.assertEqual(transaction.status, "closed")
+        self.stock_holding.refresh_from_db()
+        self.assertEqual(self.stock_holding.amount, 3)
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, 100000 + transaction.get_total_price())
+
+    @override_settings(ASYNC_ORDERS=True)
+    def test_transaction_create_async_market_order(self):
+        url = reverse("transaction-create")
+        data = {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 2}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "open")
+        self.assertFalse(
+            StockHolding.objects.filter(team=self.team, stock=self.stock2).exists()
+        )
+
+        drain_order_queue()
+        detail_url = reverse("transaction-detail", kwargs={"pk": response.data["id"]})
+        response = self.client.get(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "closed")
+        self.assertEqual(
+            StockHolding.objects.get(team=self.team, stock=self.stock2).amount, 2
+        )
+
+    def test_transaction_detail_other_team(self):
+        url = reverse("transaction-detail", kwargs={"pk": self.other_transaction.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_transaction_create_buy_insufficient_funds(self):
         url = reverse("transaction-create")
         data = {"stock": self.stock1.pk, "transaction_type": "buy", "amount": 1000}
@@ -986,6 +1364,271 @@ class TransactionViewTests(APITestCase):
             response.data["non_field_errors"][0],
         )
 
+    def test_transaction_create_limit_order_stays_open(self):
+        url = reverse("transaction-create")
+        data = {
+            "stock": self.stock2.pk,
+            "transaction_type": "buy",
+            "order_type": "limit",
+            "trigger_price": "45.00",
+            "amount": 2,
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["order_type"], "limit")
+        transaction1 = Transaction.objects.get(team=self.team, stock=self.stock2)
+        self.assertEqual(transaction1.status, "open")
+        self.assertEqual(transaction1.price, Decimal("45.00"))
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, 100000)
+
+    def test_transaction_create_limit_order_without_trigger_price(self):
+        url = reverse("transaction-create")
+        data = {
+            "stock": self.stock2.pk,
+            "transaction_type": "buy",
+            "order_type": "stop",
+            "amount": 2,
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Auslösekurs", response.data["non_field_errors"][0])
+
+    def test_transaction_create_limit_order_insufficient_funds(self):
+        url = reverse("transaction-create")
+        data = {
+            "stock": self.stock2.pk,
+            "transaction_type": "buy",
+            "order_type": "stop",
+            "trigger_price": "100000.00",
+            "amount": 2,
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transaction_cancel_open_order(self):
+        order = Transaction.objects.create(
+            team=self.team,
+            stock=self.stock1,
+            transaction_type="sell",
+            order_type="limit",
+            trigger_price=120,
+            amount=1,
+            price=120,
+        )
+        url = reverse("transaction-cancel", kwargs={"pk": order.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "canceled")
+
+    def test_transaction_cancel_market_order(self):
+        url = reverse("transaction-cancel", kwargs={"pk": self.transaction1.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transaction_cancel_other_team(self):
+        order = Transaction.objects.create(
+            team=self.other_team,
+            stock=self.stock1,
+            transaction_type="sell",
+            order_type="limit",
+            trigger_price=120,
+            amount=1,
+        )
+        url = reverse("transaction-cancel", kwargs={"pk": order.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "open")
+
+    def test_transaction_create_idempotency_key_replays_response(self):
+        url = reverse("transaction-create")
+        data = {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 2}
+        headers = {"Idempotency-Key": "order-1"}
+        response = self.client.post(url, data, format="json", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        transaction_count = Transaction.objects.count()
+        self.team.refresh_from_db()
+        balance = self.team.balance
+
+        with self.assertNumQueries(2):
+            retry = self.client.post(url, data, format="json", headers=headers)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, response.data)
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.count(), transaction_count)
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, balance)
+
+        stored = IdempotencyKey.objects.get(user=self.user, key="order-1")
+        self.assertEqual(stored.transaction.status, "closed")
+
+    def test_transaction_create_idempotency_key_per_user(self):
+        url = reverse("transaction-create")
+        data = {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 1}
+        headers = {"Idempotency-Key": "order-1"}
+        self.client.post(url, data, format="json", headers=headers)
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.post(url, data, format="json", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IdempotencyKey.objects.filter(key="order-1").count(), 2)
+
+    def test_transaction_create_idempotency_key_expired(self):
+        url = reverse("transaction-create")
+        data = {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 1}
+        headers = {"Idempotency-Key": "order-1"}
+        self.client.post(url, data, format="json", headers=headers)
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        transaction_count = Transaction.objects.count()
+
+        response = self.client.post(url, data, format="json", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(Transaction.objects.count(), transaction_count + 1)
+
+    def test_transaction_create_idempotency_key_not_stored_on_error(self):
+        url = reverse("transaction-create")
+        data = {"stock": 9999, "transaction_type": "buy", "amount": 1}
+        headers = {"Idempotency-Key": "order-1"}
+        response = self.client.post(url, data, format="json", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_transaction_batch_success(self):
+        url = reverse("transaction-batch")
+        data = {
+            "orders": [
+                {"stock": self.stock1.pk, "transaction_type": "sell", "amount": 5},
+                {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 10},
+                {"stock": self.stock2.pk, "transaction_type": "sell", "amount": 4},
+            ]
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertTrue(
+            all(result["status"] == "ok" for result in response.data["results"])
+        )
+
+        transactions = Transaction.objects.filter(
+            pk__in=[r["transaction"]["id"] for r in response.data["results"]]
+        )
+        self.assertEqual(transactions.filter(status="closed").count(), 3)
+        expected_balance = Decimal(100000)
+        for transaction in transactions:
+            total = transaction.amount * transaction.price
+            if transaction.transaction_type == "buy":
+                expected_balance -= total + transaction.fee
+            else:
+                expected_balance += total - transaction.fee
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, expected_balance)
+        self.assertEqual(
+            self.team.trades, Transaction.objects.filter(team=self.team).count()
+        )
+        self.assertEqual(
+            StockHolding.objects.get(team=self.team, stock=self.stock1).amount, 0
+        )
+        self.assertEqual(
+            StockHolding.objects.get(team=self.team, stock=self.stock2).amount, 6
+        )
+
+    def test_transaction_batch_idempotency_key_replays_response(self):
+        url = reverse("transaction-batch")
+        data = {
+            "orders": [
+                {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 2},
+                {"stock": self.stock1.pk, "transaction_type": "sell", "amount": 1},
+            ]
+        }
+        headers = {"Idempotency-Key": "batch-1"}
+        response = self.client.post(url, data, format="json", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        transaction_count = Transaction.objects.count()
+        self.team.refresh_from_db()
+        balance = self.team.balance
+
+        retry = self.client.post(url, data, format="json", headers=headers)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), response.json())
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.count(), transaction_count)
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, balance)
+        self.assertEqual(IdempotencyKey.objects.filter(key="batch-1").count(), 1)
+
+    def test_transaction_batch_keeps_realized_profit_of_sold_out_holding(self):
+        url = reverse("transaction-batch")
+        data = {
+            "orders": [
+                {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 10},
+                {"stock": self.stock2.pk, "transaction_type": "sell", "amount": 10},
+            ]
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        holding = StockHolding.objects.get(team=self.team, stock=self.stock2)
+        self.assertEqual(holding.amount, 0)
+        self.assertLess(holding.realized_profit, 0)
+
+    def test_transaction_batch_with_concurrently_created_holding(self):
+        # The holding appears between loading the stocks and locking the holdings, as if
+        # `add_to_holding` of a concurrent trade had created it.
+        def create_holding(*args, **kwargs):
+            StockHolding.objects.create(
+                team=self.team, stock=self.stock2, amount=2, total_invested=100
+            )
+            return original_bulk_create(*args, **kwargs)
+
+        original_bulk_create = StockHolding.objects.bulk_create
+        url = reverse("transaction-batch")
+        data = {
+            "orders": [
+                {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 3}
+            ]
+        }
+        with mock.patch.object(
+            StockHolding.objects, "bulk_create", side_effect=create_holding
+        ):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        holding = StockHolding.objects.get(team=self.team, stock=self.stock2)
+        self.assertEqual(holding.amount, 5)
+
+    def test_transaction_batch_all_or_nothing(self):
+        url = reverse("transaction-batch")
+        data = {
+            "orders": [
+                {"stock": self.stock2.pk, "transaction_type": "buy", "amount": 1},
+                {"stock": self.stock1.pk, "transaction_type": "sell", "amount": 6},
+            ]
+        }
+        transaction_count = Transaction.objects.count()
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        results = response.data["results"]
+        self.assertEqual(results[0]["status"], "ok")
+        self.assertEqual(results[1]["status"], "error")
+
+        self.assertEqual(Transaction.objects.count(), transaction_count)
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, 100000)
+        self.assertFalse(
+            StockHolding.objects.filter(team=self.team, stock=self.stock2).exists()
+        )
+
+    def test_transaction_batch_invalid_stock(self):
+        url = reverse("transaction-batch")
+        data = {"orders": [{"stock": 9999, "transaction_type": "buy", "amount": 1}]}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["results"][0]["status"], "error")
+
+    def test_transaction_batch_empty(self):
+        url = reverse("transaction-batch")
+        response = self.client.post(url, {"orders": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_transaction_create_unauthenticated(self):
         self.client.force_authenticate(user=None)
         url = reverse("transaction-create")
@@ -1038,24 +1681,14 @@ class AnalysisViewTests(APITestCase):
         )
 
     def test_retrieve_analysis_success(self):
-        # Create transactions and holdings to test data
-        Transaction.objects.create(
-            team=self.team,
-            stock=self.stock1,
-            transaction_type="buy",
-            amount=2,
-            price=100.00,
-            fee=15.00,
+        # Holdings carry their cost basis and realized profit
+        StockHolding.objects.create(
+            team=self.team, stock=self.stock1, amount=3, total_invested=215
         )
-        Transaction.objects.create(
-            team=self.team,
-            stock=self.stock2,
-            transaction_type="sell",
-            amount=3,
-            price=50.00,
-            fee=10.00,
+        StockHolding.objects.create(
+            team=self.team, stock=self.stock2, amount=0, realized_profit=140
         )
-        StockHolding.objects.create(team=self.team, stock=self.stock1, amount=3)
+        StockHolding.objects.create(team=self.team, stock=self.stock3, amount=0)
 
         url = reverse("analysis")
         response = self.client.get(url)
@@ -1072,6 +1705,39 @@ class AnalysisViewTests(APITestCase):
         self.assertEqual(response.data[0]["ticker"], "STK2")
         self.assertEqual(response.data[0]["total_profit"], "140.00")
         self.assertEqual(response.data[0]["current_holding"], "0.00")
+        self.assertEqual(response.data[0]["realized_profit"], "140.00")
+        self.assertEqual(response.data[1]["unrealized_profit"], "85.00")
+
+    def test_retrieve_analysis_after_trades(self):
+        url = reverse("transaction-create")
+        for transaction_type, amount in [("buy", 4), ("buy", 2), ("sell", 3)]:
+            data = {
+                "stock": self.stock1.pk,
+                "transaction_type": transaction_type,
+                "amount": amount,
+            }
+            self.client.post(url, data, format="json")
+        Stock.objects.filter(pk=self.stock1.pk).update(current_price=120)
+
+        transactions = Transaction.objects.filter(team=self.team, status="closed")
+        expected_profit = calculate_stock_profit(transactions) + 3 * 120
+        response = self.client.get(reverse("analysis"))
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(Decimal(response.data[0]["total_profit"]), expected_profit)
+        self.assertEqual(response.data[0]["current_holding"], "360.00")
+
+    def test_retrieve_analysis_query_count(self):
+        for stock in [self.stock1, self.stock2, self.stock3]:
+            StockHolding.objects.create(
+                team=self.team, stock=stock, amount=1, total_invested=10
+            )
+        url = reverse("analysis")
+        # Middleware ping and the analysis itself (the profile is cached on the test user)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response.data[0]["ticker"], "STK3")
+        self.assertEqual(response.data[0]["total_profit"], "190.00")
 
     def test_retrieve_analysis_no_transactions_or_holdings(self):
         url = reverse("analysis")
@@ -1086,6 +1752,89 @@ class AnalysisViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class ExportViewTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="admin", password="adminpassword", is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.team = Team.objects.create(
+            name="Test Team", portfolio_history=[100000, 100500]
+        )
+        self.stock = Stock.objects.create(
+            name="Stock 1", ticker="STK1", current_price=100.00
+        )
+        self.transaction = Transaction.objects.create(
+            team=self.team,
+            stock=self.stock,
+            transaction_type="buy",
+            amount=2,
+            price=100.00,
+            fee=15.00,
+        )
+
+    def get_content(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_export_with_accept_header(self):
+        for file_format, media_type in (
+            ("csv", "text/csv"),
+            ("ndjson", "application/x-ndjson"),
+        ):
+            url = reverse(
+                "export", kwargs={"dataset": "holdings", "file_format": file_format}
+            )
+            response = self.client.get(url, HTTP_ACCEPT=media_type)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Type"], media_type)
+
+    def test_export_error_with_accept_header(self):
+        url = reverse("export", kwargs={"dataset": "holdings", "file_format": "csv"})
+        response = self.client.get(f"{url}?team=x", HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {"team": "Ungültiges Team."})
+
+    def test_export_transactions_csv(self):
+        url = reverse(
+            "export", kwargs={"dataset": "transactions", "file_format": "csv"}
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.reader(io.StringIO(self.get_content(response).decode())))
+        self.assertEqual(rows[0][:3], ["id", "date", "team_id"])
+        self.assertEqual(rows[1][0], str(self.transaction.pk))
+        self.assertEqual(rows[1][4], "STK1")
+
+    def test_export_portfolio_history_ndjson_zstd(self):
+        url = reverse(
+            "export", kwargs={"dataset": "portfolio_history", "file_format": "ndjson"}
+        )
+        response = self.client.get(url, {"compression": "zstd", "team": self.team.pk})
+        self.assertEqual(response["Content-Type"], "application/zstd")
+        self.assertIn(".ndjson.zst", response["Content-Disposition"])
+
+        content = (
+            zstandard.ZstdDecompressor()
+            .decompressobj()
+            .decompress(self.get_content(response))
+        )
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([row["value"] for row in rows], [100000, 100500])
+
+    def test_export_unknown_dataset(self):
+        url = reverse("export", kwargs={"dataset": "users", "file_format": "csv"})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_requires_admin(self):
+        user = User.objects.create_user(username="player", password="password")
+        self.client.force_authenticate(user=user)
+        url = reverse("export", kwargs={"dataset": "holdings", "file_format": "csv"})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class ValidateFormViewTests(APITestCase):
     def setUp(self):
         self.url = reverse("validate-form")
@@ -1226,11 +1975,43 @@ class SearchStocksViewTests(APITestCase):
         self.assertEqual(response.data[0]["name"], "Stock Test 1")
         self.assertEqual(response.data[1]["name"], "Stock Test 2")
 
+    def test_search_stocks_with_stats(self):
+        StockStats.objects.create(stock=self.stock1, day_change=1.5)
+        response = self.client.get(self.url, {"q": "Test"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["stats"]["day_change"], 1.5)
+        self.assertIsNone(response.data[1]["stats"])
+
+    def test_search_stocks_by_ticker_first(self):
+        response = self.client.get(self.url, {"q": "stk3"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["name"], "Another Stock")
+
+    def test_search_stocks_with_typo(self):
+        response = self.client.get(self.url, {"q": "anotehr"})
+        self.assertEqual([stock["ticker"] for stock in response.data], ["STK3"])
+
     def test_search_stocks_no_results(self):
         response = self.client.get(self.url, {"q": "nonexistent"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 0)
 
+    def test_search_stocks_without_version_query(self):
+        self.client.get(self.url, {"q": "Test"})
+        # Middleware ping and the matched stocks with their stats.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"q": "Stock"})
+        self.assertEqual(len(response.data), 3)
+
+    @override_settings(STOCK_SEARCH_BACKEND="database")
+    def test_search_stocks_database_backend_cached(self):
+        bump_version(MARKET_KEY)
+        self.client.get(self.url, {"q": "Test"})
+        # Middleware ping and market version.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"q": "test"})
+        self.assertEqual(len(response.data), 2)
+
     def test_search_stocks_unauthenticated(self):
         self.client.force_authenticate(user=None)
         response = self.client.get(self.url, {"q": "Test"})
@@ -1279,3 +2060,84 @@ class ValidateActivationTokenViewTests(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CompressionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", is_staff=True
+        )
+        self.team = Team.objects.create(name="Test Team")
+        self.user.profile.team = self.team
+        self.user.profile.save()
+        self.client.force_authenticate(user=self.user)
+        stock = Stock.objects.create(
+            name="Stock 1", ticker="STK1", current_price=Decimal("100.00")
+        )
+        Transaction.objects.bulk_create(
+            Transaction(
+                team=self.team,
+                stock=stock,
+                transaction_type="buy",
+                amount=1,
+                price=Decimal("100.00"),
+            )
+            for _ in range(50)
+        )
+        self.url = reverse("transaction-list")
+
+    def test_prefers_zstd(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br, zstd")
+        self.assertEqual(response["Content-Encoding"], "zstd")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = (
+            zstandard.ZstdDecompressor().decompressobj().decompress(response.content)
+        )
+        self.assertEqual(len(json.loads(content)), 50)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+
+    def test_gzip(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 50)
+
+    def test_excluded_encoding(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="zstd;q=0, gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_no_accepted_encoding(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="identity")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(len(response.json()), 50)
+
+    def test_small_response_is_not_compressed(self):
+        url = reverse("transaction-list") + "?stock=9999"
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="zstd")
+        self.assertNotIn("Content-Encoding", response)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_not_modified_is_not_compressed(self):
+        self.team.last_edited = timezone.now() - timedelta(hours=1)
+        Team.objects.filter(pk=self.team.pk).update(last_edited=self.team.last_edited)
+        url = reverse("team-detail")
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING="zstd"
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_streaming_export(self):
+        url = reverse(
+            "export", kwargs={"dataset": "transactions", "file_format": "csv"}
+        )
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertEqual(len(content.splitlines()), 51)
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip;q=0.5, br , *;q=0, zstd;q=x"),
+            {"gzip": 0.5, "br": 1.0, "*": 0.0, "zstd": 0.0},
+        )
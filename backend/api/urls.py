@@ -45,13 +45,33 @@ urlpatterns = [
         views.TransactionCreateView.as_view(),
         name="transaction-create",
     ),
+    path(
+        "transactions/<int:pk>/",
+        views.TransactionDetailView.as_view(),
+        name="transaction-detail",
+    ),
     path(
         "transactions/<int:pk>/update/",
         views.TransactionUpdateView.as_view(),
         name="transaction-update",
     ),
+    path(
+        "transactions/batch/",
+        views.TransactionBatchView.as_view(),
+        name="transaction-batch",
+    ),
+    path(
+        "transactions/<int:pk>/cancel/",
+        views.TransactionCancelView.as_view(),
+        name="transaction-cancel",
+    ),
     path("validate-form/", views.ValidateFormView.as_view(), name="validate-form"),
     path("analysis/", views.AnalysisView.as_view(), name="analysis"),
+    path(
+        "export/<str:dataset>.<str:file_format>",
+        views.ExportView.as_view(),
+        name="export",
+    ),
     path("search/", views.SearchStocksView.as_view(), name="stock-search"),
     path(
         "validate-token/<str:token>/",
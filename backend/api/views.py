@@ -1,34 +1,64 @@
-from decimal import Decimal
-
-from django.http import Http404
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from rest_framework import generics, pagination, serializers, status
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from stocks import exports
+from stocks.cache import get_or_compute
 from stocks.models import (
     RegistrationRequest,
     Stock,
     StockHolding,
+    Team,
     Transaction,
     UserProfile,
+    Watchlist,
+    get_portfolio_values,
     get_team_ranking_queryset,
 )
-from stocks.services import calculate_stock_profit, execute_transaction
-
+from stocks.orders import PENDING_ORDER_TYPES
+from stocks.search import search_stocks
+from stocks.services import execute_batch
+from stocks.snapshot import get_market_snapshot
+from stocks.versions import MARKET_KEY, team_key
+
+from .fast_serializers import (
+    StockHoldingFastSerializer,
+    TransactionListFastSerializer,
+    WatchlistFastSerializer,
+)
+from .mixins import ConditionalGetMixin, FastListMixin, IdempotentPostMixin
 from .serializers import (
     MyTokenObtainPairSerializer,
     RegistrationRequestSerializer,
     StockAnalysisSerializer,
     StockHoldingSerializer,
-    StockInfoSerializer,
+    StockSearchSerializer,
     StockSerializer,
     TeamRankingSerializer,
     TeamSerializer,
     TeamUpdateSerializer,
+    TransactionBatchSerializer,
     TransactionCreateSerializer,
+    TransactionFilterSerializer,
     TransactionListSerializer,
     TransactionUpdateSerializer,
     UserCreateSerializer,
@@ -59,22 +89,86 @@ class RegistrationRequestCreateView(generics.CreateAPIView):
         registration_request.send_activation_email()
 
 
-class StockDetailView(generics.RetrieveAPIView):
+class StockDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Viewset für Aktien Details."""
 
     serializer_class = StockSerializer
-    queryset = Stock.objects.filter(current_price__gt=0)
     permission_classes = [IsAuthenticated]
+    etag_prefix = "stock"
+    cache_responses = True
+
+    def get_queryset(self):
+        # Bestand und Watchlist-Eintrag des Teams werden in derselben Abfrage wie die Aktie
+        # geladen, die Historie mit einer zweiten.
+        team_id = self.request.user.profile.team_id
+        holdings = StockHolding.objects.filter(team_id=team_id, stock=OuterRef("pk"))
+        watchlist = Watchlist.objects.filter(team_id=team_id, stock=OuterRef("pk"))
+        return (
+            Stock.objects.filter(current_price__gt=0)
+            .select_related("stats")
+            .prefetch_related("history_entries")
+            .annotate(
+                amount=Coalesce(Subquery(holdings.values("amount")[:1]), 0),
+                watchlist_id=Subquery(watchlist.values("pk")[:1]),
+            )
+        )
+
+    def get_version_keys(self):
+        return [MARKET_KEY, team_key(self.request.user.profile.team_id)]
+
+    def get_etag_parts(self):
+        return [self.kwargs["pk"]]
 
 
-class TeamDetailView(generics.RetrieveAPIView):
+class TeamDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Viewset für Teams."""
 
     serializer_class = TeamSerializer
     permission_classes = [IsAuthenticated]
+    etag_prefix = "team"
+    cache_responses = True
+
+    def get_version_keys(self):
+        team = self.request.user.profile.team
+        # Solange die Bearbeitungssperre läuft, ändert sich `edit_timeout` mit jeder Sekunde.
+        if team.last_edited + timedelta(minutes=30) > timezone.now():
+            return None
+        return [MARKET_KEY, team_key(team.pk)]
+
+    def get_etag_parts(self):
+        profile = self.request.user.profile
+        return [
+            profile.pk,
+            int(profile.team.last_edited.timestamp()),
+            self.request.GET.get("fields", ""),
+        ]
+
+    def get_response(self, request, *args, **kwargs):
+        response = super().get_response(request, *args, **kwargs)
+        if "edit_timeout" in response.data:
+            # Die gecachten Daten enthalten den Stand ihrer Berechnung, `edit_timeout` läuft aber
+            # weiter und wird deshalb für jede Antwort neu berechnet.
+            last_edited = request.user.profile.team.last_edited
+            response.data = {
+                **response.data,
+                "edit_timeout": timedelta(minutes=30) - (timezone.now() - last_edited),
+            }
+        return response
 
     def get_object(self):
-        return self.request.user.profile.team
+        return (
+            Team.objects.select_related("team_admin__user")
+            .prefetch_related(
+                Prefetch("members", UserProfile.objects.select_related("user"))
+            )
+            .get(pk=self.request.user.profile.team_id)
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.request.GET.get("fields")
+        if fields:
+            kwargs["fields"] = fields.split(",")
+        return super().get_serializer(*args, **kwargs)
 
 
 class TeamUpdateView(generics.UpdateAPIView):
@@ -87,22 +181,79 @@ class TeamUpdateView(generics.UpdateAPIView):
         return self.request.user.profile.team
 
 
-class TeamRankingListView(generics.ListAPIView):
-    """Viewset für die Team-Ranking-Liste."""
+class TeamRankingListView(ConditionalGetMixin, generics.ListAPIView):
+    """
+    Viewset für die Team-Ranking-Liste.
+
+    Die Rangliste ist für alle Besucher gleich und wird je Kursaktualisierung einmal berechnet,
+    Trades erscheinen darin mit der nächsten Aktualisierung. Jede Seite wird daher fertig kodiert
+    unter der Marktversion gespeichert und mit `Cache-Control: public` ausgeliefert, sodass auch
+    ein Reverse Proxy oder CDN sie bis zur nächsten Aktualisierung ausliefern kann.
+    """
 
     serializer_class = TeamRankingSerializer
     permission_classes = [AllowAny]
+    etag_prefix = "ranking"
 
     def get_queryset(self):
         return get_team_ranking_queryset()
 
+    def get_page_number(self):
+        """
+        Die angefragte Seite als positive Zahl oder "last", noch bevor sie in ETag und
+        Cache-Schlüssel eingeht. Ungültige Werte ergeben wie beim Paginator ein 404.
+        """
+        paginator = pagination.PageNumberPagination
+        page_number = self.request.GET.get(paginator.page_query_param, "1")
+        if page_number in paginator.last_page_strings:
+            return "last"
+        try:
+            page_number = int(page_number)
+        except ValueError:
+            raise Http404
+        if page_number < 1:
+            raise Http404
+        return page_number
+
+    def get_version_keys(self):
+        return [MARKET_KEY]
+
+    def get_etag_parts(self):
+        return [self.get_page_number(), self.request.accepted_renderer.format]
+
+    def get_cache_control(self):
+        return {"public": True, "max_age": settings.RANKING_CACHE_MAX_AGE}
+
     def get(self, request, *args, **kwargs):
-        page_size = 10
-        page_number = int(request.GET.get("page", 1))
+        response = super().get(request, *args, **kwargs)
+        patch_vary_headers(response, ["Accept", "Accept-Encoding"])
+        return response
+
+    def get_response(self, request, *args, **kwargs):
+        page_number = self.get_page_number()
+        # Die Browsable API wird wie bisher gerendert und nicht gespeichert.
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return Response(self.get_ranking_page(request, page_number))
+
+        media_type = request.accepted_media_type
+        content = get_or_compute(
+            "ranking",
+            self.version_keys,
+            lambda: request.accepted_renderer.render(
+                self.get_ranking_page(request, page_number), media_type
+            ),
+            parts=[page_number, media_type],
+            versions=self.versions,
+        )
+        return HttpResponse(content, content_type=request.accepted_renderer.media_type)
 
-        queryset = self.get_queryset()
+    def get_ranking_page(self, request, page_number):
+        page_size = 10
+        # Alle Teams werden zu den Kursen desselben Snapshots bewertet.
+        teams = list(self.get_queryset())
+        portfolio_values = get_portfolio_values(teams, get_market_snapshot())
         sorted_queryset = sorted(
-            queryset, key=lambda team: team.total_balance, reverse=True
+            teams, key=lambda team: portfolio_values[team.pk], reverse=True
         )
 
         paginator = pagination.PageNumberPagination()
@@ -110,27 +261,30 @@ class TeamRankingListView(generics.ListAPIView):
         page = paginator.paginate_queryset(sorted_queryset, request)
 
         serializer = TeamRankingSerializer(
-            page, many=True, context={"request": request}
+            page,
+            many=True,
+            context={"request": request, "portfolio_values": portfolio_values},
         )
 
+        # Bei "last" ergibt erst der Paginator die Seitenzahl.
+        page_number = paginator.page.number
         for i, item in enumerate(serializer.data):
             item["rank"] = (page_number - 1) * page_size + i + 1
 
-        return Response(
-            {
-                "results": serializer.data,
-                "count": paginator.page.paginator.count,
-                "num_pages": paginator.page.paginator.num_pages,
-                "current_page": page_number,
-                "page_size": page_size,
-            }
-        )
+        return {
+            "results": serializer.data,
+            "count": paginator.page.paginator.count,
+            "num_pages": paginator.page.paginator.num_pages,
+            "current_page": page_number,
+            "page_size": page_size,
+        }
 
 
-class WatchlistListView(generics.ListAPIView):
+class WatchlistListView(FastListMixin, generics.ListAPIView):
     """Viewset für die Watchlist."""
 
     serializer_class = WatchlistSerializer
+    fast_serializer_class = WatchlistFastSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -197,10 +351,11 @@ class UserProfileUpdateView(generics.UpdateAPIView):
         return self.request.user.profile
 
 
-class StockHoldingListView(generics.ListAPIView):
+class StockHoldingListView(FastListMixin, generics.ListAPIView):
     """Viewset für die Stock-Holdings eines Teams."""
 
     serializer_class = StockHoldingSerializer
+    fast_serializer_class = StockHoldingFastSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -209,19 +364,68 @@ class StockHoldingListView(generics.ListAPIView):
         ).select_related("team", "stock")
 
 
-class TransactionListView(generics.ListAPIView):
-    """Viewset für die Transaktionen eines Teams."""
+class TransactionCursorPagination(pagination.CursorPagination):
+    """Cursor-Pagination der Transaktionen, neueste zuerst."""
+
+    ordering = ("-date", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class TransactionListView(FastListMixin, generics.ListAPIView):
+    """
+    Viewset für die Transaktionen eines Teams.
+
+    Filter siehe `TransactionFilterSerializer`. Mit `page_size` oder `cursor` wird seitenweise
+    geantwortet, sonst mit der vollständigen Liste.
+    """
 
     serializer_class = TransactionListSerializer
+    fast_serializer_class = TransactionListFastSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TransactionCursorPagination
 
     def get_queryset(self):
+        filters = TransactionFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        lookups = {
+            "stock": "stock_id",
+            "transaction_type": "transaction_type",
+            "order_type": "order_type",
+            "status": "status",
+            "date_from": "date__gte",
+            "date_to": "date__lt",
+        }
         return (
-            Transaction.objects.filter(team=self.request.user.profile.team)
-            .order_by("-date")
+            Transaction.objects.filter(
+                team_id=self.request.user.profile.team_id,
+                **{
+                    lookups[name]: value
+                    for name, value in filters.validated_data.items()
+                },
+            )
             .select_related("stock")
+            .order_by("-date", "-id")
         )
 
+    def paginate_queryset(self, queryset):
+        if not {"cursor", "page_size"} & self.request.query_params.keys():
+            return None
+        return super().paginate_queryset(queryset)
+
+
+class TransactionDetailView(generics.RetrieveAPIView):
+    """View für eine einzelne Transaktion, z.B. um den Status einer Order abzufragen."""
+
+    serializer_class = TransactionListSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Transaction.objects.filter(
+            team=self.request.user.profile.team
+        ).select_related("stock")
+
 
 class TransactionUpdateView(generics.UpdateAPIView):
     """Viewset für das Aktualisieren von Transaktionen."""
@@ -233,64 +437,166 @@ class TransactionUpdateView(generics.UpdateAPIView):
         return Transaction.objects.filter(team=self.request.user.profile.team)
 
 
-class TransactionCreateView(generics.CreateAPIView):
+class TransactionCreateView(IdempotentPostMixin, generics.CreateAPIView):
     """Viewset für das Erstellen neuer Transaktionen."""
 
     serializer_class = TransactionCreateSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["team"] = Team.objects.get(members__user=self.request.user)
+        return context
+
     def perform_create(self, serializer):
-        """Erstellt eine neue Transaktion und führt sie aus."""
-        team = self.request.user.profile.team
+        """
+        Erstellt eine neue Transaktion und führt Market-Orders sofort aus.
+
+        Limit- und Stop-Orders bleiben offen, bis der Stock-Updater sie auslöst.
+        """
         validated_data = serializer.validated_data
-        validated_data["team"] = team
-        validated_data["price"] = validated_data["stock"].current_price
-        fee = validated_data["stock"].calculate_fee(validated_data["amount"])
-        validated_data["fee"] = fee
-        transaction_created = serializer.save()
-        execute_transaction(transaction_created)
+        stock = validated_data["stock"]
+        price = validated_data["trigger_price"] or stock.current_price
+        self.transaction_created = serializer.save(
+            team=serializer.context["team"],
+            price=price,
+            fee=stock.calculate_fee(validated_data["amount"], price),
+        )
 
+    def create(self, request, *args, **kwargs):
+        """Antwortet mit 202, wenn eine Market-Order nur in die Order-Queue gestellt wurde."""
+        response = super().create(request, *args, **kwargs)
+        ta = self.transaction_created
+        if ta.order_type == "market" and ta.status == "open":
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def get_idempotent_transaction(self):
+        return self.transaction_created
 
-class AnalysisView(APIView):
-    """View zum Berechnen des Gewinns eines Teams."""
+
+class TransactionBatchView(IdempotentPostMixin, APIView):
+    """View zum gemeinsamen Ausführen mehrerer Orders (alles oder nichts)."""
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        team = request.user.profile.team
-        stock_profits = []
-        unique_stocks = set(
-            Transaction.objects.filter(team=team).values_list("stock", flat=True)
+    def handle_post(self, request):
+        serializer = TransactionBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        transactions = execute_batch(
+            request.user.profile.team, serializer.validated_data["orders"]
         )
-        for stock_id in unique_stocks:
-            stock = Stock.objects.get(id=stock_id)
-            transactions = Transaction.objects.filter(team=team, stock=stock)
-            total_profit = calculate_stock_profit(transactions)
-            try:
-                stock_holding = StockHolding.objects.get(team=team, stock=stock)
-                current_holding = stock_holding.amount * stock.current_price
-                total_profit += current_holding
-            except StockHolding.DoesNotExist:
-                current_holding = Decimal("0.00")
+        results = [
+            {"status": "ok", "transaction": data}
+            for data in TransactionListSerializer(transactions, many=True).data
+        ]
+        return Response({"results": results}, status=status.HTTP_201_CREATED)
+
 
-            stock_profits.append(
+class TransactionCancelView(APIView):
+    """View zum Stornieren offener Limit- und Stop-Orders."""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        updated = Transaction.objects.filter(
+            pk=pk,
+            team=request.user.profile.team,
+            status="open",
+            order_type__in=PENDING_ORDER_TYPES,
+        ).update(status="canceled")
+        if not updated:
+            return Response(
                 {
-                    "id": stock.id,
-                    "name": stock.name,
-                    "ticker": stock.ticker,
-                    "total_profit": total_profit,
-                    "current_holding": current_holding,
-                }
+                    "detail": "Nur offene Limit- und Stop-Orders können storniert werden."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        sorted_stock_profits = sorted(
-            stock_profits, key=lambda x: x["total_profit"], reverse=True
+        ta = Transaction.objects.select_related("stock").get(pk=pk)
+        return Response(TransactionListSerializer(ta).data)
+
+
+class AnalysisView(APIView):
+    """View zum Berechnen des Gewinns eines Teams."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Berechnet Gewinne und Bestandswerte aller gehandelten Aktien in einer einzigen Abfrage.
+
+        Einstandswert und realisierter Gewinn werden bei jeder Transaktion in den Beständen
+        fortgeschrieben, daher genügt ein Join der Bestände mit den aktuellen Kursen.
+        """
+        money = DecimalField(max_digits=20, decimal_places=2)
+        sorted_stock_profits = (
+            StockHolding.objects.filter(team_id=request.user.profile.team_id)
+            .exclude(amount=0, realized_profit=0)
+            .annotate(
+                current_holding=ExpressionWrapper(
+                    F("amount") * F("stock__current_price"), output_field=money
+                ),
+                unrealized_profit=ExpressionWrapper(
+                    F("current_holding") - F("total_invested"), output_field=money
+                ),
+                total_profit=ExpressionWrapper(
+                    F("realized_profit") + F("unrealized_profit"), output_field=money
+                ),
+            )
+            .order_by("-total_profit")
+            .values(
+                "total_profit",
+                "realized_profit",
+                "unrealized_profit",
+                "current_holding",
+                "stock_id",
+                name=F("stock__name"),
+                ticker=F("stock__ticker"),
+            )
         )
 
         serializer = StockAnalysisSerializer(sorted_stock_profits, many=True)
         return Response(serializer.data)
 
 
+class ExportView(APIView):
+    """
+    Streamt Spieldaten als CSV oder NDJSON für Lehrkräfte und Admins.
+
+    `?team=<id>` beschränkt den Export auf ein Team, `?compression=zstd` komprimiert ihn.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Das Format steht in der URL und wird an den Renderern vorbei gestreamt. Ein
+        # `Accept: text/csv` darf daher nicht mit 406 scheitern; Fehler werden als JSON gerendert.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, dataset, file_format):
+        if dataset not in exports.DATASETS or file_format not in exports.FORMATS:
+            raise Http404
+
+        team_id = request.query_params.get("team")
+        if team_id is not None and not team_id.isdigit():
+            raise serializers.ValidationError({"team": "Ungültiges Team."})
+        compress = request.query_params.get("compression") == "zstd"
+
+        filename = f"{dataset}.{file_format}"
+        content_type = exports.FORMATS[file_format]
+        if compress:
+            filename += ".zst"
+            content_type = "application/zstd"
+        response = StreamingHttpResponse(
+            exports.export(dataset, file_format, team_id=team_id, compress=compress),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class ValidateFormView(APIView):
     """View zum Validieren von Formulardaten."""
 
@@ -336,7 +642,7 @@ class ValidateFormView(APIView):
 
 
 class SearchStocksView(APIView):
-    """View to search stocks, and to return the results paginated."""
+    """View to search stocks by name and ticker, best matches first."""
 
     permission_classes = [IsAuthenticated]
 
@@ -344,15 +650,24 @@ class SearchStocksView(APIView):
         result_limit = 100
 
         query = request.GET.get("q", "")
-        if query:
-            results = Stock.objects.filter(
-                name__icontains=query, current_price__gt=0
-            ).order_by("name")[:result_limit]
-        else:
-            results = []
-
-        serializer = StockInfoSerializer(results, many=True)
-        return Response(serializer.data)
+        # Der Index im Arbeitsspeicher prüft die Marktversion selbst nur gedrosselt; ein
+        # versionierter Cache davor würde sie bei jedem Tastendruck abfragen.
+        if settings.STOCK_SEARCH_BACKEND != "database":
+            return Response(self.search(query, result_limit))
+
+        data = get_or_compute(
+            "search",
+            [MARKET_KEY],
+            lambda: self.search(query, result_limit),
+            parts=[query.strip().casefold(), result_limit],
+        )
+        return Response(data)
+
+    def search(self, query, limit):
+        stock_ids = search_stocks(query, limit=limit)
+        stocks = Stock.objects.select_related("stats").in_bulk(stock_ids)
+        results = [stocks[pk] for pk in stock_ids if pk in stocks]
+        return StockSearchSerializer(results, many=True).data
 
 
 class ValidateActivationTokenView(APIView):
@@ -4,3 +4,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 application = get_asgi_application()
+
+# Imported after the application, which sets up Django.
+from stocks.order_queue import start_order_queue_worker  # noqa: E402
+
+start_order_queue_worker()
@@ -1,12 +1,28 @@
+import gzip
 import logging
 import time
+import zlib
 
+import zstandard
 from django.conf import settings
 from django.db import connections
 from django.db.utils import OperationalError
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
+# Niedrige Stufen, da dynamische Antworten bei jeder Anfrage neu komprimiert werden: Sie
+# erreichen bei JSON fast das Verhältnis der hohen Stufen in einem Bruchteil der Zeit.
+ZSTD_LEVEL = 3
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 5
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "application/x-ndjson", "text/csv")
+
 
 class RetryOnOperationalErrorMiddleware:
     def __init__(self, get_response):
@@ -35,3 +51,130 @@ class RetryOnOperationalErrorMiddleware:
                 time.sleep(delay)
                 delay *= 2
         return self.get_response(request)
+
+
+def parse_accept_encoding(header):
+    """Gibt die Kodierungen aus einem `Accept-Encoding`-Header mit ihrem q-Wert zurück."""
+    encodings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[coding.strip().lower()] = quality
+    return encodings
+
+
+def _zstd_compress(content):
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(content)
+
+
+def _zstd_stream(chunks):
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_compress(content):
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+def _brotli_stream(chunks):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _gzip_compress(content):
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Komprimiert JSON-, NDJSON- und CSV-Antworten nach dem `Accept-Encoding` des Clients.
+
+    Bevorzugt werden zstd, dann Brotli (nur wenn das Paket `brotli` installiert ist) und gzip.
+    Antworten unter `COMPRESSION_MIN_SIZE` Bytes, Antworten ohne Inhalt (z.B. 304) und bereits
+    kodierte Antworten bleiben unverändert. HTML wird nie komprimiert, da es CSRF-Tokens enthalten
+    kann (BREACH).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+        self.encoders = {
+            "zstd": (_zstd_compress, _zstd_stream),
+            "gzip": (_gzip_compress, _gzip_stream),
+        }
+        if brotli is not None:
+            self.encoders["br"] = (_brotli_compress, _brotli_stream)
+        self.preference = [
+            coding for coding in ("zstd", "br", "gzip") if coding in self.encoders
+        ]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = self.negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        compress, compress_stream = self.encoders[coding]
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            content = compress(response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = coding
+        return response
+
+    def is_compressible(self, response):
+        if response.has_header("Content-Encoding") or response.status_code == 304:
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if content_type not in COMPRESSIBLE_CONTENT_TYPES:
+            return False
+        if response.streaming:
+            return not response.is_async
+        return len(response.content) >= self.min_size
+
+    def negotiate(self, header):
+        """Wählt die bevorzugte Kodierung, die der Client nicht mit `q=0` ausschließt."""
+        accepted = parse_accept_encoding(header)
+        for coding in self.preference:
+            if accepted.get(coding, accepted.get("*", 0)) > 0:
+                return coding
+        return None
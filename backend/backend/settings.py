@@ -40,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "backend.middleware.CompressionMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -167,6 +168,15 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 SIMPLE_JWT = {
@@ -182,6 +192,49 @@ CORS_ALLOWED_ORIGINS = [FRONTEND_URL] if FRONTEND_URL else []
 CSRF_TRUSTED_ORIGINS = [FRONTEND_URL] if FRONTEND_URL else []
 CORS_ALLOWS_CREDENTIALS = True
 
+#####################
+#   Response Compression
+#####################
+COMPRESSION_MIN_SIZE = get_int_env("COMPRESSION_MIN_SIZE", 1024)
+
+#####################
+#   Cache
+#####################
+# Die Schlüssel enthalten die Versionszähler (stocks.cache), alte Einträge werden daher nicht
+# gelöscht, sondern nach CACHE_TIMEOUT oder bei Erreichen von CACHE_MAX_ENTRIES verdrängt
+# (locmem: LRU). Redis verdrängt nach seiner `maxmemory-policy`, z.B. `allkeys-lru`.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHE_BACKEND = get_str_env("CACHE_BACKEND", "locmem")
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": get_str_env(
+            "CACHE_LOCATION",
+            os.path.join(BASE_DIR, "Data", "cache") if CACHE_BACKEND == "file" else "",
+        ),
+        "TIMEOUT": get_int_env("CACHE_TIMEOUT", 300),
+    }
+}
+if CACHE_BACKEND != "redis":
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": get_int_env("CACHE_MAX_ENTRIES", 1000)
+    }
+# So lange dürfen Browser, Proxies und CDNs die öffentliche Rangliste ohne Nachfrage ausliefern.
+RANKING_CACHE_MAX_AGE = get_int_env("RANKING_CACHE_MAX_AGE", 30)
+
+#####################
+#   Stock Search
+#####################
+# "memory": Index im Arbeitsspeicher jedes Prozesses.
+# "database": pg_trgm-Indizes in PostgreSQL (icontains auf anderen Datenbanken).
+STOCK_SEARCH_BACKEND = get_str_env("STOCK_SEARCH_BACKEND", "memory")
+# So viele Sekunden nutzt ein Prozess seinen Suchindex, bevor er die Marktversion erneut prüft.
+STOCK_SEARCH_VERSION_TTL = get_int_env("STOCK_SEARCH_VERSION_TTL", 5)
+
 
 #####################
 #   Security Settings (for production with HTTPS)
@@ -220,3 +273,15 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 #####################
 UPDATE_STOCKS = get_bool_env("UPDATE_STOCKS", True)
 UPDATE_STOCKS_INTERVAL = get_int_env("UPDATE_STOCKS_INTERVAL", 3600)
+ASYNC_ORDERS = get_bool_env("ASYNC_ORDERS", False)
+# Führt die Warteschlange im Webserver-Prozess aus, nur für Deployments mit einem einzigen Prozess.
+# Sonst läuft `python manage.py process_orders` einmal als eigener Prozess (siehe Procfile).
+ORDER_QUEUE_IN_WEB = get_bool_env("ORDER_QUEUE_IN_WEB", False)
+ORDER_QUEUE_BATCH_SIZE = get_int_env("ORDER_QUEUE_BATCH_SIZE", 200)
+ORDER_QUEUE_POLL_INTERVAL = get_int_env("ORDER_QUEUE_POLL_INTERVAL", 1)
+IDEMPOTENCY_KEY_TTL = get_int_env("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60)
+PRICE_TABLE_PATH = get_str_env("PRICE_TABLE_PATH")
+PRICE_TABLE_MAX_AGE = get_int_env("PRICE_TABLE_MAX_AGE", 2 * UPDATE_STOCKS_INTERVAL)
+PRICE_STORE_DIR = get_str_env(
+    "PRICE_STORE_DIR", os.path.join(BASE_DIR, "Data", "prices")
+)
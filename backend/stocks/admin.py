@@ -2,9 +2,11 @@ from django.contrib import admin
 
 from .models import (
     History,
+    LedgerEntry,
     RegistrationRequest,
     Stock,
     StockHolding,
+    StockStats,
     Team,
     Transaction,
     UserProfile,
@@ -20,6 +22,15 @@ class HistoryInline(admin.TabularInline):
         return False
 
 
+class StockStatsInline(admin.StackedInline):
+    model = StockStats
+    readonly_fields = [field.name for field in StockStats._meta.fields]
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class StockHoldingInline(admin.TabularInline):
     model = StockHolding
     extra = 0
@@ -49,7 +60,7 @@ class RegistrationRequestAdmin(admin.ModelAdmin):
 
 @admin.register(Stock)
 class StockAdmin(admin.ModelAdmin):
-    inlines = [HistoryInline]
+    inlines = [StockStatsInline, HistoryInline]
     list_display = ["name", "ticker", "current_price"]
     search_fields = ["name", "ticker"]
     readonly_fields = ["current_price"]
@@ -61,7 +72,14 @@ class TeamAdmin(admin.ModelAdmin):
     inlines = [UserProfileInline, StockHoldingInline, WatchlistInline]
     list_display = ["name", "team_member_count", "portfolio_value", "rank"]
     search_fields = ["name"]
-    readonly_fields = ["team_member_count", "portfolio_value", "code", "last_edited"]
+    readonly_fields = [
+        "team_member_count",
+        "portfolio_value",
+        "code",
+        "last_edited",
+        "trades",
+        "rank",
+    ]
     fields = [
         "name",
         "balance",
@@ -69,9 +87,19 @@ class TeamAdmin(admin.ModelAdmin):
         "code",
         "team_admin",
         "last_edited",
+        "trades",
+        "rank",
         "portfolio_history",
     ]
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Nur geänderte Felder schreiben, damit Trades seit dem Laden des Formulars erhalten
+            # bleiben.
+            obj.save(update_fields=form.changed_data)
+        else:
+            super().save_model(request, obj, form, change)
+
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -88,16 +116,19 @@ class TransactionAdmin(admin.ModelAdmin):
         "stock",
         "status",
         "transaction_type",
+        "order_type",
         "amount",
         "formatted_total_price",
     ]
-    list_filter = ["status", "transaction_type", "team", "stock"]
+    list_filter = ["status", "transaction_type", "order_type", "team", "stock"]
     ordering = ("-date",)
     search_fields = ["stock__name", "stock__ticker", "team__name"]
     readonly_fields = [
         "team",
         "stock",
         "transaction_type",
+        "order_type",
+        "trigger_price",
         "amount",
         "price",
         "fee",
@@ -108,8 +139,26 @@ class TransactionAdmin(admin.ModelAdmin):
         "stock",
         "status",
         "transaction_type",
+        "order_type",
+        "trigger_price",
         "amount",
         "price",
         "fee",
         "date",
     ]
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ["team", "stock", "cash_delta", "amount_delta", "note", "created_at"]
+    list_filter = ["team", "stock"]
+    ordering = ("-id",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,58 @@
+import hashlib
+
+from django.core.cache import cache
+
+from stocks.versions import get_versions
+
+_MISSING = object()
+
+
+def versioned_key(name, versions, parts=()):
+    """
+    Builds a cache key from the versions the cached value depends on.
+
+    Every stock update bumps the market version and every trade the version of the team, so
+    entries of older versions are never read again and simply age out of the cache. The
+    timestamps of the counters are part of the key, so a reset database cannot hit entries that
+    were stored for the same version numbers before.
+
+    Args:
+        name (str): What is cached, e.g. "ranking".
+        versions (dict): Maps the version keys the value depends on to `(version, updated_at)`
+            tuples, as returned by `get_versions`.
+        parts (iterable): Further values the cached value depends on, e.g. a page number.
+
+    Returns:
+        str: The key, or None if a counter does not exist yet and the value must not be cached.
+    """
+    tags = []
+    for key, (version, updated_at) in sorted(versions.items()):
+        if updated_at is None:
+            return None
+        tags.append(f"{key}={version}.{int(updated_at.timestamp() * 1_000_000)}")
+    digest = hashlib.sha1(repr(tuple(parts)).encode()).hexdigest()
+    return f"{name}:{','.join(tags)}:{digest}"
+
+
+def get_or_compute(name, version_keys, compute, parts=(), versions=None):
+    """
+    Returns the cached value for the current versions, computing and storing it on a miss.
+
+    Args:
+        name (str): What is cached, e.g. "ranking".
+        version_keys (list): The version keys the value depends on.
+        compute (callable): Computes the value without arguments. The value must be picklable.
+        parts (iterable): Further values the cached value depends on.
+        versions (dict): Already loaded versions, as returned by `get_versions`, to save a query.
+    """
+    if versions is None:
+        versions = get_versions(*version_keys)
+    key = versioned_key(name, {key: versions[key] for key in version_keys}, parts)
+    if key is None:
+        return compute()
+
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value)
+    return value
@@ -0,0 +1,160 @@
+import csv
+import json
+
+import zstandard
+from django.core.serializers.json import DjangoJSONEncoder
+
+from stocks.models import StockHolding, Team, Transaction
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def transaction_rows(team_id=None):
+    queryset = Transaction.objects.order_by("id")
+    if team_id is not None:
+        queryset = queryset.filter(team_id=team_id)
+    return queryset.values_list(
+        "id",
+        "date",
+        "team_id",
+        "team__name",
+        "stock__ticker",
+        "transaction_type",
+        "order_type",
+        "status",
+        "amount",
+        "price",
+        "fee",
+        "trigger_price",
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def holding_rows(team_id=None):
+    queryset = StockHolding.objects.exclude(amount=0, realized_profit=0).order_by("id")
+    if team_id is not None:
+        queryset = queryset.filter(team_id=team_id)
+    return queryset.values_list(
+        "team_id",
+        "team__name",
+        "stock__ticker",
+        "amount",
+        "total_invested",
+        "realized_profit",
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def portfolio_history_rows(team_id=None):
+    queryset = Team.objects.order_by("id")
+    if team_id is not None:
+        queryset = queryset.filter(pk=team_id)
+    # Histories can be long, so fewer teams are fetched per round trip.
+    teams = queryset.values_list("id", "name", "portfolio_history").iterator(
+        chunk_size=100
+    )
+    for team_id, name, history in teams:
+        for index, value in enumerate(history):
+            yield team_id, name, index, value
+
+
+DATASETS = {
+    "transactions": (
+        (
+            "id",
+            "date",
+            "team_id",
+            "team",
+            "ticker",
+            "transaction_type",
+            "order_type",
+            "status",
+            "amount",
+            "price",
+            "fee",
+            "trigger_price",
+        ),
+        transaction_rows,
+    ),
+    "holdings": (
+        (
+            "team_id",
+            "team",
+            "ticker",
+            "amount",
+            "total_invested",
+            "realized_profit",
+        ),
+        holding_rows,
+    ),
+    "portfolio_history": (
+        ("team_id", "team", "index", "value"),
+        portfolio_history_rows,
+    ),
+}
+
+
+class Echo:
+    """Pseudo buffer that returns what is written, so `csv.writer` produces strings."""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines):
+    """Joins lines into larger chunks to keep the number of writes low."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= ROWS_PER_WRITE:
+            yield "".join(batch).encode()
+            batch = []
+    if batch:
+        yield "".join(batch).encode()
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def zstd_compress(chunks, level=3):
+    """Compresses a stream of byte chunks on the fly."""
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(dataset, file_format, team_id=None, compress=False):
+    """
+    Streams a dataset as CSV or NDJSON.
+
+    Rows are read with server-side iteration and encoded in batches, so memory use does not
+    depend on the size of the export.
+
+    Args:
+        dataset (str): A key of `DATASETS`.
+        file_format (str): A key of `FORMATS`.
+        team_id (int): Only export the data of this team.
+        compress (bool): Compress the stream with zstandard.
+
+    Returns:
+        iterator: Byte chunks.
+
+    Raises:
+        KeyError: If the dataset or format is unknown.
+    """
+    header, rows = DATASETS[dataset]
+    lines = {"csv": _csv_lines, "ndjson": _ndjson_lines}[file_format]
+    chunks = _batched(lines(header, rows(team_id)))
+    return zstd_compress(chunks) if compress else chunks
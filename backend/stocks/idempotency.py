@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from stocks.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+def get_expiry_cutoff():
+    """Returns the creation time before which stored keys are expired."""
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def get_stored_response(user, key):
+    """
+    Returns the stored IdempotencyKey of a user, or None.
+
+    Expired keys are returned as well until they are evicted, so that callers can replace them
+    instead of running into the unique constraint.
+    """
+    return IdempotencyKey.objects.filter(user=user, key=key).first()
+
+
+def evict_expired_keys():
+    """
+    Deletes all expired idempotency keys.
+
+    Returns:
+        int: The number of deleted keys.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lt=get_expiry_cutoff()
+    ).delete()
+    return deleted
@@ -0,0 +1,66 @@
+import numpy
+import pandas
+
+MOVING_AVERAGE_WINDOWS = (20, 50, 200)
+RSI_WINDOW = 14
+VOLATILITY_WINDOW = 20
+TRADING_DAYS_PER_YEAR = 252
+
+STATS_FIELDS = (
+    *(f"sma_{window}" for window in MOVING_AVERAGE_WINDOWS),
+    *(f"ema_{window}" for window in MOVING_AVERAGE_WINDOWS),
+    f"rsi_{RSI_WINDOW}",
+    f"volatility_{VOLATILITY_WINDOW}",
+    "high_52w",
+    "low_52w",
+    "day_change",
+)
+
+
+def calculate_indicators(close: pandas.DataFrame) -> pandas.DataFrame:
+    """
+    Calculates technical indicators for all tickers at once.
+
+    Args:
+        close (DataFrame): Daily close prices, one column per ticker, ordered by date.
+
+    Returns:
+        DataFrame: One row per ticker with one column per entry of `STATS_FIELDS`.
+            Indicators without enough data are NaN.
+    """
+    close = close.ffill()
+    stats = {}
+
+    for window in MOVING_AVERAGE_WINDOWS:
+        stats[f"sma_{window}"] = (
+            close.rolling(window, min_periods=window).mean().iloc[-1]
+        )
+    for window in MOVING_AVERAGE_WINDOWS:
+        stats[f"ema_{window}"] = (
+            close.ewm(span=window, adjust=False, min_periods=window).mean().iloc[-1]
+        )
+
+    delta = close.diff()
+    smoothing = {"alpha": 1 / RSI_WINDOW, "adjust": False, "min_periods": RSI_WINDOW}
+    average_gain = delta.clip(lower=0).ewm(**smoothing).mean()
+    average_loss = (-delta.clip(upper=0)).ewm(**smoothing).mean()
+    relative_strength = average_gain.iloc[-1] / average_loss.iloc[-1]
+    stats[f"rsi_{RSI_WINDOW}"] = 100 - 100 / (1 + relative_strength)
+
+    log_returns = numpy.log(close / close.shift(1))
+    stats[f"volatility_{VOLATILITY_WINDOW}"] = log_returns.rolling(
+        VOLATILITY_WINDOW, min_periods=VOLATILITY_WINDOW
+    ).std().iloc[-1] * numpy.sqrt(TRADING_DAYS_PER_YEAR)
+
+    last_year = close.iloc[-TRADING_DAYS_PER_YEAR:]
+    stats["high_52w"] = last_year.max()
+    stats["low_52w"] = last_year.min()
+
+    if len(close) > 1:
+        stats["day_change"] = (close.iloc[-1] / close.iloc[-2] - 1) * 100
+    else:
+        stats["day_change"] = pandas.Series(numpy.nan, index=close.columns)
+
+    return pandas.DataFrame(stats, columns=STATS_FIELDS).replace(
+        [numpy.inf, -numpy.inf], numpy.nan
+    )
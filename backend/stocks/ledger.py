@@ -0,0 +1,179 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from stocks.models import LedgerEntry, LedgerSnapshot, StockHolding
+
+# Entries get their id on insert but become visible on commit, so only entries older than this
+# are snapshotted; otherwise a slow transaction could commit an entry below `last_entry_id`.
+SNAPSHOT_DELAY = timedelta(minutes=1)
+
+
+def trade_entries(transactions):
+    """Returns unsaved ledger entries for executed transactions, e.g. for `bulk_create`."""
+    entries = []
+    for ta in transactions:
+        total_price = ta.get_total_price()
+        buy = ta.transaction_type == "buy"
+        entries.append(
+            LedgerEntry(
+                team_id=ta.team_id,
+                stock_id=ta.stock_id,
+                transaction=ta,
+                cash_delta=-total_price if buy else total_price,
+                amount_delta=ta.amount if buy else -ta.amount,
+            )
+        )
+    return entries
+
+
+def record_trade(ta):
+    """Appends the cash and position delta of an executed transaction to the ledger."""
+    trade_entries([ta])[0].save()
+
+
+def get_state(team_id, at=None):
+    """
+    Returns the balance and positions of a team from its latest snapshot plus the later entries.
+
+    Args:
+        team_id (int): The team.
+        at (datetime): Point in time for historic states, or None for the current state.
+
+    Returns:
+        tuple: `(balance, positions)` with positions mapping stock ids to amounts.
+    """
+    snapshots = LedgerSnapshot.objects.filter(team_id=team_id)
+    entries = LedgerEntry.objects.filter(team_id=team_id)
+    if at is not None:
+        snapshots = snapshots.filter(created_at__lte=at)
+        entries = entries.filter(created_at__lte=at)
+
+    snapshot = snapshots.order_by("-last_entry_id").first()
+    balance = Decimal(0)
+    positions = defaultdict(int)
+    if snapshot is not None:
+        balance = snapshot.balance
+        for stock_id, amount in snapshot.positions.items():
+            positions[int(stock_id)] = amount
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+
+    return apply_entries(balance, positions, entries)
+
+
+def replay_state(team_id):
+    """Returns the balance and positions of a team from all of its entries, ignoring snapshots."""
+    return apply_entries(
+        Decimal(0), defaultdict(int), LedgerEntry.objects.filter(team_id=team_id)
+    )
+
+
+def apply_entries(balance, positions, entries):
+    """Adds the deltas of `entries` to a state, summed per stock in the database."""
+    for stock_id, cash, amount in (
+        entries.order_by()
+        .values("stock_id")
+        .annotate(cash=Sum("cash_delta"), amount=Sum("amount_delta"))
+        .values_list("stock_id", "cash", "amount")
+    ):
+        balance += cash
+        if stock_id is not None:
+            positions[stock_id] += amount
+    return balance, {
+        stock_id: amount for stock_id, amount in positions.items() if amount
+    }
+
+
+def take_snapshot(team_id, replay=False):
+    """
+    Stores the ledger state of a team up to `SNAPSHOT_DELAY` ago as a new snapshot.
+
+    Args:
+        replay (bool): Ignore existing snapshots and sum up all entries.
+
+    Returns:
+        LedgerSnapshot: The new snapshot, or None if there are no new entries.
+    """
+    entries = LedgerEntry.objects.filter(
+        team_id=team_id, created_at__lte=timezone.now() - SNAPSHOT_DELAY
+    )
+    previous = None
+    if not replay:
+        previous = (
+            LedgerSnapshot.objects.filter(team_id=team_id)
+            .order_by("-last_entry_id")
+            .first()
+        )
+        if previous is not None:
+            entries = entries.filter(id__gt=previous.last_entry_id)
+
+    last = entries.order_by("-id").values("id", "created_at").first()
+    if last is None:
+        return None
+
+    if previous is None:
+        balance, positions = Decimal(0), defaultdict(int)
+    else:
+        balance = previous.balance
+        positions = defaultdict(int, {int(k): v for k, v in previous.positions.items()})
+    balance, positions = apply_entries(
+        balance, positions, entries.filter(id__lte=last["id"])
+    )
+    return LedgerSnapshot.objects.create(
+        team_id=team_id,
+        last_entry_id=last["id"],
+        balance=balance,
+        positions={str(stock_id): amount for stock_id, amount in positions.items()},
+        created_at=last["created_at"],
+    )
+
+
+def take_snapshots():
+    """
+    Snapshots every team with entries after its latest snapshot.
+
+    Returns:
+        int: The number of new snapshots.
+    """
+    last_snapshot = dict(
+        LedgerSnapshot.objects.values("team_id")
+        .annotate(last_entry_id=Max("last_entry_id"))
+        .values_list("team_id", "last_entry_id")
+    )
+    last_entry = (
+        LedgerEntry.objects.values("team_id")
+        .annotate(last_entry_id=Max("id"))
+        .values_list("team_id", "last_entry_id")
+    )
+    created = 0
+    for team_id, last_entry_id in last_entry:
+        if last_entry_id > last_snapshot.get(team_id, 0):
+            created += take_snapshot(team_id) is not None
+    return created
+
+
+def verify_team(team, balance, positions):
+    """
+    Compares a ledger state with the stored counters of a team.
+
+    Returns:
+        list: Human-readable differences, empty if the counters match the ledger.
+    """
+    differences = []
+    if balance != team.balance:
+        differences.append(f"balance {team.balance} != ledger {balance}")
+
+    holdings = dict(
+        StockHolding.objects.filter(team=team)
+        .exclude(amount=0)
+        .values_list("stock_id", "amount")
+    )
+    for stock_id in sorted(holdings.keys() | positions.keys()):
+        stored = holdings.get(stock_id, 0)
+        booked = positions.get(stock_id, 0)
+        if stored != booked:
+            differences.append(f"stock {stock_id}: holding {stored} != ledger {booked}")
+    return differences
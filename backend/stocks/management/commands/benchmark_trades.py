@@ -0,0 +1,119 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, When
+
+from stocks.models import Stock, StockHolding, Team, Transaction
+from stocks.services import execute_transaction
+
+BENCHMARK_NAME = "benchmark"
+
+
+class Command(BaseCommand):
+    help = (
+        "Executes trades of one team from several threads in parallel, reports the trades per "
+        "second and verifies that no balance or holding update was lost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--trades", type=int, default=100, help="Trades per thread."
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the benchmark data."
+        )
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        trades = options["trades"]
+
+        team = Team.objects.create(name=BENCHMARK_NAME, balance=Decimal("100000.00"))
+        stock = Stock.objects.create(
+            name=BENCHMARK_NAME, ticker="BENCH", current_price=Decimal("10.00")
+        )
+        StockHolding.objects.create(team=team, stock=stock, amount=threads * trades)
+        start_balance = team.balance
+        start_amount = threads * trades
+        failures = []
+
+        def worker(index):
+            try:
+                for trade in range(trades):
+                    transaction_type = "buy" if (index + trade) % 2 else "sell"
+                    ta = Transaction.objects.create(
+                        team=Team.objects.get(pk=team.pk),
+                        stock=stock,
+                        transaction_type=transaction_type,
+                        amount=1 + trade % 3,
+                        price=stock.current_price,
+                        fee=Decimal("1.00"),
+                    )
+                    execute_transaction(ta)
+            except Exception as e:
+                failures.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start_time = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        duration = time.perf_counter() - start_time
+
+        try:
+            self.report(team, stock, start_balance, start_amount, duration, failures)
+        finally:
+            if not options["keep"]:
+                team.delete()
+                stock.delete()
+
+    def report(self, team, stock, start_balance, start_amount, duration, failures):
+        closed = Transaction.objects.filter(team=team, stock=stock, status="closed")
+        totals = closed.aggregate(
+            cash=Sum(
+                Case(
+                    When(
+                        transaction_type="buy",
+                        then=-(F("amount") * F("price") + F("fee")),
+                    ),
+                    default=F("amount") * F("price") - F("fee"),
+                    output_field=DecimalField(),
+                )
+            ),
+            amount=Sum(
+                Case(
+                    When(transaction_type="buy", then=F("amount")),
+                    default=-F("amount"),
+                    output_field=IntegerField(),
+                )
+            ),
+        )
+        executed = Transaction.objects.filter(team=team).count()
+        team.refresh_from_db()
+        holding = StockHolding.objects.get(team=team, stock=stock)
+
+        expected_balance = start_balance + (totals["cash"] or 0)
+        expected_amount = start_amount + (totals["amount"] or 0)
+
+        self.stdout.write(
+            f"{executed} trades ({closed.count()} closed) in {duration:.2f}s: "
+            f"{executed / duration:.1f} trades/s"
+        )
+        for failure in failures:
+            self.stderr.write(f"Worker failed: {failure}")
+
+        if team.balance != expected_balance or holding.amount != expected_amount:
+            self.stderr.write(
+                self.style.ERROR(
+                    f"Lost updates: balance {team.balance} (expected {expected_balance}), "
+                    f"holding {holding.amount} (expected {expected_amount})."
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("No lost updates."))
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks.exports import DATASETS, FORMATS, export
+
+
+class Command(BaseCommand):
+    help = "Streams transactions, holdings or portfolio history as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(DATASETS))
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--team", type=int, help="Only export this team.")
+        parser.add_argument(
+            "--zstd", action="store_true", help="Compress the output with zstandard."
+        )
+        parser.add_argument(
+            "--output", "-o", help="Output file, defaults to standard output."
+        )
+
+    def handle(self, *args, **options):
+        chunks = export(
+            options["dataset"],
+            options["format"],
+            team_id=options["team"],
+            compress=options["zstd"],
+        )
+        if not options["output"]:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        try:
+            with open(options["output"], "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+        except OSError as e:
+            raise CommandError(f"Could not write {options['output']}: {e}")
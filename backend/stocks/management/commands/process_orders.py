@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from stocks.order_queue import drain_order_queue, order_queue_loop
+
+
+class Command(BaseCommand):
+    help = "Executes market orders that were queued in async order mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue once and exit instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["once"]:
+            order_queue_loop()
+            return
+
+        start_time = time.perf_counter()
+        total = 0
+        while processed := drain_order_queue():
+            total += processed
+        self.stdout.write(
+            f"Executed {total} orders in {time.perf_counter() - start_time:.2f}s."
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks.ledger import get_state, replay_state, take_snapshot, verify_team
+from stocks.models import Team
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays the ledger of every team, verifies it against the snapshots and the stored "
+        "balance and holdings, and stores the replayed state as a new snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-snapshot",
+            action="store_true",
+            help="Only verify, do not store new snapshots.",
+        )
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for team in Team.objects.order_by("pk"):
+            balance, positions = replay_state(team.pk)
+            differences = verify_team(team, balance, positions)
+            if get_state(team.pk) != (balance, positions):
+                differences.append("latest snapshot plus tail differs from the replay")
+            if differences:
+                mismatches += 1
+                self.stderr.write(f"{team} ({team.pk}): {'; '.join(differences)}")
+
+            if not options["no_snapshot"]:
+                take_snapshot(team.pk, replay=True)
+
+        if mismatches:
+            raise CommandError(f"{mismatches} teams do not match their ledger.")
+        self.stdout.write(self.style.SUCCESS("All teams match their ledger."))
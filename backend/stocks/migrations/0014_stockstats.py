@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0013_dataversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockStats",
+            fields=[
+                (
+                    "stock",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="stocks.stock",
+                    ),
+                ),
+                ("sma_20", models.FloatField(blank=True, null=True)),
+                ("sma_50", models.FloatField(blank=True, null=True)),
+                ("sma_200", models.FloatField(blank=True, null=True)),
+                ("ema_20", models.FloatField(blank=True, null=True)),
+                ("ema_50", models.FloatField(blank=True, null=True)),
+                ("ema_200", models.FloatField(blank=True, null=True)),
+                ("rsi_14", models.FloatField(blank=True, null=True)),
+                ("volatility_20", models.FloatField(blank=True, null=True)),
+                ("high_52w", models.FloatField(blank=True, null=True)),
+                ("low_52w", models.FloatField(blank=True, null=True)),
+                ("day_change", models.FloatField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_holdings(apps, schema_editor):
+    StockHolding = apps.get_model("stocks", "StockHolding")
+    duplicates = (
+        StockHolding.objects.values("team", "stock")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        holdings = list(
+            StockHolding.objects.filter(
+                team=duplicate["team"], stock=duplicate["stock"]
+            ).order_by("id")
+        )
+        holdings[0].amount = sum(holding.amount for holding in holdings)
+        holdings[0].save()
+        StockHolding.objects.filter(pk__in=[h.pk for h in holdings[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0014_stockstats"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_holdings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="stockholding",
+            constraint=models.UniqueConstraint(
+                fields=("team", "stock"), name="unique_stock_holding"
+            ),
+        ),
+    ]
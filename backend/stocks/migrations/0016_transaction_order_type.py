@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0015_unique_stock_holding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="order_type",
+            field=models.CharField(
+                choices=[("market", "Market"), ("limit", "Limit"), ("stop", "Stop")],
+                default="market",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="trigger_price",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=20, null=True
+            ),
+        ),
+    ]
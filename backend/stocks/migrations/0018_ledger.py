@@ -0,0 +1,120 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_ledgers(apps, schema_editor):
+    """Books the current balance and holdings of every existing team as opening entries."""
+    Team = apps.get_model("stocks", "Team")
+    StockHolding = apps.get_model("stocks", "StockHolding")
+    LedgerEntry = apps.get_model("stocks", "LedgerEntry")
+
+    entries = [
+        LedgerEntry(team_id=team_id, cash_delta=balance, note="opening")
+        for team_id, balance in Team.objects.values_list("pk", "balance")
+    ]
+    entries += [
+        LedgerEntry(
+            team_id=team_id, stock_id=stock_id, amount_delta=amount, note="opening"
+        )
+        for team_id, stock_id, amount in StockHolding.objects.exclude(
+            amount=0
+        ).values_list("team_id", "stock_id", "amount")
+    ]
+    LedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0017_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "cash_delta",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+                ("amount_delta", models.IntegerField(default=0)),
+                ("note", models.CharField(blank=True, max_length=100)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="stocks.stock",
+                    ),
+                ),
+                (
+                    "team",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger",
+                        to="stocks.team",
+                    ),
+                ),
+                (
+                    "transaction",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="stocks.transaction",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["team", "id"], name="ledger_team_id")],
+            },
+        ),
+        migrations.CreateModel(
+            name="LedgerSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_entry_id", models.BigIntegerField()),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=20)),
+                ("positions", models.JSONField(default=dict)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "team",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="stocks.team",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["team", "last_entry_id"],
+                        name="ledger_snapshot_team_entry",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
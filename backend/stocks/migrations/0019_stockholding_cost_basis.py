@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:55
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def backfill_cost_basis(apps, schema_editor):
+    """Replays the closed transactions of every holding with the average cost method."""
+    StockHolding = apps.get_model("stocks", "StockHolding")
+    Transaction = apps.get_model("stocks", "Transaction")
+
+    holdings = {
+        (holding.team_id, holding.stock_id): holding
+        for holding in StockHolding.objects.all()
+    }
+    state = {}
+    transactions = (
+        Transaction.objects.filter(status="closed")
+        .order_by("date", "id")
+        .values_list(
+            "team_id", "stock_id", "transaction_type", "amount", "price", "fee"
+        )
+    )
+    for (
+        team_id,
+        stock_id,
+        transaction_type,
+        amount,
+        price,
+        fee,
+    ) in transactions.iterator():
+        held, invested, realized = state.get(
+            (team_id, stock_id), (0, Decimal(0), Decimal(0))
+        )
+        if transaction_type == "buy":
+            held += amount
+            invested += amount * price + fee
+        elif held:
+            sold = min(amount, held)
+            sold_cost = (invested * sold / held).quantize(
+                Decimal("0.01"), ROUND_HALF_UP
+            )
+            held -= sold
+            invested -= sold_cost
+            realized += amount * price - fee - sold_cost
+        state[(team_id, stock_id)] = (held, invested, realized)
+
+    changed = []
+    for key, (held, invested, realized) in state.items():
+        holding = holdings.get(key)
+        if holding is None:
+            continue
+        # Holdings that drifted from their transactions keep their amount; the cost basis is
+        # scaled to the shares that are actually held.
+        if held and holding.amount != held:
+            invested = invested * holding.amount / held
+        holding.total_invested = invested if holding.amount else Decimal(0)
+        holding.realized_profit = realized
+        changed.append(holding)
+    StockHolding.objects.bulk_update(
+        changed,
+        ["total_invested", "realized_profit"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0018_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stockholding",
+            name="realized_profit",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.AddField(
+            model_name="stockholding",
+            name="total_invested",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.RunPython(backfill_cost_basis, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0019_stockholding_cost_basis"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["team", "date"], name="transaction_team_date"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["team", "stock", "date"], name="transaction_team_stock_date"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_trades(apps, schema_editor):
+    Team = apps.get_model("stocks", "Team")
+    Transaction = apps.get_model("stocks", "Transaction")
+    trades = (
+        Transaction.objects.filter(team=OuterRef("pk"))
+        .order_by()
+        .values("team")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Team.objects.update(trades=Coalesce(Subquery(trades), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0020_transaction_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="team",
+            name="rank",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="team",
+            name="trades",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_trades, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# GIN indexes on the upper-cased columns serve both the `%` similarity operator of pg_trgm and
+# the `UPPER(...) LIKE` queries Django generates for `icontains`.
+INDEXES = {
+    "stocks_stock_name_trgm": "name",
+    "stocks_stock_ticker_trgm": "ticker",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index, column in INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {index} ON stocks_stock "
+            f'USING gin (UPPER("{column}") gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for index in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0021_team_trades_rank"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -1,11 +1,14 @@
 import binascii
 import os
 import uuid
+from bisect import bisect_right
+from decimal import ROUND_HALF_UP, Decimal
 
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models import F, Sum
 from django.db.models.aggregates import Count
@@ -14,6 +17,8 @@ from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
+from stocks.snapshot import get_market_snapshot, get_published_snapshot
+
 USER = get_user_model()
 
 DEFAULT_FRONTEND_URL = (
@@ -21,6 +26,7 @@ DEFAULT_FRONTEND_URL = (
 )
 FEE_PERCENTAGE = 0.001
 MINIMUM_FEE = 15
+CENT = Decimal("0.01")
 
 
 class RegistrationRequest(models.Model):
@@ -81,11 +87,14 @@ class Stock(models.Model):
     def __str__(self):
         return self.name
 
-    def calculate_fee(self, amount):
+    def calculate_fee(self, amount, price=None):
         """
         Berechnet die Transaktionsgebühr für den Kauf oder Verkauf einer Aktie.
+
+        Ohne `price` wird der aktuelle Kurs verwendet, bei Limit- und Stop-Orders der Auslösekurs.
         """
-        fee = float(self.current_price) * amount * FEE_PERCENTAGE
+        price = self.current_price if price is None else price
+        fee = float(price) * amount * FEE_PERCENTAGE
         return max(MINIMUM_FEE, round(fee))
 
 
@@ -117,6 +126,44 @@ class History(models.Model):
         return f"{self.stock.name} - {self.name}"
 
 
+class StockStats(models.Model):
+    """
+    Technische Kennzahlen einer Aktie, die bei jedem Kurs-Update neu berechnet werden.
+    """
+
+    stock = models.OneToOneField(
+        Stock, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    sma_20 = models.FloatField(null=True, blank=True)
+    sma_50 = models.FloatField(null=True, blank=True)
+    sma_200 = models.FloatField(null=True, blank=True)
+    ema_20 = models.FloatField(null=True, blank=True)
+    ema_50 = models.FloatField(null=True, blank=True)
+    ema_200 = models.FloatField(null=True, blank=True)
+    rsi_14 = models.FloatField(null=True, blank=True)
+    volatility_20 = models.FloatField(null=True, blank=True)
+    high_52w = models.FloatField(null=True, blank=True)
+    low_52w = models.FloatField(null=True, blank=True)
+    day_change = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats of {self.stock.name}"
+
+
+class DataVersion(models.Model):
+    """
+    Versionszähler für Daten, die sich nur durch ein Kurs-Update oder Aktionen eines Teams ändern.
+    """
+
+    key = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} (v{self.version})"
+
+
 class Team(models.Model):
     """
     Repräsentiert ein Team von Spielern mit einem gemeinsamen Portfolio.
@@ -136,12 +183,32 @@ class Team(models.Model):
         blank=True,
     )
     last_edited = models.DateTimeField(auto_now=True)
+    # Zähler für die Transaktionen des Teams, gepflegt über Signale und `execute_batch`.
+    trades = models.PositiveIntegerField(default=0)
+    # Wird vom Stock-Updater nach jedem Durchlauf gesetzt, siehe `update_team_ranks`.
+    rank = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return self.name
 
-    def get_portfolio_value(self):
-        """Berechnet den Gesamtwert des Portfolios (Bargeld + Aktien)."""
+    def get_portfolio_value(self, snapshot=None):
+        """
+        Berechnet den Gesamtwert des Portfolios (Bargeld + Aktien).
+
+        Mit `snapshot` werden die Aktien zu dessen Kursen bewertet. Ohne wird der Snapshot der
+        geteilten Preistabelle verwendet, falls der Stock-Updater eine veröffentlicht, und sonst
+        die aktuellen Kurse der Datenbank.
+        """
+        if snapshot is None:
+            snapshot = get_published_snapshot()
+        if snapshot is not None:
+            holdings = dict(
+                self.holdings.filter(amount__gt=0).values_list("stock_id", "amount")
+            )
+            stock_value = snapshot.value(holdings)
+            if stock_value is not None:
+                return self.balance + stock_value
+
         stock_value = (
             self.holdings.aggregate(
                 total_value=Sum(F("stock__current_price") * F("amount"))
@@ -150,11 +217,21 @@ class Team(models.Model):
         )
         return self.balance + stock_value
 
-    def calculate_rank(self):
+    def calculate_rank(self, snapshot=None):
         """Berechnet den Rang des Teams basierend auf dem Portfoliowert im Vergleich zu anderen Teams."""
-        current_portfolio_value = self.get_portfolio_value()
+        if snapshot is None:
+            snapshot = get_market_snapshot()
+        current_portfolio_value = self.get_portfolio_value(snapshot)
         queryset = get_team_ranking_queryset()
 
+        if snapshot is not None:
+            # Alle Teams werden zu denselben Kursen bewertet wie das eigene.
+            portfolio_values = get_portfolio_values(queryset, snapshot)
+            higher_ranked_teams = sum(
+                value > current_portfolio_value for value in portfolio_values.values()
+            )
+            return higher_ranked_teams + 1
+
         higher_ranked_teams = (
             queryset.annotate(
                 portfolio_value=models.Case(
@@ -185,15 +262,16 @@ class Team(models.Model):
         """Gibt den formatierten Gesamtdepotwert für die Admin-Oberfläche zurück."""
         return f"{self.get_portfolio_value():.2f}€"
 
-    @admin.display(description="Rang")
-    def rank(self):
-        """Gibt den Rang des Teams zurück."""
-        return self.calculate_rank()
+    def get_rank(self):
+        """Gibt den zuletzt gespeicherten Rang zurück und berechnet ihn nur, falls noch keiner existiert."""
+        if self.rank is None:
+            return self.calculate_rank()
+        return self.rank
 
     def update_balance(self, amount_change):
-        """Aktualisiert den Kontostand des Teams."""
+        """Aktualisiert den Kontostand des Teams atomar in der Datenbank."""
+        Team.objects.filter(pk=self.pk).update(balance=F("balance") + amount_change)
         self.balance += amount_change
-        self.save()
 
 
 def get_team_ranking_queryset():
@@ -207,6 +285,64 @@ def get_team_ranking_queryset():
     return queryset
 
 
+def get_portfolio_values(teams, snapshot=None):
+    """
+    Berechnet die Portfoliowerte mehrerer Teams mit einer Abfrage für alle Bestände.
+
+    Ohne `snapshot`, oder für Teams mit Aktien, die im Snapshot fehlen, wird
+    `Team.get_portfolio_value` einzeln aufgerufen.
+
+    Args:
+        teams (iterable): Die Teams, z.B. eine QuerySet.
+        snapshot (MarketSnapshot): Die Kurse, zu denen bewertet wird.
+
+    Returns:
+        dict: Ordnet den Team-IDs ihren Portfoliowert zu.
+    """
+    teams = list(teams)
+    if snapshot is None:
+        return {team.pk: team.get_portfolio_value() for team in teams}
+
+    holdings = {team.pk: {} for team in teams}
+    for team_id, stock_id, amount in StockHolding.objects.filter(
+        team__in=teams, amount__gt=0
+    ).values_list("team_id", "stock_id", "amount"):
+        holdings[team_id][stock_id] = amount
+
+    portfolio_values = {}
+    for team in teams:
+        stock_value = snapshot.value(holdings[team.pk])
+        if stock_value is None:
+            portfolio_values[team.pk] = team.get_portfolio_value()
+        else:
+            portfolio_values[team.pk] = team.balance + stock_value
+    return portfolio_values
+
+
+def update_team_ranks(portfolio_values):
+    """
+    Speichert den Rang aller Teams anhand ihrer Portfoliowerte.
+
+    Wie bei `Team.calculate_rank` ist der Rang die Anzahl der Teams im Ranking mit höherem Wert
+    plus eins. Teams außerhalb des Rankings erhalten so den Rang, den sie darin hätten.
+
+    Args:
+        portfolio_values (dict): Ordnet den Team-IDs ihren aktuellen Portfoliowert zu.
+    """
+    ranked_ids = set(get_team_ranking_queryset().values_list("pk", flat=True))
+    ranked_values = sorted(
+        value for team_id, value in portfolio_values.items() if team_id in ranked_ids
+    )
+    teams = [
+        Team(
+            pk=team_id,
+            rank=len(ranked_values) - bisect_right(ranked_values, value) + 1,
+        )
+        for team_id, value in portfolio_values.items()
+    ]
+    Team.objects.bulk_update(teams, ["rank"], batch_size=500)
+
+
 @receiver(pre_save, sender=Team)
 def generate_team_code(sender, instance, **kwargs):
     """
@@ -256,14 +392,53 @@ class StockHolding(models.Model):
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="holdings")
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
     amount = models.IntegerField(default=0)
+    total_invested = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    realized_profit = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["team", "stock"], name="unique_stock_holding"
+            )
+        ]
 
     def __str__(self):
         return f"{self.team.name} - {self.stock.name} ({self.amount})"
 
     def adjust_amount(self, quantity):
-        """Passt die Anzahl der gehaltenen Aktien an."""
+        """Passt die Anzahl der gehaltenen Aktien atomar in der Datenbank an."""
+        StockHolding.objects.filter(pk=self.pk).update(amount=F("amount") + quantity)
         self.amount += quantity
-        self.save()
+
+    def record_purchase(self, quantity, cost):
+        """Bucht einen Kauf inklusive Gebühren in den Einstandswert ein (ohne zu speichern)."""
+        self.amount += quantity
+        self.total_invested += cost
+
+    def record_sale(self, quantity, proceeds):
+        """
+        Bucht einen Verkauf zum Durchschnittskurs aus und realisiert den Gewinn (ohne zu speichern).
+
+        Entspricht `stocks.services.sale_cost` in der Datenbank.
+        """
+        sold_cost = (self.total_invested * quantity / self.amount).quantize(
+            CENT, ROUND_HALF_UP
+        )
+        self.amount -= quantity
+        self.total_invested -= sold_cost
+        self.realized_profit += proceeds - sold_cost
+
+    @property
+    def average_cost(self):
+        """Durchschnittlicher Einstandspreis je gehaltener Aktie inklusive Gebühren."""
+        if not self.amount:
+            return Decimal(0)
+        return (self.total_invested / self.amount).quantize(CENT, ROUND_HALF_UP)
+
+    def get_unrealized_profit(self, price=None):
+        """Buchgewinn der gehaltenen Aktien zum aktuellen (oder angegebenen) Kurs."""
+        price = self.stock.current_price if price is None else price
+        return self.amount * price - self.total_invested
 
 
 class Transaction(models.Model):
@@ -283,11 +458,23 @@ class Transaction(models.Model):
         ("sell", "Verkaufen"),
     )
 
+    ORDER_TYPE_CHOICES = (
+        ("market", "Market"),
+        ("limit", "Limit"),
+        ("stop", "Stop"),
+    )
+
     team = models.ForeignKey(Team, on_delete=models.CASCADE)
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
 
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="open")
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPE_CHOICES)
+    order_type = models.CharField(
+        max_length=10, choices=ORDER_TYPE_CHOICES, default="market"
+    )
+    trigger_price = models.DecimalField(
+        max_digits=20, decimal_places=2, null=True, blank=True
+    )
 
     amount = models.IntegerField(default=0)
     price = models.DecimalField(max_digits=20, decimal_places=2, default=0)
@@ -297,6 +484,14 @@ class Transaction(models.Model):
     errors = models.TextField(blank=True)
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["team", "date"], name="transaction_team_date"),
+            models.Index(
+                fields=["team", "stock", "date"], name="transaction_team_stock_date"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.team.name} - {self.stock.name} ({self.amount})"
 
@@ -310,3 +505,81 @@ class Transaction(models.Model):
     def formatted_total_price(self):
         """Gibt den formatierten Gesamtpreis für die Admin-Oberfläche zurück."""
         return f"{self.get_total_price():.2f}€"
+
+
+class LedgerEntry(models.Model):
+    """
+    Unveränderliche Buchung einer Änderung von Kontostand und/oder Aktienbestand eines Teams.
+
+    `Team.balance` und `StockHolding.amount` sind Zähler, die sich aus der Summe dieser
+    Buchungen ergeben müssen. Ohne Aktie ist `amount_delta` immer 0.
+    """
+
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="ledger")
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, null=True, blank=True)
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    cash_delta = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    amount_delta = models.IntegerField(default=0)
+    note = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["team", "id"], name="ledger_team_id")]
+
+    def __str__(self):
+        return f"{self.team.name}: {self.cash_delta}€, {self.amount_delta} Aktien"
+
+
+class LedgerSnapshot(models.Model):
+    """
+    Zustand eines Teams nach allen Buchungen bis einschließlich `last_entry_id`.
+
+    Kontostand und Bestände ergeben sich aus dem neuesten Snapshot und den danach folgenden
+    Buchungen, ohne alle Transaktionen lesen zu müssen.
+    """
+
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="snapshots")
+    last_entry_id = models.BigIntegerField()
+    balance = models.DecimalField(max_digits=20, decimal_places=2)
+    positions = models.JSONField(default=dict)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["team", "last_entry_id"], name="ledger_snapshot_team_entry"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.team.name} bis Buchung {self.last_entry_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Gespeichertes Ergebnis einer Anfrage mit `Idempotency-Key`-Header.
+
+    Wiederholt ein Client die Anfrage mit demselben Schlüssel, wird diese Antwort zurückgegeben,
+    ohne die Order erneut zu validieren oder auszuführen.
+    """
+
+    user = models.ForeignKey(USER, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_idempotency_key"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.key}"
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from stocks.models import Transaction
+from stocks.services import execute_transaction
+
+
+def queued_orders():
+    """Market orders that were accepted in async mode and are waiting for execution."""
+    return Transaction.objects.filter(status="open", order_type="market")
+
+
+def drain_order_queue(batch_size=None):
+    """
+    Executes up to `batch_size` queued market orders in one database transaction.
+
+    The orders are executed in the order they were placed, at the current price. Every order
+    runs in its own savepoint, so a failing order is stored with status `error` without
+    affecting the others, while the whole batch shares one commit. Rows locked by another
+    worker are skipped, so several workers can drain the queue concurrently.
+
+    Every order's status is read again under its row lock before it is executed, in case
+    another worker executed it since it was selected. This also covers SQLite, which ignores
+    `select_for_update`.
+
+    Returns:
+        int: The number of processed orders.
+    """
+    batch_size = batch_size or settings.ORDER_QUEUE_BATCH_SIZE
+    with transaction.atomic():
+        orders = list(
+            queued_orders()
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("team", "stock")
+            .order_by("id")[:batch_size]
+        )
+        processed = 0
+        for order in orders:
+            status = (
+                Transaction.objects.select_for_update()
+                .filter(pk=order.pk)
+                .values_list("status", flat=True)
+                .first()
+            )
+            if status != "open":
+                continue
+            order.price = order.stock.current_price
+            order.fee = order.stock.calculate_fee(order.amount)
+            execute_transaction(order)
+            processed += 1
+    return processed
+
+
+def order_queue_loop():
+    print("Starting order queue worker...")
+    while True:
+        try:
+            processed = drain_order_queue()
+        except Exception as e:
+            print(f"Error while executing queued orders: {e}")
+            processed = 0
+
+        # A full batch means more orders are waiting, so only sleep once the queue is empty.
+        if processed < settings.ORDER_QUEUE_BATCH_SIZE:
+            time.sleep(settings.ORDER_QUEUE_POLL_INTERVAL)
+
+
+_worker = None
+
+
+def start_order_queue_worker():
+    """
+    Starts `order_queue_loop` in a daemon thread of the web server process.
+
+    Only with `ASYNC_ORDERS` and `ORDER_QUEUE_IN_WEB` set, as every gunicorn worker imports the
+    entry point and would start its own poller. Deployments with several processes run the
+    `process_orders` command once instead.
+    """
+    global _worker
+    if not (settings.ASYNC_ORDERS and settings.ORDER_QUEUE_IN_WEB):
+        return
+    if _worker is not None:
+        return
+    _worker = threading.Thread(target=order_queue_loop, daemon=True)
+    _worker.start()
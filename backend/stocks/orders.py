@@ -0,0 +1,173 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from stocks.models import Stock, Transaction
+from stocks.services import execute_transaction, transaction_error
+
+PENDING_ORDER_TYPES = ("limit", "stop")
+
+# Orders get their id on insert but become visible on commit, so a slow transaction can commit an
+# order below ids that were already loaded. Orders younger than this are reloaded on every refresh.
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+def triggers_on_rise(transaction_type, order_type):
+    """
+    Returns True if the order triggers once the price rises to its trigger price.
+
+    Sell limits and buy stops trigger at `price >= trigger_price`, buy limits and sell stops at
+    `price <= trigger_price`.
+    """
+    return (transaction_type == "sell") == (order_type == "limit")
+
+
+class OrderBook:
+    """
+    Open limit and stop orders, indexed per stock in two price-sorted heaps.
+
+    `rising` is a min-heap of orders that trigger when the price reaches their trigger price from
+    below, `falling` a max-heap (negated prices) of orders that trigger from above. A tick only
+    pops the orders that actually cross, so its cost does not depend on the number of open orders.
+    """
+
+    def __init__(self):
+        self.rising = defaultdict(list)
+        self.falling = defaultdict(list)
+        self.last_id = 0
+        # All orders up to this id were loaded once they were older than `REFRESH_OVERLAP`.
+        self.settled_id = 0
+        # Ids above `settled_id` that were already added, so reloads do not add them twice.
+        self.known = set()
+
+    def __len__(self):
+        return sum(map(len, self.rising.values())) + sum(
+            map(len, self.falling.values())
+        )
+
+    def add(self, order_id, stock_id, transaction_type, order_type, trigger_price):
+        if order_id <= self.settled_id or order_id in self.known:
+            return
+        self.known.add(order_id)
+        self._push(order_id, stock_id, transaction_type, order_type, trigger_price)
+
+    def _push(self, order_id, stock_id, transaction_type, order_type, trigger_price):
+        if triggers_on_rise(transaction_type, order_type):
+            heapq.heappush(self.rising[stock_id], (trigger_price, order_id))
+        else:
+            heapq.heappush(self.falling[stock_id], (-trigger_price, order_id))
+        self.last_id = max(self.last_id, order_id)
+
+    def refresh(self):
+        """
+        Adds the open orders that were placed since the last refresh.
+
+        Orders placed within `REFRESH_OVERLAP` are queried again, so orders that were committed
+        late with a lower id are still found.
+        """
+        cutoff = timezone.now() - REFRESH_OVERLAP
+        orders = Transaction.objects.filter(
+            status="open",
+            order_type__in=PENDING_ORDER_TYPES,
+            trigger_price__isnull=False,
+            id__gt=self.settled_id,
+        ).values_list(
+            "id", "stock_id", "transaction_type", "order_type", "trigger_price", "date"
+        )
+        settled_id = self.settled_id
+        for *order, date in orders:
+            self.add(*order)
+            if date <= cutoff:
+                settled_id = max(settled_id, order[0])
+        self.settled_id = settled_id
+        self.known = {order_id for order_id in self.known if order_id > settled_id}
+
+    def restore(self, order_ids):
+        """
+        Puts popped orders back that are still open, e.g. after their execution was rolled back.
+
+        `refresh` does not load them again, as their ids are settled or known already.
+        """
+        orders = Transaction.objects.filter(
+            pk__in=order_ids, status="open", trigger_price__isnull=False
+        ).values_list(
+            "id", "stock_id", "transaction_type", "order_type", "trigger_price"
+        )
+        for order in orders:
+            self._push(*order)
+
+    def pop_triggered(self, stock_id, price):
+        """Removes and returns the ids of all orders of a stock that trigger at `price`."""
+        triggered = []
+        rising = self.rising.get(stock_id)
+        while rising and rising[0][0] <= price:
+            triggered.append(heapq.heappop(rising)[1])
+        falling = self.falling.get(stock_id)
+        while falling and -falling[0][0] >= price:
+            triggered.append(heapq.heappop(falling)[1])
+        return triggered
+
+    def stock_ids(self):
+        return {stock_id for stock_id, heap in self.rising.items() if heap} | {
+            stock_id for stock_id, heap in self.falling.items() if heap
+        }
+
+
+order_book = OrderBook()
+
+
+def match_orders(book=order_book):
+    """
+    Executes all open orders whose trigger price was crossed by the current prices.
+
+    All triggered orders are executed at the current price in one database transaction, each in
+    its own savepoint: an order that fails with an unexpected error is marked as failed and the
+    others still execute. If the transaction as a whole fails, the orders go back into the book.
+    Orders that were canceled in the meantime are skipped.
+
+    Returns:
+        int: The number of executed orders, without orders that failed with an error.
+    """
+    book.refresh()
+    stock_ids = book.stock_ids()
+    if not stock_ids:
+        return 0
+
+    prices = dict(
+        Stock.objects.filter(pk__in=stock_ids, current_price__gt=0).values_list(
+            "pk", "current_price"
+        )
+    )
+    triggered = []
+    for stock_id, price in prices.items():
+        triggered += book.pop_triggered(stock_id, price)
+    if not triggered:
+        return 0
+
+    try:
+        with transaction.atomic():
+            orders = (
+                Transaction.objects.select_for_update(of=("self",))
+                .filter(pk__in=triggered, status="open")
+                .select_related("team", "stock")
+                .order_by("id")
+            )
+            executed = 0
+            for order in orders:
+                order.price = order.stock.current_price
+                order.fee = order.stock.calculate_fee(order.amount)
+                try:
+                    # An unexpected error only rolls back this order, not the whole batch.
+                    with transaction.atomic():
+                        execute_transaction(order)
+                except Exception as e:
+                    print(f"Error while executing order {order.pk}: {e}")
+                    transaction_error(order, f"Fehler bei der Ausführung: {e}")
+                executed += order.status == "closed"
+    except Exception:
+        book.restore(triggered)
+        raise
+    return executed
@@ -0,0 +1,195 @@
+import json
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import numpy
+from django.conf import settings
+from django.utils.text import slugify
+
+
+class PriceMatrix:
+    """
+    Read-only view on the close prices of one history interval.
+
+    The values are a `time × tickers` float64 matrix (one column per ticker, like the yfinance
+    DataFrame), so time ranges are contiguous row slices and the latest prices are the last row.
+    Missing prices are NaN.
+    """
+
+    def __init__(self, tickers, times, values):
+        self.tickers = list(tickers)
+        self.times = numpy.asarray(times, dtype="int64")
+        self.values = values
+        self.columns = {ticker: column for column, ticker in enumerate(self.tickers)}
+
+    def __len__(self):
+        return len(self.times)
+
+    def column(self, ticker):
+        """Returns the column index of a ticker or None if the ticker is unknown."""
+        return self.columns.get(ticker)
+
+    def series(self, ticker):
+        """Returns the price series of a ticker as a view without NaN filtering, or None."""
+        column = self.column(ticker)
+        if column is None:
+            return None
+        return self.values[:, column]
+
+    def between(self, start=None, end=None):
+        """
+        Returns the rows with `start <= time < end` as a new PriceMatrix sharing the same memory.
+
+        Args:
+            start (int): Unix timestamp in seconds, or None for the beginning.
+            end (int): Unix timestamp in seconds, or None for the end.
+        """
+        first = 0 if start is None else numpy.searchsorted(self.times, start, "left")
+        last = (
+            len(self.times)
+            if end is None
+            else numpy.searchsorted(self.times, end, "left")
+        )
+        return PriceMatrix(
+            self.tickers, self.times[first:last], self.values[first:last]
+        )
+
+    def latest(self):
+        """Returns the last known (non-NaN) price of every ticker, NaN if there is none."""
+        if not len(self.times):
+            return numpy.full(len(self.tickers), numpy.nan)
+
+        known = ~numpy.isnan(self.values)
+        last_rows = len(self.times) - 1 - numpy.argmax(known[::-1], axis=0)
+        latest = self.values[last_rows, numpy.arange(len(self.tickers))]
+        return numpy.where(known.any(axis=0), latest, numpy.nan)
+
+
+class PriceStore:
+    """
+    Stores one PriceMatrix per history interval as memory-mapped `.npy` files.
+
+    Every write creates a new matrix file and then atomically replaces the small JSON manifest
+    pointing to it, so readers in other processes always see a complete matrix.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.PRICE_STORE_DIR)
+        self._cache = {}
+
+    def _manifest_path(self, name):
+        return self.directory / f"{slugify(name)}.json"
+
+    def write(self, name, tickers, times, values):
+        """Writes a new matrix for `name` and publishes it atomically."""
+        values = numpy.ascontiguousarray(values, dtype="float64")
+        if values.shape != (len(times), len(tickers)):
+            raise ValueError(
+                f"Expected a matrix of shape {(len(times), len(tickers))}, got {values.shape}."
+            )
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        slug = slugify(name)
+        matrix_name = f"{slug}-{uuid.uuid4().hex}.npy"
+        self._atomic_write(matrix_name, lambda file: numpy.save(file, values))
+
+        manifest = {
+            "matrix": matrix_name,
+            "tickers": list(tickers),
+            "times": [int(time) for time in times],
+        }
+        self._atomic_write(
+            f"{slug}.json", lambda file: file.write(json.dumps(manifest).encode())
+        )
+        self._remove_stale_matrices(slug, keep=matrix_name)
+
+    def write_frame(self, name, frame):
+        """Writes a DataFrame with a DatetimeIndex and one column per ticker."""
+        times = frame.index.as_unit("s").asi8
+        self.write(
+            name, [str(column) for column in frame.columns], times, frame.to_numpy()
+        )
+
+    def open(self, name):
+        """
+        Maps the current matrix of `name` read-only, or returns None if nothing was written yet.
+
+        The mapping is cached until the manifest is replaced.
+        """
+        manifest_path = self._manifest_path(name)
+        try:
+            stat = manifest_path.stat()
+        except FileNotFoundError:
+            return None
+
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        cached = self._cache.get(name)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        try:
+            manifest = json.loads(manifest_path.read_text())
+            values = numpy.load(self.directory / manifest["matrix"], mmap_mode="r")
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+        matrix = PriceMatrix(manifest["tickers"], manifest["times"], values)
+        self._cache[name] = (key, matrix)
+        return matrix
+
+    def history(self, name, ticker):
+        """
+        Returns the known prices of a ticker in the current matrix of `name`, oldest first.
+
+        Returns:
+            list: The prices without NaN, like `History.values`, or None if the matrix or the
+                ticker is missing.
+        """
+        matrix = self.open(name)
+        series = None if matrix is None else matrix.series(ticker)
+        if series is None:
+            return None
+        return series[~numpy.isnan(series)].tolist()
+
+    def _atomic_write(self, file_name, write):
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                write(file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.directory / file_name)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _remove_stale_matrices(self, slug, keep):
+        """Removes old matrix files, keeping the newest previous one for readers that still map it."""
+        matrices = sorted(
+            (
+                path
+                for path in self.directory.glob(f"{slug}-*.npy")
+                if path.name != keep
+            ),
+            key=lambda path: path.stat().st_mtime_ns,
+        )
+        for path in matrices[:-1]:
+            try:
+                path.unlink()
+            except OSError:
+                # On Windows mapped files cannot be removed; try again on the next write.
+                pass
+
+
+_price_stores = {}
+
+
+def get_price_store():
+    """Returns the process wide PriceStore for `settings.PRICE_STORE_DIR`."""
+    directory = settings.PRICE_STORE_DIR
+    if directory not in _price_stores:
+        _price_stores[directory] = PriceStore(directory)
+    return _price_stores[directory]
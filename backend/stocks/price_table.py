@@ -0,0 +1,162 @@
+import mmap
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy
+from django.conf import settings
+
+from stocks.snapshot import MarketSnapshot
+
+MAGIC = b"PRTB"
+HEADER = numpy.dtype(
+    [
+        ("magic", "S4"),
+        ("retired", "u1"),
+        ("padding", "u1", (3,)),
+        ("version", "<u8"),
+        ("published_at", "<f8"),
+        ("count", "<u8"),
+    ]
+)
+TICKER = numpy.dtype("S10")
+
+
+class PriceTable:
+    """
+    Current stock prices shared by all processes through a memory-mapped file.
+
+    The updater publishes a complete new file and atomically replaces the old one. A published
+    file is never modified again, except for the `retired` flag that tells readers to map the new
+    file. Readers therefore never lock and never see a partially written table.
+    """
+
+    def __init__(self, path, max_age=None):
+        self.path = Path(path)
+        self.max_age = max_age
+        self._mapping = None
+        self._header = None
+        self._ids = None
+        self._prices = None
+        self._columns = {}
+
+    def publish(self, version, ids, tickers, prices):
+        """Writes a new table and marks the previous one as retired."""
+        ids = numpy.asarray(ids, dtype="<i8")
+        order = numpy.argsort(ids)
+        header = numpy.zeros(1, dtype=HEADER)
+        header["magic"] = MAGIC
+        header["version"] = version
+        header["published_at"] = time.time()
+        header["count"] = len(ids)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(header.tobytes())
+                file.write(ids[order].tobytes())
+                file.write(numpy.asarray(prices, dtype="<f8")[order].tobytes())
+                file.write(numpy.asarray(tickers, dtype=TICKER)[order].tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+            previous = self._open_mapping(writable=True)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        if previous is not None:
+            numpy.frombuffer(previous, dtype=HEADER, count=1)["retired"] = 1
+            previous.flush()
+            previous.close()
+
+    def _open_mapping(self, writable=False):
+        try:
+            with open(self.path, "r+b" if writable else "rb") as file:
+                if os.fstat(file.fileno()).st_size < HEADER.itemsize:
+                    return None
+                access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+                return mmap.mmap(file.fileno(), 0, access=access)
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        mapping = self._open_mapping()
+        if mapping is None:
+            return False
+
+        header = numpy.frombuffer(mapping, dtype=HEADER, count=1)
+        if header["magic"][0] != MAGIC:
+            return False
+
+        count = int(header["count"][0])
+        offset = HEADER.itemsize
+        ids = numpy.frombuffer(mapping, dtype="<i8", count=count, offset=offset)
+        offset += ids.nbytes
+        prices = numpy.frombuffer(mapping, dtype="<f8", count=count, offset=offset)
+        offset += prices.nbytes
+        tickers = numpy.frombuffer(mapping, dtype=TICKER, count=count, offset=offset)
+
+        self._mapping = mapping
+        self._header = header
+        self._ids = ids
+        self._prices = prices
+        self._columns = {
+            ticker.decode(): column for column, ticker in enumerate(tickers)
+        }
+        return True
+
+    def _current(self):
+        """Returns True if a published, non-stale table is mapped."""
+        if self._header is None or self._header["retired"][0]:
+            if not self._load():
+                return False
+
+        if self.max_age is not None:
+            return time.time() - self._header["published_at"][0] <= self.max_age
+        return True
+
+    @property
+    def version(self):
+        """The market version of the mapped table, or None if there is none."""
+        return int(self._header["version"][0]) if self._current() else None
+
+    def snapshot(self):
+        """Returns the mapped table as MarketSnapshot sharing its memory, or None if there is none."""
+        if not self._current():
+            return None
+        version = int(self._header["version"][0])
+        key = ("table", version, float(self._header["published_at"][0]))
+        return MarketSnapshot(version, self._ids, self._prices, self._columns, key=key)
+
+    def get_prices(self, stock_ids):
+        """
+        Looks up the current prices of the given stocks.
+
+        Returns:
+            dict: Maps stock ids to Decimal prices. Stocks that are not in the table are missing,
+                and the dict is empty if the table is missing or stale.
+        """
+        snapshot = self.snapshot()
+        return {} if snapshot is None else snapshot.get_prices(stock_ids)
+
+    def get_price_by_ticker(self, ticker):
+        """Returns the current price of a ticker as Decimal, or None."""
+        snapshot = self.snapshot()
+        return None if snapshot is None else snapshot.get_price_by_ticker(ticker)
+
+
+_price_tables = {}
+
+
+def get_price_table():
+    """Returns the PriceTable configured by `settings.PRICE_TABLE_PATH`, or None if disabled."""
+    path = settings.PRICE_TABLE_PATH
+    if not path:
+        return None
+    if path not in _price_tables:
+        _price_tables[path] = PriceTable(path, max_age=settings.PRICE_TABLE_MAX_AGE)
+    return _price_tables[path]
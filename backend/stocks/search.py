@@ -0,0 +1,239 @@
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+from rapidfuzz import fuzz
+
+from stocks.models import Stock
+from stocks.versions import MARKET_KEY, get_versions
+
+# Scores per kind of match. Fuzzy matches are scaled below all exact kinds of matches.
+TICKER_MATCH = 100
+TICKER_PREFIX = 95
+NAME_PREFIX = 90
+WORD_PREFIX = 85
+SUBSTRING = 80
+FUZZY_WEIGHT = 0.75
+MIN_FUZZY_SCORE = 80
+# Shorter queries match too many names fuzzily, e.g. "sap" is 80% similar to "salesforce".
+MIN_FUZZY_LENGTH = 4
+# Share of the query trigrams a name must contain to be scored fuzzily.
+MIN_TRIGRAM_OVERLAP = 0.3
+
+
+def normalize(text):
+    """Case-folds the text and strips accents, so "Müller" matches "muller"."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in text if not unicodedata.combining(char)).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {"".join(chars) for chars in zip(padded, padded[1:], padded[2:])}
+
+
+def _prefix_range(keys, prefix):
+    """Yields the sorted `(key, value)` pairs whose key starts with `prefix`."""
+    index = bisect_left(keys, (prefix,))
+    while index < len(keys) and keys[index][0].startswith(prefix):
+        yield keys[index]
+        index += 1
+
+
+class StockSearchIndex:
+    """
+    In-memory search over the names and tickers of all tradable stocks.
+
+    Prefixes of tickers, names and name words are looked up in sorted lists, substrings and typos
+    through a trigram index whose candidates are scored with rapidfuzz. A search therefore never
+    scans all stocks and needs no database query.
+    """
+
+    def __init__(self, stocks, version=None):
+        """
+        Args:
+            stocks (iterable): `(id, name, ticker)` tuples.
+            version (int): The market version the index was built for.
+        """
+        self.version = version
+        self.ids = []
+        self.names = []
+        self.normalized_names = []
+        self.tickers = []
+        ticker_keys = []
+        name_keys = []
+        word_keys = []
+        self.trigrams = defaultdict(set)
+
+        for position, (stock_id, name, ticker) in enumerate(stocks):
+            normalized_name = normalize(name)
+            self.ids.append(stock_id)
+            self.names.append(name)
+            self.normalized_names.append(normalized_name)
+            self.tickers.append(normalize(ticker))
+            ticker_keys.append((self.tickers[-1], position))
+            name_keys.append((normalized_name, position))
+            word_keys += [(word, position) for word in normalized_name.split()[1:]]
+            for trigram in trigrams(normalized_name):
+                self.trigrams[trigram].add(position)
+
+        self.ticker_keys = sorted(ticker_keys)
+        self.name_keys = sorted(name_keys)
+        self.word_keys = sorted(word_keys)
+
+    @classmethod
+    def build(cls, version):
+        """Builds the index over all stocks with a price."""
+        stocks = Stock.objects.filter(current_price__gt=0).values_list(
+            "id", "name", "ticker"
+        )
+        return cls(stocks, version=version)
+
+    def search(self, query, limit=100):
+        """
+        Returns the ids of the best matching stocks, best match first.
+
+        Ties are ordered by name, so results are stable while typing.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        scores = self._prefix_scores(query)
+        self._add_trigram_scores(query, scores)
+        ranked = sorted(
+            scores, key=lambda position: (-scores[position], self.names[position])
+        )
+        return [self.ids[position] for position in ranked[:limit]]
+
+    def _prefix_scores(self, query):
+        scores = {}
+        for ticker, position in _prefix_range(self.ticker_keys, query):
+            scores[position] = TICKER_MATCH if ticker == query else TICKER_PREFIX
+        for _, position in _prefix_range(self.name_keys, query):
+            scores.setdefault(position, NAME_PREFIX)
+        for _, position in _prefix_range(self.word_keys, query):
+            scores.setdefault(position, WORD_PREFIX)
+        return scores
+
+    def _add_trigram_scores(self, query, scores):
+        """Scores substring and fuzzy matches among the names sharing trigrams with the query."""
+        query_trigrams = trigrams(query)
+        overlap = defaultdict(int)
+        for trigram in query_trigrams:
+            for position in self.trigrams.get(trigram, ()):
+                overlap[position] += 1
+
+        fuzzy = len(query) >= MIN_FUZZY_LENGTH
+        min_overlap = MIN_TRIGRAM_OVERLAP * len(query_trigrams)
+        for position, shared in overlap.items():
+            if position in scores:
+                continue
+            name = self.normalized_names[position]
+            if query in name:
+                scores[position] = SUBSTRING
+            elif fuzzy and shared >= min_overlap:
+                score = max(
+                    fuzz.partial_ratio(query, name),
+                    fuzz.ratio(query, self.tickers[position]),
+                )
+                if score >= MIN_FUZZY_SCORE:
+                    scores[position] = score * FUZZY_WEIGHT
+
+
+_index = None
+
+
+def get_search_index():
+    """
+    Returns the search index of this process, rebuilt after every market update.
+
+    Every stock update bumps the market version, so other processes pick up new or renamed stocks
+    with the next tick; in this process, saving a stock drops the index immediately. The version
+    is checked at most every `STOCK_SEARCH_VERSION_TTL` seconds, so typing a query does not cost
+    a query per keystroke.
+    """
+    global _index
+    index = _index
+    now = time.monotonic()
+    if index is not None and now - index.checked_at < settings.STOCK_SEARCH_VERSION_TTL:
+        return index
+
+    version = get_versions(MARKET_KEY)[MARKET_KEY][0]
+    if index is None or index.version != version:
+        index = StockSearchIndex.build(version)
+    index.checked_at = now
+    _index = index
+    return index
+
+
+def clear_search_index():
+    global _index
+    _index = None
+
+
+def _exact_ticker(query):
+    return Case(
+        When(ticker__iexact=query, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def database_search(query, limit=100):
+    """
+    Returns the ids of the best matching stocks from a database query, best match first.
+
+    On PostgreSQL, names and tickers are matched with the `%` operator of `pg_trgm`, which uses
+    the GIN indexes of migration 0022, and ranked by trigram similarity after exact ticker
+    matches. Other databases fall back to an `icontains` scan ordered by name.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    stocks = Stock.objects.filter(current_price__gt=0).annotate(
+        exact_ticker=_exact_ticker(query)
+    )
+    if connection.vendor == "postgresql":
+        stocks = _trigram_search(stocks, query)
+    else:
+        stocks = stocks.filter(
+            Q(name__icontains=query) | Q(ticker__iexact=query)
+        ).order_by("-exact_ticker", "name")
+    return list(stocks.values_list("id", flat=True)[:limit])
+
+
+def _trigram_search(stocks, query):
+    # Only importable with psycopg installed.
+    from django.contrib.postgres.lookups import TrigramSimilar
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    # The indexes are built on the upper-cased columns, which `icontains` compares as well.
+    query = query.upper()
+    name, ticker = Upper("name"), Upper("ticker")
+    return (
+        stocks.filter(
+            TrigramSimilar(name, query)
+            | TrigramSimilar(ticker, query)
+            | Q(name__icontains=query)
+        )
+        .annotate(
+            similarity=Greatest(
+                TrigramSimilarity(name, query), TrigramSimilarity(ticker, query)
+            )
+        )
+        .order_by("-exact_ticker", "-similarity", "name")
+    )
+
+
+def search_stocks(query, limit=100):
+    """Searches stocks with the backend set in `STOCK_SEARCH_BACKEND`."""
+    if settings.STOCK_SEARCH_BACKEND == "database":
+        return database_search(query, limit=limit)
+    return get_search_index().search(query, limit=limit)
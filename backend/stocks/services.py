@@ -1,9 +1,13 @@
 from decimal import Decimal
 
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Round
 from rest_framework import serializers
 
-from stocks.models import StockHolding, Transaction
+from stocks.ledger import record_trade, trade_entries
+from stocks.models import LedgerEntry, Stock, StockHolding, Team, Transaction
+from stocks.versions import bump_version, team_key
 
 
 def calculate_stock_profit(transactions):
@@ -27,7 +31,13 @@ def calculate_stock_profit(transactions):
 
 @transaction.atomic()
 def execute_transaction(ta: Transaction):
-    """Executes the transaction, and saves errors to the errors field."""
+    """
+    Executes the transaction, and saves errors to the errors field.
+
+    Balance and holding are changed with conditional `UPDATE ... SET x = x - n WHERE x >= n`
+    statements, so concurrent trades of the same team can neither overdraw nor lose updates.
+    The transaction may be unsaved; it is written once with its final status.
+    """
     if ta.status != "open":
         return
 
@@ -38,32 +48,176 @@ def execute_transaction(ta: Transaction):
         if ta.transaction_type == "buy":
             total_price = amount * ta.price + ta.fee
 
-            if total_price > team.balance:
+            withdrawn = Team.objects.filter(
+                pk=team.pk, balance__gte=total_price
+            ).update(balance=F("balance") - total_price)
+            if not withdrawn:
                 raise serializers.ValidationError("Nicht genügend Guthaben.")
-
-            team.update_balance(-total_price)
-
-            stock_holding, created = StockHolding.objects.get_or_create(
-                team=team, stock=stock
-            )
-            stock_holding.adjust_amount(amount)
+            team.balance -= total_price
+            add_to_holding(team, stock, amount, total_price)
 
         elif ta.transaction_type == "sell":
-            stock_holding = StockHolding.objects.get(team=team, stock=stock)
-            if amount > stock_holding.amount:
+            proceeds = amount * ta.price - ta.fee
+            sold = StockHolding.objects.filter(
+                team=team, stock=stock, amount__gte=amount
+            ).update(
+                amount=F("amount") - amount,
+                total_invested=F("total_invested") - sale_cost(amount),
+                realized_profit=F("realized_profit") + proceeds - sale_cost(amount),
+            )
+            if not sold:
+                stock_holding = StockHolding.objects.get(team=team, stock=stock)
                 raise serializers.ValidationError(
                     f"Sie besitzen nur {stock_holding.amount} Aktien von {stock.name}."
                 )
-            team.update_balance(amount * ta.price - ta.fee)
-            stock_holding.adjust_amount(-amount)
+            team.update_balance(proceeds)
         else:
             raise serializers.ValidationError("Ungültiger Transaktionstyp.")
         ta.status = "closed"
         ta.save()
+        record_trade(ta)
     except serializers.ValidationError as e:
         transaction_error(ta, str(e))
 
 
+def sale_cost(amount):
+    """
+    The share of the cost basis that leaves a holding when `amount` shares are sold.
+
+    Evaluated against the row before the update, so selling everything removes exactly
+    `total_invested`. Mirrors `StockHolding.record_sale`.
+    """
+    # SQLite stores whole decimals as integers; multiplying by a decimal literal keeps the
+    # division from being truncated there and is a no-op on PostgreSQL.
+    return Round(F("total_invested") * Value(Decimal("1.0")) * amount / F("amount"), 2)
+
+
+def add_to_holding(team: Team, stock: Stock, amount, cost):
+    """
+    Increases the holding of a team by `amount` shares bought for `cost` (fees included).
+
+    Creates the holding if the team does not hold the stock yet. The cost basis is maintained in
+    the same statement, so P&L never needs to be recomputed from the transaction history.
+    """
+    purchase = {
+        "amount": F("amount") + amount,
+        "total_invested": F("total_invested") + cost,
+    }
+    updated = StockHolding.objects.filter(team=team, stock=stock).update(**purchase)
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            StockHolding.objects.create(
+                team=team,
+                stock=stock,
+                amount=amount,
+                total_invested=cost,
+            )
+    except IntegrityError:
+        # A concurrent trade created the holding in the meantime.
+        StockHolding.objects.filter(team=team, stock=stock).update(**purchase)
+
+
+@transaction.atomic()
+def execute_batch(team: Team, orders):
+    """
+    Executes several market orders of one team all-or-nothing in a single database transaction.
+
+    The team and its affected holdings are locked once, every order is checked against this
+    snapshot in the given order, and only if all orders are valid the transactions, the balance
+    and the holdings are written with bulk statements.
+
+    Args:
+        team (Team): The team placing the orders.
+        orders (list): Dicts with `stock` (id), `transaction_type`, `amount` and optional `description`.
+
+    Returns:
+        list: The created, closed Transaction instances in the order of `orders`.
+
+    Raises:
+        serializers.ValidationError: With one result per order if any order is invalid.
+    """
+    stock_ids = {order["stock"] for order in orders}
+    stocks = Stock.objects.filter(current_price__gt=0).in_bulk(stock_ids)
+    team = Team.objects.select_for_update().get(pk=team.pk)
+    # Missing holdings are inserted up front, so every holding of the batch is a locked row; a
+    # holding created concurrently by `add_to_holding` is kept and locked instead. If any order
+    # fails, the rows are rolled back with the rest of the batch.
+    StockHolding.objects.bulk_create(
+        [StockHolding(team=team, stock=stock) for stock in stocks.values()],
+        ignore_conflicts=True,
+    )
+    holdings = {
+        holding.stock_id: holding
+        for holding in StockHolding.objects.select_for_update().filter(
+            team=team, stock_id__in=stocks
+        )
+    }
+
+    balance = team.balance
+    transactions = []
+    results = []
+    for order in orders:
+        stock = stocks.get(order["stock"])
+        amount = order["amount"]
+        if stock is None:
+            results.append({"status": "error", "error": "Ungültige Aktie."})
+            continue
+
+        holding = holdings[stock.pk]
+        fee = Decimal(stock.calculate_fee(amount))
+        error = None
+        if order["transaction_type"] == "buy":
+            total_price = amount * stock.current_price + fee
+            if total_price > balance:
+                error = "Nicht genügend Guthaben."
+            else:
+                balance -= total_price
+                holding.record_purchase(amount, total_price)
+        elif holding.amount < amount:
+            error = f"Sie besitzen nur {holding.amount} Aktien von {stock.name}."
+        else:
+            proceeds = amount * stock.current_price - fee
+            balance += proceeds
+            holding.record_sale(amount, proceeds)
+
+        if error:
+            results.append({"status": "error", "error": error})
+            continue
+        results.append({"status": "ok"})
+        transactions.append(
+            Transaction(
+                team=team,
+                stock=stock,
+                status="closed",
+                transaction_type=order["transaction_type"],
+                amount=amount,
+                price=stock.current_price,
+                fee=fee,
+                description=order.get("description", ""),
+            )
+        )
+
+    if any(result["status"] == "error" for result in results):
+        raise serializers.ValidationError({"results": results})
+
+    transactions = Transaction.objects.bulk_create(transactions)
+    LedgerEntry.objects.bulk_create(trade_entries(transactions))
+    # `bulk_create` sends no signals, so the trade counter is maintained here.
+    Team.objects.filter(pk=team.pk).update(
+        balance=balance, trades=F("trades") + len(transactions)
+    )
+
+    # Holdings that were bought and sold completely are kept for their realized profit.
+    StockHolding.objects.bulk_update(
+        holdings.values(), ["amount", "total_invested", "realized_profit"]
+    )
+    bump_version(team_key(team.pk))
+    return transactions
+
+
 def transaction_error(ta: Transaction, error_message):
     """Saves an error to the error field of the transaction"""
     ta.status = "error"
@@ -1,8 +1,20 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Team, UserProfile
+from .models import (
+    LedgerEntry,
+    Stock,
+    StockHolding,
+    Team,
+    Transaction,
+    UserProfile,
+    Watchlist,
+)
+from .search import clear_search_index
+from .snapshot import clear_market_snapshot
+from .versions import bump_version, team_key
 
 
 @receiver(post_save, sender=User)
@@ -10,3 +22,68 @@ def create_profile(sender, instance, created, **kwargs):
     if created:
         team, created = Team.objects.get_or_create(name="default")
         UserProfile.objects.create(user=instance, team=team)
+
+
+@receiver(post_save, sender=User)
+def bump_member_team_version(sender, instance, created, raw=False, **kwargs):
+    # Team details list the usernames and names of the members.
+    if created or raw:
+        return
+    team_id = (
+        UserProfile.objects.filter(user=instance)
+        .values_list("team_id", flat=True)
+        .first()
+    )
+    if team_id is not None:
+        bump_version(team_key(team_id))
+
+
+@receiver(post_save, sender=Team)
+def open_team_ledger(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        LedgerEntry.objects.create(
+            team=instance, cash_delta=instance.balance, note="opening"
+        )
+
+
+@receiver(post_save, sender=Transaction)
+def count_trade(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Team.objects.filter(pk=instance.team_id).update(trades=F("trades") + 1)
+
+
+@receiver(post_delete, sender=Transaction)
+def uncount_trade(sender, instance, **kwargs):
+    Team.objects.filter(pk=instance.team_id, trades__gt=0).update(
+        trades=F("trades") - 1
+    )
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def bump_team_version(sender, instance, **kwargs):
+    bump_version(team_key(instance.pk))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=Watchlist)
+@receiver(post_delete, sender=Watchlist)
+@receiver(post_save, sender=StockHolding)
+@receiver(post_delete, sender=StockHolding)
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def bump_related_team_version(sender, instance, **kwargs):
+    bump_version(team_key(instance.team_id))
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def drop_search_index(sender, **kwargs):
+    clear_search_index()
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def drop_market_snapshot(sender, **kwargs):
+    clear_market_snapshot()
@@ -0,0 +1,137 @@
+from decimal import Decimal
+
+import numpy
+
+
+class MarketSnapshot:
+    """
+    Immutable current prices of all stocks for one market version.
+
+    Prices are a float64 array sorted by stock id, with a map from tickers to columns. Valuation
+    and ranking code that receives the same snapshot sees the same prices, however often it
+    looks them up, and needs no further price queries.
+    """
+
+    def __init__(self, version, ids, prices, columns, key=None):
+        """
+        Args:
+            version (int): The market version of the prices.
+            ids (numpy.ndarray): Stock ids in ascending order.
+            prices (numpy.ndarray): The price of each stock in `ids`.
+            columns (dict): Maps tickers to their index in `ids`.
+            key (tuple): Identifies the source of the prices, see `get_market_snapshot`.
+        """
+        self.version = version
+        self.ids = ids
+        self.prices = prices
+        self.columns = columns
+        self.key = key
+        for array in (ids, prices):
+            if array.flags.writeable:
+                array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, version, rows, key=None):
+        """Builds a snapshot from `(id, ticker, price)` rows."""
+        rows = sorted(rows)
+        ids = numpy.array([row[0] for row in rows], dtype="<i8")
+        prices = numpy.array([float(row[2]) for row in rows], dtype="<f8")
+        columns = {ticker: column for column, (_, ticker, _) in enumerate(rows)}
+        return cls(version, ids, prices, columns, key=key)
+
+    def _price(self, column):
+        return Decimal(f"{self.prices[column]:.2f}")
+
+    def get_prices(self, stock_ids):
+        """
+        Looks up the prices of the given stocks.
+
+        Returns:
+            dict: Maps stock ids to Decimal prices. Stocks that are not in the snapshot are missing.
+        """
+        stock_ids = numpy.asarray(list(stock_ids), dtype="<i8")
+        if not len(self.ids) or not len(stock_ids):
+            return {}
+        columns = numpy.minimum(
+            numpy.searchsorted(self.ids, stock_ids), len(self.ids) - 1
+        )
+        found = self.ids[columns] == stock_ids
+        return {
+            int(stock_id): self._price(column)
+            for stock_id, column, is_found in zip(stock_ids, columns, found)
+            if is_found
+        }
+
+    def get_price_by_ticker(self, ticker):
+        """Returns the price of a ticker as Decimal, or None."""
+        column = self.columns.get(ticker)
+        return None if column is None else self._price(column)
+
+    def value(self, holdings):
+        """
+        Values holdings at the prices of the snapshot.
+
+        Args:
+            holdings (dict): Maps stock ids to amounts.
+
+        Returns:
+            Decimal: The total value, or None if a stock is not in the snapshot.
+        """
+        prices = self.get_prices(holdings)
+        if prices.keys() != holdings.keys():
+            return None
+        return sum(
+            (prices[stock_id] * amount for stock_id, amount in holdings.items()),
+            Decimal(0),
+        )
+
+
+_snapshot = None
+
+
+def get_published_snapshot():
+    """Returns the snapshot of the shared price table without a database query, or None."""
+    # Imported here because the price table builds MarketSnapshots.
+    from stocks.price_table import get_price_table
+
+    price_table = get_price_table()
+    return None if price_table is None else price_table.snapshot()
+
+
+def get_market_snapshot():
+    """
+    Returns the current market snapshot, loaded once per market version in this process.
+
+    The snapshot of the shared price table is used if the updater publishes one. Otherwise the
+    prices are read from the database with one query whenever the market version changes; the
+    version check costs one query per call, so callers load the snapshot once and pass it on.
+
+    Returns:
+        MarketSnapshot: The snapshot, or None before the first market update, when there is no
+            version the prices could be tied to.
+    """
+    global _snapshot
+    snapshot = get_published_snapshot()
+    if snapshot is not None:
+        return snapshot
+
+    # Imported here because stocks.models imports this module.
+    from stocks.models import Stock
+    from stocks.versions import MARKET_KEY, get_versions
+
+    version, updated_at = get_versions(MARKET_KEY)[MARKET_KEY]
+    if updated_at is None:
+        return None
+    key = ("database", version, updated_at)
+    if _snapshot is None or _snapshot.key != key:
+        rows = Stock.objects.values_list("id", "ticker", "current_price")
+        _snapshot = MarketSnapshot.from_rows(version, rows, key=key)
+    return _snapshot
+
+
+def clear_market_snapshot():
+    global _snapshot
+    _snapshot = None
@@ -6,8 +6,24 @@ import yfinance as yf
 from django.conf import settings
 from django.db import transaction
 from django.db.utils import OperationalError
-
-from stocks.models import History, Stock, Team
+from django.utils import timezone
+
+from stocks.idempotency import evict_expired_keys
+from stocks.indicators import STATS_FIELDS, calculate_indicators
+from stocks.ledger import take_snapshots
+from stocks.models import (
+    History,
+    Stock,
+    StockStats,
+    Team,
+    get_portfolio_values,
+    update_team_ranks,
+)
+from stocks.orders import match_orders
+from stocks.price_store import get_price_store
+from stocks.price_table import get_price_table
+from stocks.snapshot import get_market_snapshot
+from stocks.versions import MARKET_KEY, bump_version, get_versions
 
 DATA_DIR = "Data/"
 HISTORY_INTERVALS = {
@@ -18,15 +34,20 @@ HISTORY_INTERVALS = {
     "Year": ["1y", "1wk"],
     "5 Years": ["5y", "1mo"],
 }
+STATS_INTERVAL = ["1y", "1d"]
 
 
 def load_portfolio_history():
     try:
-        for team in Team.objects.all():
-            with transaction.atomic():
-                portfolio_value = team.get_portfolio_value()
-                team.portfolio_history.append(float(portfolio_value))
-                team.save()
+        teams = list(Team.objects.all())
+        portfolio_values = get_portfolio_values(teams, get_market_snapshot())
+        for team in teams:
+            team.portfolio_history.append(float(portfolio_values[team.pk]))
+            # Only the history is written: a full save would overwrite concurrent balance changes
+            # and reset `last_edited`, which starts the edit timeout of the team.
+            team.save(update_fields=["portfolio_history"])
+        update_team_ranks(portfolio_values)
+        bump_version(MARKET_KEY)
         print("Successfully loaded portfolio history.")
 
     except Exception as e:
@@ -84,6 +105,8 @@ def stock_updater_loop():
             print(f"Error while updating stocks: {e}")
 
         load_portfolio_history()
+        evict_idempotency_keys()
+        snapshot_ledger()
         time_taken = time.time() - start_time
         print(f"Updated all stocks in {time_taken} seconds.")
         time.sleep(update_stocks_interval - time_taken)
@@ -100,6 +123,7 @@ def stock_updater():
         data = yf.download(tickers, period=period, interval=interval)
 
         if not data.empty:
+            store_prices(name, data["Close"])
             for stock in stocks:
                 try:
                     if stock.ticker in data["Close"].columns:
@@ -148,3 +172,105 @@ def stock_updater():
             print("Too many errors. Stopping...")
             break
         errors = []
+
+    update_stock_stats(stocks, tickers)
+    execute_pending_orders()
+    bump_version(MARKET_KEY)
+    publish_prices()
+
+
+def snapshot_ledger():
+    try:
+        created = take_snapshots()
+        print(f"Created {created} ledger snapshots.")
+    except Exception as e:
+        print(f"Error while creating ledger snapshots: {e}")
+
+
+def evict_idempotency_keys():
+    try:
+        deleted = evict_expired_keys()
+        print(f"Evicted {deleted} expired idempotency keys.")
+    except Exception as e:
+        print(f"Error while evicting idempotency keys: {e}")
+
+
+def publish_prices():
+    """Publishes the current prices to the shared price table, if it is enabled."""
+    price_table = get_price_table()
+    if price_table is None:
+        return
+
+    version = get_versions(MARKET_KEY)[MARKET_KEY][0]
+    rows = Stock.objects.filter(current_price__gt=0).values_list(
+        "id", "ticker", "current_price"
+    )
+    ids = [stock_id for stock_id, _, _ in rows]
+    tickers = [ticker for _, ticker, _ in rows]
+    prices = [float(price) for _, _, price in rows]
+    try:
+        price_table.publish(version, ids, tickers, prices)
+    except OSError as e:
+        print(f"Error while publishing prices: {e}")
+
+
+def execute_pending_orders():
+    """Executes the limit and stop orders that were triggered by the new prices."""
+    try:
+        executed = match_orders()
+        print(f"Executed {executed} pending orders.")
+    except Exception as e:
+        print(f"Error while executing pending orders: {e}")
+
+
+def store_prices(name, close):
+    """Publishes the close prices of one history interval to the price store."""
+    try:
+        get_price_store().write_frame(name, close)
+    except Exception as e:
+        print(f"Error while storing prices for `{name}`: {e}")
+
+
+def update_stock_stats(stocks, tickers):
+    """
+    Calculates the technical indicators of all stocks in one pass and stores them.
+
+    Errors are only logged, so order matching and the market update of the tick still run.
+    """
+    period, interval = STATS_INTERVAL
+    try:
+        data = yf.download(tickers, period=period, interval=interval)
+    except Exception as e:
+        print(f"Error while downloading stock stats: {e}")
+        return
+    if data.empty:
+        print(f"No data available for stock stats (period `{period}`).")
+        return
+
+    try:
+        indicators = calculate_indicators(data["Close"])
+    except Exception as e:
+        print(f"Error while calculating stock stats: {e}")
+        return
+
+    indicators = indicators.astype(object).where(indicators.notna(), None)
+    now = timezone.now()
+
+    stats = [
+        StockStats(
+            stock=stock, updated_at=now, **indicators.loc[stock.ticker].to_dict()
+        )
+        for stock in stocks
+        if stock.ticker in indicators.index
+    ]
+    try:
+        StockStats.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=["stock"],
+            update_fields=[*STATS_FIELDS, "updated_at"],
+        )
+    except Exception as e:
+        print(f"Error while storing stock stats: {e}")
+        return
+    print(f"Updated stats for {len(stats)} stocks.")
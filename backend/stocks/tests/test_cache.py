@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from stocks.cache import get_or_compute, versioned_key
+from stocks.models import Team
+from stocks.versions import MARKET_KEY, bump_version, get_versions, team_key
+
+
+class VersionedKeyTests(TestCase):
+    def test_key_changes_with_version(self):
+        bump_version(MARKET_KEY)
+        key = versioned_key("ranking", get_versions(MARKET_KEY), [1])
+        bump_version(MARKET_KEY)
+        self.assertNotEqual(
+            versioned_key("ranking", get_versions(MARKET_KEY), [1]), key
+        )
+
+    def test_key_changes_with_parts(self):
+        bump_version(MARKET_KEY)
+        versions = get_versions(MARKET_KEY)
+        self.assertNotEqual(
+            versioned_key("ranking", versions, [1]),
+            versioned_key("ranking", versions, [2]),
+        )
+
+    def test_no_key_without_counter(self):
+        self.assertIsNone(versioned_key("ranking", get_versions(MARKET_KEY)))
+
+
+class GetOrComputeTests(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name="Test Team")
+        self.keys = [MARKET_KEY, team_key(self.team.pk)]
+        bump_version(MARKET_KEY)
+        self.compute = mock.Mock(side_effect=lambda: {"calls": self.compute.call_count})
+
+    def test_cached_until_market_update(self):
+        self.assertEqual(get_or_compute("test", self.keys, self.compute), {"calls": 1})
+        self.assertEqual(get_or_compute("test", self.keys, self.compute), {"calls": 1})
+
+        bump_version(MARKET_KEY)
+        self.assertEqual(get_or_compute("test", self.keys, self.compute), {"calls": 2})
+
+    def test_cached_until_team_changes(self):
+        get_or_compute("test", self.keys, self.compute)
+        self.team.balance = 0
+        self.team.save()
+        get_or_compute("test", self.keys, self.compute)
+        self.assertEqual(self.compute.call_count, 2)
+
+    def test_not_cached_without_counter(self):
+        get_or_compute("test", ["unknown"], self.compute)
+        get_or_compute("test", ["unknown"], self.compute)
+        self.assertEqual(self.compute.call_count, 2)
+
+    def test_loaded_versions_are_reused(self):
+        versions = get_versions(*self.keys)
+        with self.assertNumQueries(0):
+            get_or_compute("test", self.keys, self.compute, versions=versions)
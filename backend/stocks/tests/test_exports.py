@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from stocks.exports import export
+from stocks.models import Stock, StockHolding, Team
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name="Test Team")
+        stock = Stock.objects.create(name="Test Stock", ticker="TST")
+        StockHolding.objects.create(
+            team=self.team, stock=stock, amount=3, total_invested=300
+        )
+
+    def test_export_is_batched(self):
+        chunks = list(export("holdings", "csv"))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(
+            chunks[0].decode().splitlines()[1],
+            f"{self.team.pk},Test Team,TST,3,300.00,0.00",
+        )
+
+    def test_export_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "holdings.ndjson")
+            call_command("export_data", "holdings", "--format", "ndjson", "-o", path)
+            with open(path) as file:
+                self.assertIn('"ticker": "TST"', file.read())
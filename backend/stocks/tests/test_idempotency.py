@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from stocks.idempotency import evict_expired_keys
+from stocks.models import IdempotencyKey
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="test")
+
+    def test_evict_expired_keys(self):
+        expired = IdempotencyKey.objects.create(
+            user=self.user, key="expired", status_code=201, response={}
+        )
+        IdempotencyKey.objects.filter(pk=expired.pk).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        IdempotencyKey.objects.create(
+            user=self.user, key="fresh", status_code=201, response={}
+        )
+
+        self.assertEqual(evict_expired_keys(), 1)
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["fresh"]
+        )
@@ -0,0 +1,48 @@
+import numpy
+import pandas
+from django.test import SimpleTestCase
+
+from stocks.indicators import STATS_FIELDS, calculate_indicators
+
+
+class CalculateIndicatorsTests(SimpleTestCase):
+    def setUp(self):
+        dates = pandas.date_range("2024-01-01", periods=300, freq="B")
+        self.close = pandas.DataFrame(
+            {
+                "UP": numpy.arange(1, 301, dtype=float),
+                "FLAT": numpy.full(300, 50.0),
+                "SHORT": [numpy.nan] * 290 + list(numpy.arange(10, 20, dtype=float)),
+            },
+            index=dates,
+        )
+        self.stats = calculate_indicators(self.close)
+
+    def test_columns(self):
+        self.assertEqual(list(self.stats.columns), list(STATS_FIELDS))
+        self.assertEqual(list(self.stats.index), ["UP", "FLAT", "SHORT"])
+
+    def test_moving_averages(self):
+        self.assertAlmostEqual(self.stats.loc["UP", "sma_20"], 290.5)
+        self.assertAlmostEqual(self.stats.loc["UP", "sma_200"], 200.5)
+        self.assertAlmostEqual(self.stats.loc["FLAT", "ema_50"], 50.0)
+
+    def test_rsi(self):
+        self.assertAlmostEqual(self.stats.loc["UP", "rsi_14"], 100.0)
+        self.assertTrue(numpy.isnan(self.stats.loc["FLAT", "rsi_14"]))
+
+    def test_volatility(self):
+        self.assertAlmostEqual(self.stats.loc["FLAT", "volatility_20"], 0.0)
+        self.assertGreater(self.stats.loc["UP", "volatility_20"], 0.0)
+
+    def test_52_week_range_and_day_change(self):
+        self.assertEqual(self.stats.loc["UP", "high_52w"], 300.0)
+        self.assertEqual(self.stats.loc["UP", "low_52w"], 49.0)
+        self.assertAlmostEqual(
+            self.stats.loc["UP", "day_change"], (300 / 299 - 1) * 100
+        )
+        self.assertEqual(self.stats.loc["FLAT", "day_change"], 0.0)
+
+    def test_not_enough_data(self):
+        self.assertTrue(numpy.isnan(self.stats.loc["SHORT", "sma_20"]))
+        self.assertAlmostEqual(self.stats.loc["SHORT", "high_52w"], 19.0)
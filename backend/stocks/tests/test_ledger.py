@@ -0,0 +1,84 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from stocks.ledger import get_state, replay_state, take_snapshot, verify_team
+from stocks.models import LedgerEntry, LedgerSnapshot, Stock, Team, Transaction
+from stocks.services import execute_transaction
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name="Test Team", balance=Decimal("1000.00"))
+        self.stock = Stock.objects.create(
+            name="Test Stock", ticker="TST", current_price=Decimal("100.00")
+        )
+
+    def trade(self, transaction_type, amount):
+        ta = Transaction(
+            team=self.team,
+            stock=self.stock,
+            transaction_type=transaction_type,
+            amount=amount,
+            price=Decimal("100.00"),
+            fee=Decimal("15.00"),
+        )
+        execute_transaction(ta)
+        return ta
+
+    def age_entries(self):
+        LedgerEntry.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+    def test_team_creation_opens_ledger(self):
+        self.assertEqual(get_state(self.team.pk), (Decimal("1000.00"), {}))
+
+    def test_trades_are_booked(self):
+        self.trade("buy", 5)
+        self.trade("sell", 2)
+        self.team.refresh_from_db()
+
+        balance, positions = get_state(self.team.pk)
+        self.assertEqual(balance, Decimal("1000.00") - 515 + 185)
+        self.assertEqual(positions, {self.stock.pk: 3})
+        self.assertEqual(verify_team(self.team, balance, positions), [])
+
+    def test_failed_trade_is_not_booked(self):
+        self.trade("buy", 50)
+        self.assertEqual(LedgerEntry.objects.filter(team=self.team).count(), 1)
+
+    def test_snapshot_plus_tail_matches_replay(self):
+        self.trade("buy", 5)
+        self.age_entries()
+        snapshot = take_snapshot(self.team.pk)
+        self.trade("sell", 1)
+
+        self.assertEqual(snapshot.positions, {str(self.stock.pk): 5})
+        self.assertEqual(get_state(self.team.pk), replay_state(self.team.pk))
+        self.assertEqual(get_state(self.team.pk)[1], {self.stock.pk: 4})
+
+    def test_snapshot_skips_recent_entries(self):
+        self.assertIsNone(take_snapshot(self.team.pk))
+
+    def test_state_at_point_in_time(self):
+        self.trade("buy", 5)
+        self.age_entries()
+        before = timezone.now()
+        self.trade("sell", 5)
+
+        self.assertEqual(get_state(self.team.pk, at=before)[1], {self.stock.pk: 5})
+        self.assertEqual(get_state(self.team.pk)[1], {})
+
+    def test_rebuild_ledger_detects_drift(self):
+        self.trade("buy", 1)
+        self.age_entries()
+        call_command("rebuild_ledger", stdout=StringIO())
+        self.assertEqual(LedgerSnapshot.objects.filter(team=self.team).count(), 1)
+
+        Team.objects.filter(pk=self.team.pk).update(balance=0)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_ledger", "--no-snapshot", stderr=StringIO())
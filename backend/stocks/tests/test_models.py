@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
@@ -10,6 +12,7 @@ from ..models import (
     Transaction,
     UserProfile,
     Watchlist,
+    update_team_ranks,
 )
 
 User = get_user_model()
@@ -112,9 +115,40 @@ class TeamTests(TestCase):
         self.assertEqual(self.team1.calculate_rank(), 1)  # Team 1 hat höheren Wert
         self.assertEqual(self.team2.calculate_rank(), 2)  # Team 2 hat niedrigeren Wert
 
+    def test_update_team_ranks(self):
+        empty = Team.objects.create(name="Team ohne Mitglieder", balance=200000)
+        update_team_ranks(
+            {
+                team.pk: team.get_portfolio_value()
+                for team in (self.team1, self.team2, empty)
+            }
+        )
+        for team in (self.team1, self.team2, empty):
+            team.refresh_from_db()
+        self.assertEqual(self.team1.rank, 1)
+        self.assertEqual(self.team2.rank, 2)
+        # Teams ohne Mitglieder zählen nicht mit, erhalten aber ihren hypothetischen Rang.
+        self.assertEqual(empty.rank, 1)
+        self.assertEqual(self.team2.get_rank(), self.team2.calculate_rank())
+
+    def test_trades_counter(self):
+        ta = Transaction.objects.create(
+            team=self.team1, stock=self.stock, transaction_type="buy", amount=1
+        )
+        Transaction.objects.create(
+            team=self.team1, stock=self.stock, transaction_type="sell", amount=1
+        )
+        self.team1.refresh_from_db()
+        self.assertEqual(self.team1.trades, 2)
+        ta.delete()
+        self.team1.refresh_from_db()
+        self.assertEqual(self.team1.trades, 1)
+
     def test_update_balance(self):
         self.team1.update_balance(5000)
         self.assertEqual(self.team1.balance, 105000)
+        self.team1.refresh_from_db()
+        self.assertEqual(self.team1.balance, 105000)
 
     def test_generate_team_code(self):
         team = Team.objects.create(name="Team ohne Code")
@@ -181,6 +215,27 @@ class StockHoldingTests(TestCase):
     def test_adjust_amount(self):
         self.stock_holding.adjust_amount(3)
         self.assertEqual(self.stock_holding.amount, 8)
+        self.stock_holding.refresh_from_db()
+        self.assertEqual(self.stock_holding.amount, 8)
+
+    def test_record_purchase_and_sale(self):
+        holding = StockHolding(team=self.team, stock=self.stock)
+        holding.record_purchase(3, Decimal("315.00"))
+        holding.record_purchase(1, Decimal("125.00"))
+        self.assertEqual(holding.average_cost, Decimal("110.00"))
+
+        holding.record_sale(2, Decimal("285.00"))
+        self.assertEqual(holding.amount, 2)
+        self.assertEqual(holding.total_invested, Decimal("220.00"))
+        self.assertEqual(holding.realized_profit, Decimal("65.00"))
+        self.assertEqual(
+            holding.get_unrealized_profit(Decimal("100")), Decimal("-20.00")
+        )
+
+        holding.record_sale(2, Decimal("200.00"))
+        self.assertEqual(holding.total_invested, 0)
+        self.assertEqual(holding.average_cost, 0)
+        self.assertEqual(holding.realized_profit, Decimal("45.00"))
 
 
 class TransactionTests(TestCase):
@@ -0,0 +1,115 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from stocks import order_queue
+from stocks.models import Stock, StockHolding, Team, Transaction
+from stocks.order_queue import (
+    drain_order_queue,
+    queued_orders,
+    start_order_queue_worker,
+)
+
+
+class OrderQueueTests(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name="Test Team", balance=1000)
+        self.stock = Stock.objects.create(
+            name="Test Stock", ticker="TST", current_price=Decimal("100.00")
+        )
+
+    def queue(self, transaction_type, amount):
+        return Transaction.objects.create(
+            team=self.team,
+            stock=self.stock,
+            transaction_type=transaction_type,
+            amount=amount,
+        )
+
+    def test_drain_executes_orders_in_order(self):
+        buy = self.queue("buy", 5)
+        sell = self.queue("sell", 2)
+
+        self.assertEqual(drain_order_queue(), 2)
+        buy.refresh_from_db()
+        sell.refresh_from_db()
+        self.assertEqual(buy.status, "closed")
+        self.assertEqual(buy.price, Decimal("100.00"))
+        self.assertEqual(sell.status, "closed")
+        self.assertEqual(
+            StockHolding.objects.get(team=self.team, stock=self.stock).amount, 3
+        )
+        self.assertFalse(queued_orders().exists())
+
+    def test_failing_order_does_not_affect_others(self):
+        too_expensive = self.queue("buy", 50)
+        buy = self.queue("buy", 1)
+
+        drain_order_queue()
+        too_expensive.refresh_from_db()
+        buy.refresh_from_db()
+        self.assertEqual(too_expensive.status, "error")
+        self.assertEqual(buy.status, "closed")
+
+    def test_drain_respects_batch_size(self):
+        for _ in range(3):
+            self.queue("buy", 1)
+
+        self.assertEqual(drain_order_queue(batch_size=2), 2)
+        self.assertEqual(queued_orders().count(), 1)
+
+    def test_pending_limit_orders_are_not_queued(self):
+        Transaction.objects.create(
+            team=self.team,
+            stock=self.stock,
+            transaction_type="buy",
+            order_type="limit",
+            trigger_price=Decimal("90.00"),
+            amount=1,
+        )
+        self.assertEqual(drain_order_queue(), 0)
+
+    def test_order_executed_by_another_worker_is_skipped(self):
+        first = self.queue("buy", 1)
+        second = self.queue("buy", 1)
+        execute = order_queue.execute_transaction
+
+        def execute_and_race(order):
+            execute(order)
+            # Another worker executes the second order after this batch was selected.
+            Transaction.objects.filter(pk=second.pk).update(status="closed")
+
+        with mock.patch.object(
+            order_queue, "execute_transaction", side_effect=execute_and_race
+        ) as execute_transaction:
+            self.assertEqual(drain_order_queue(), 1)
+        execute_transaction.assert_called_once_with(first)
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, 1000 - 100 - 15)
+
+
+class OrderQueueWorkerTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(order_queue, "_worker", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(ASYNC_ORDERS=True, ORDER_QUEUE_IN_WEB=True)
+    def test_started_once(self):
+        with mock.patch.object(order_queue.threading, "Thread") as thread:
+            start_order_queue_worker()
+            start_order_queue_worker()
+        thread.assert_called_once_with(target=order_queue.order_queue_loop, daemon=True)
+
+    @override_settings(ASYNC_ORDERS=True, ORDER_QUEUE_IN_WEB=False)
+    def test_not_started_outside_single_process_mode(self):
+        with mock.patch.object(order_queue.threading, "Thread") as thread:
+            start_order_queue_worker()
+        thread.assert_not_called()
+
+    @override_settings(ASYNC_ORDERS=False, ORDER_QUEUE_IN_WEB=True)
+    def test_not_started_without_async_orders(self):
+        with mock.patch.object(order_queue.threading, "Thread") as thread:
+            start_order_queue_worker()
+        thread.assert_not_called()
@@ -0,0 +1,175 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import IntegrityError, OperationalError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from stocks.models import Stock, StockHolding, Team, Transaction
+from stocks.orders import REFRESH_OVERLAP, OrderBook, match_orders
+from stocks.services import execute_transaction
+
+
+class OrderBookTests(SimpleTestCase):
+    def setUp(self):
+        self.book = OrderBook()
+        self.book.add(1, 10, "buy", "limit", Decimal("90"))
+        self.book.add(2, 10, "buy", "limit", Decimal("95"))
+        self.book.add(3, 10, "sell", "limit", Decimal("110"))
+        self.book.add(4, 10, "buy", "stop", Decimal("120"))
+        self.book.add(5, 10, "sell", "stop", Decimal("80"))
+
+    def test_no_order_triggers_inside_the_range(self):
+        self.assertEqual(self.book.pop_triggered(10, Decimal("100")), [])
+        self.assertEqual(len(self.book), 5)
+
+    def test_falling_price_triggers_buy_limits_and_sell_stops(self):
+        self.assertEqual(self.book.pop_triggered(10, Decimal("94")), [2])
+        self.assertEqual(sorted(self.book.pop_triggered(10, Decimal("75"))), [1, 5])
+        self.assertEqual(len(self.book), 2)
+
+    def test_rising_price_triggers_sell_limits_and_buy_stops(self):
+        self.assertEqual(self.book.pop_triggered(10, Decimal("120")), [3, 4])
+
+    def test_other_stock_is_untouched(self):
+        self.assertEqual(self.book.pop_triggered(11, Decimal("1")), [])
+        self.assertEqual(self.book.stock_ids(), {10})
+        self.assertEqual(self.book.last_id, 5)
+
+
+class MatchOrdersTests(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name="Test Team", balance=100000)
+        self.stock = Stock.objects.create(
+            name="Test Stock", ticker="TST", current_price=Decimal("100.00")
+        )
+        StockHolding.objects.create(team=self.team, stock=self.stock, amount=10)
+        self.book = OrderBook()
+
+    def create_order(self, transaction_type, order_type, trigger_price, amount=1):
+        return Transaction.objects.create(
+            team=self.team,
+            stock=self.stock,
+            transaction_type=transaction_type,
+            order_type=order_type,
+            trigger_price=trigger_price,
+            amount=amount,
+            price=trigger_price,
+            fee=15,
+        )
+
+    def test_untriggered_orders_stay_open(self):
+        order = self.create_order("buy", "limit", Decimal("90.00"))
+        self.assertEqual(match_orders(self.book), 0)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "open")
+
+    def test_triggered_orders_execute_at_current_price(self):
+        buy = self.create_order("buy", "limit", Decimal("90.00"), amount=2)
+        sell = self.create_order("sell", "stop", Decimal("85.00"), amount=3)
+        match_orders(self.book)
+
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=Decimal("80.00"))
+        self.assertEqual(match_orders(self.book), 2)
+
+        buy.refresh_from_db()
+        sell.refresh_from_db()
+        self.assertEqual(buy.status, "closed")
+        self.assertEqual(buy.price, Decimal("80.00"))
+        self.assertEqual(sell.status, "closed")
+        self.assertEqual(
+            StockHolding.objects.get(team=self.team, stock=self.stock).amount, 9
+        )
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, 100000 - (2 * 80 + 15) + (3 * 80 - 15))
+
+    def test_canceled_orders_are_skipped(self):
+        order = self.create_order("sell", "limit", Decimal("105.00"))
+        match_orders(self.book)
+        Transaction.objects.filter(pk=order.pk).update(status="canceled")
+
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=Decimal("110.00"))
+        self.assertEqual(match_orders(self.book), 0)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "canceled")
+
+    def test_market_orders_are_ignored(self):
+        Transaction.objects.create(
+            team=self.team,
+            stock=self.stock,
+            transaction_type="buy",
+            amount=1,
+            price=Decimal("100.00"),
+        )
+        self.assertEqual(match_orders(self.book), 0)
+        self.assertEqual(len(self.book), 0)
+
+    def test_late_committed_order_with_lower_id_is_found(self):
+        late = self.create_order("buy", "limit", Decimal("90.00"))
+        early = self.create_order("buy", "limit", Decimal("95.00"))
+        # The order with the lower id was not visible yet when the book was refreshed.
+        Transaction.objects.filter(pk=late.pk).update(status="pending-commit")
+        self.book.refresh()
+        Transaction.objects.filter(pk=late.pk).update(status="open")
+        self.book.refresh()
+        self.assertEqual(len(self.book), 2)
+        self.assertEqual(self.book.settled_id, 0)
+
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=Decimal("85.00"))
+        self.assertEqual(match_orders(self.book), 2)
+        early.refresh_from_db()
+        self.assertEqual(early.status, "closed")
+
+    def test_orders_older_than_the_overlap_are_settled(self):
+        order = self.create_order("buy", "limit", Decimal("90.00"))
+        Transaction.objects.filter(pk=order.pk).update(
+            date=timezone.now() - REFRESH_OVERLAP - timedelta(seconds=1)
+        )
+        self.book.refresh()
+        self.book.refresh()
+        self.assertEqual(len(self.book), 1)
+        self.assertEqual(self.book.settled_id, order.pk)
+        self.assertEqual(self.book.known, set())
+
+    def test_failed_orders_are_not_counted(self):
+        self.create_order("sell", "limit", Decimal("105.00"), amount=50)
+        self.create_order("sell", "limit", Decimal("105.00"), amount=1)
+        match_orders(self.book)
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=Decimal("110.00"))
+        self.assertEqual(match_orders(self.book), 1)
+
+    def test_unexpected_error_only_fails_its_order(self):
+        failing = self.create_order("sell", "limit", Decimal("105.00"))
+        other = self.create_order("sell", "limit", Decimal("105.00"))
+        match_orders(self.book)
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=Decimal("110.00"))
+
+        def execute(order):
+            if order.pk == failing.pk:
+                raise IntegrityError("duplicate key")
+            execute_transaction(order)
+
+        with mock.patch("stocks.orders.execute_transaction", side_effect=execute):
+            self.assertEqual(match_orders(self.book), 1)
+        failing.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(failing.status, "error")
+        self.assertEqual(other.status, "closed")
+
+    def test_orders_are_restored_when_the_batch_fails(self):
+        order = self.create_order("sell", "limit", Decimal("105.00"))
+        match_orders(self.book)
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=Decimal("110.00"))
+
+        with mock.patch.object(
+            Stock, "calculate_fee", side_effect=OperationalError("deadlock")
+        ):
+            with self.assertRaises(OperationalError):
+                match_orders(self.book)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "open")
+
+        self.assertEqual(match_orders(self.book), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "closed")
@@ -0,0 +1,68 @@
+import tempfile
+
+import numpy
+import pandas
+from django.test import SimpleTestCase
+
+from stocks.price_store import PriceStore
+
+
+class PriceStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = PriceStore(self.directory.name)
+        self.values = numpy.array(
+            [[1.0, 10.0], [2.0, numpy.nan], [3.0, numpy.nan]], dtype="float64"
+        )
+        self.store.write("5 Days", ["AAA", "BBB"], [100, 200, 300], self.values)
+
+    def test_open_missing_matrix(self):
+        self.assertIsNone(self.store.open("Year"))
+
+    def test_open_is_read_only_memory_map(self):
+        matrix = self.store.open("5 Days")
+        self.assertIsInstance(matrix.values, numpy.memmap)
+        self.assertFalse(matrix.values.flags.writeable)
+        numpy.testing.assert_array_equal(matrix.values, self.values)
+
+    def test_column_lookup(self):
+        matrix = self.store.open("5 Days")
+        self.assertEqual(matrix.column("BBB"), 1)
+        self.assertIsNone(matrix.column("CCC"))
+        numpy.testing.assert_array_equal(matrix.series("AAA"), [1.0, 2.0, 3.0])
+
+    def test_between(self):
+        matrix = self.store.open("5 Days").between(150, 300)
+        numpy.testing.assert_array_equal(matrix.times, [200])
+        numpy.testing.assert_array_equal(matrix.series("AAA"), [2.0])
+        self.assertEqual(len(self.store.open("5 Days").between(start=200)), 2)
+
+    def test_latest_skips_missing_prices(self):
+        numpy.testing.assert_array_equal(
+            self.store.open("5 Days").latest(), [3.0, 10.0]
+        )
+
+    def test_rewrite_replaces_matrix(self):
+        self.store.open("5 Days")
+        self.store.write("5 Days", ["CCC"], [400], [[7.0]])
+        matrix = self.store.open("5 Days")
+        self.assertEqual(matrix.tickers, ["CCC"])
+        numpy.testing.assert_array_equal(matrix.latest(), [7.0])
+
+    def test_write_keeps_one_previous_matrix(self):
+        for price in range(4):
+            self.store.write("5 Days", ["AAA"], [100], [[float(price)]])
+        self.assertEqual(len(list(self.store.directory.glob("5-days-*.npy"))), 2)
+
+    def test_write_rejects_wrong_shape(self):
+        with self.assertRaises(ValueError):
+            self.store.write("Day", ["AAA", "BBB"], [100], [[1.0]])
+
+    def test_write_frame(self):
+        index = pandas.to_datetime(["2024-01-01", "2024-01-02"], utc=True)
+        frame = pandas.DataFrame({"AAA": [1.0, 2.0]}, index=index)
+        self.store.write_frame("Year", frame)
+        matrix = self.store.open("Year")
+        self.assertEqual(matrix.times[0], 1704067200)
+        numpy.testing.assert_array_equal(matrix.series("AAA"), [1.0, 2.0])
@@ -0,0 +1,75 @@
+import os
+import tempfile
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from stocks.models import Stock, StockHolding, Team
+from stocks.price_table import PriceTable, get_price_table
+
+
+class PriceTableTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "prices.bin")
+        self.table = PriceTable(self.path)
+
+    def test_missing_table(self):
+        self.assertIsNone(self.table.version)
+        self.assertEqual(self.table.get_prices([1, 2]), {})
+        self.assertIsNone(self.table.get_price_by_ticker("AAA"))
+
+    def test_publish_and_read(self):
+        self.table.publish(3, [7, 2], ["BBB", "AAA"], [12.5, 100.0])
+        reader = PriceTable(self.path)
+        self.assertEqual(reader.version, 3)
+        self.assertEqual(
+            reader.get_prices([2, 7, 9]), {2: Decimal("100.00"), 7: Decimal("12.50")}
+        )
+        self.assertEqual(reader.get_price_by_ticker("BBB"), Decimal("12.50"))
+
+    def test_reader_maps_new_table_after_publish(self):
+        self.table.publish(1, [1], ["AAA"], [10.0])
+        reader = PriceTable(self.path)
+        self.assertEqual(reader.get_prices([1]), {1: Decimal("10.00")})
+
+        self.table.publish(2, [1, 2], ["AAA", "BBB"], [11.0, 20.0])
+        self.assertEqual(reader.version, 2)
+        self.assertEqual(
+            reader.get_prices([1, 2]), {1: Decimal("11.00"), 2: Decimal("20.00")}
+        )
+
+    def test_stale_table(self):
+        self.table.publish(1, [1], ["AAA"], [10.0])
+        self.assertEqual(PriceTable(self.path, max_age=60).version, 1)
+        stale_reader = PriceTable(self.path, max_age=-1)
+        self.assertIsNone(stale_reader.version)
+        self.assertEqual(stale_reader.get_prices([1]), {})
+
+    def test_empty_table(self):
+        self.table.publish(1, [], [], [])
+        self.assertEqual(self.table.get_prices([1]), {})
+
+
+class PortfolioValueWithPriceTableTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "prices.bin")
+
+        self.team = Team.objects.create(name="Test Team", balance=1000)
+        self.stock = Stock.objects.create(name="Stock", ticker="STK", current_price=100)
+        StockHolding.objects.create(team=self.team, stock=self.stock, amount=10)
+
+    def test_portfolio_value_uses_price_table(self):
+        with override_settings(PRICE_TABLE_PATH=self.path):
+            get_price_table().publish(1, [self.stock.pk], ["STK"], [120.0])
+            with self.assertNumQueries(1):
+                self.assertEqual(self.team.get_portfolio_value(), Decimal("2200.00"))
+
+    def test_portfolio_value_falls_back_to_database(self):
+        with override_settings(PRICE_TABLE_PATH=self.path):
+            self.assertEqual(self.team.get_portfolio_value(), 2000)
+            get_price_table().publish(1, [], [], [])
+            self.assertEqual(self.team.get_portfolio_value(), 2000)
@@ -0,0 +1,126 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from stocks.models import Stock
+from stocks.search import (
+    StockSearchIndex,
+    database_search,
+    get_search_index,
+    normalize,
+    search_stocks,
+)
+from stocks.versions import MARKET_KEY, bump_version
+
+STOCKS = [
+    (1, "NVIDIA Corporation", "NVDA"),
+    (2, "Apple Inc.", "AAPL"),
+    (3, "Applied Materials, Inc.", "AMAT"),
+    (4, "Advanced Micro Devices, Inc.", "AMD"),
+    (5, "Münchener Rück", "MUV2.DE"),
+    (6, "Salesforce, Inc.", "CRM"),
+]
+
+
+class StockSearchIndexTests(TestCase):
+    def setUp(self):
+        self.index = StockSearchIndex(STOCKS)
+
+    def test_normalize(self):
+        self.assertEqual(normalize(" Münchener RÜCK "), "munchener ruck")
+
+    def test_ticker_match_ranks_first(self):
+        self.assertEqual(self.index.search("amd")[0], 4)
+
+    def test_name_prefix(self):
+        self.assertEqual(self.index.search("appl"), [2, 3])
+
+    def test_word_prefix(self):
+        self.assertEqual(self.index.search("micro"), [4])
+
+    def test_substring(self):
+        self.assertEqual(self.index.search("poration"), [1])
+
+    def test_typo(self):
+        self.assertEqual(self.index.search("nvidea"), [1])
+
+    def test_short_queries_are_not_fuzzy(self):
+        self.assertEqual(self.index.search("sap"), [])
+
+    def test_accents(self):
+        self.assertEqual(self.index.search("munchener"), [5])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search("nonexistent"), [])
+        self.assertEqual(self.index.search("  "), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search("a", limit=2)), 2)
+
+
+class GetSearchIndexTests(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(
+            name="NVIDIA Corporation", ticker="NVDA", current_price=100
+        )
+        Stock.objects.create(name="Delisted", ticker="DEL", current_price=0)
+
+    def test_only_stocks_with_price(self):
+        self.assertEqual(get_search_index().search("nvidia"), [self.stock.pk])
+        self.assertEqual(get_search_index().search("delisted"), [])
+
+    @override_settings(STOCK_SEARCH_VERSION_TTL=0)
+    def test_reused_until_market_update(self):
+        index = get_search_index()
+        self.assertIs(get_search_index(), index)
+        bump_version(MARKET_KEY)
+        self.assertIsNot(get_search_index(), index)
+
+    def test_version_checked_once_per_ttl(self):
+        index = get_search_index()
+        bump_version(MARKET_KEY)
+        with self.assertNumQueries(0):
+            self.assertIs(get_search_index(), index)
+        with mock.patch(
+            "stocks.search.time.monotonic",
+            return_value=index.checked_at + settings.STOCK_SEARCH_VERSION_TTL,
+        ):
+            self.assertIsNot(get_search_index(), index)
+
+    def test_rebuilt_after_stock_change(self):
+        get_search_index()
+        self.stock.name = "Nvidia Corp"
+        self.stock.save()
+        self.assertEqual(get_search_index().search("nvidia corp"), [self.stock.pk])
+
+
+class DatabaseSearchTests(TestCase):
+    """The tests run on SQLite, so they cover the `icontains` fallback."""
+
+    def setUp(self):
+        self.amd = Stock.objects.create(
+            name="Advanced Micro Devices, Inc.", ticker="AMD", current_price=100
+        )
+        self.amdocs = Stock.objects.create(
+            name="Amdocs Limited", ticker="DOX", current_price=80
+        )
+        Stock.objects.create(name="Delisted AMD", ticker="DEL", current_price=0)
+
+    def test_exact_ticker_ranks_first(self):
+        self.assertEqual(database_search("amd"), [self.amd.pk, self.amdocs.pk])
+
+    def test_name_substring(self):
+        self.assertEqual(database_search("micro"), [self.amd.pk])
+
+    def test_empty_query(self):
+        self.assertEqual(database_search("  "), [])
+
+    def test_limit(self):
+        self.assertEqual(database_search("amd", limit=1), [self.amd.pk])
+
+    @override_settings(STOCK_SEARCH_BACKEND="database")
+    def test_backend_setting(self):
+        with mock.patch("stocks.search.get_search_index") as get_search_index:
+            self.assertEqual(search_stocks("dox"), [self.amdocs.pk])
+        get_search_index.assert_not_called()
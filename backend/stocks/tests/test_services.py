@@ -125,6 +125,34 @@ class ServiceFunctionTests(TestCase):
         self.assertEqual(stock_holding.amount, 3)
         self.assertEqual(transaction1.errors, "")
 
+    def test_execute_transaction_maintains_cost_basis(self):
+        trades = [("buy", 3, 100), ("buy", 1, 120), ("sell", 2, 150), ("sell", 2, 90)]
+        transactions = []
+        for transaction_type, amount, price in trades:
+            transaction1 = Transaction.objects.create(
+                team=self.team,
+                stock=self.stock,
+                transaction_type=transaction_type,
+                amount=amount,
+                price=price,
+                fee=15,
+            )
+            execute_transaction(transaction1)
+            transactions.append(transaction1)
+
+            stock_holding = StockHolding.objects.get(team=self.team, stock=self.stock)
+            if stock_holding.amount == 2:
+                self.assertEqual(stock_holding.average_cost, Decimal("112.50"))
+                self.assertEqual(stock_holding.total_invested, Decimal("225.00"))
+                self.assertEqual(stock_holding.realized_profit, Decimal("60.00"))
+
+        self.assertEqual(stock_holding.amount, 0)
+        self.assertEqual(stock_holding.total_invested, 0)
+        self.assertEqual(stock_holding.average_cost, 0)
+        self.assertEqual(
+            stock_holding.realized_profit, calculate_stock_profit(transactions)
+        )
+
     def test_execute_transaction_buy_insufficient_funds(self):
         transaction1 = Transaction.objects.create(
             team=self.team,
@@ -168,6 +196,61 @@ class ServiceFunctionTests(TestCase):
         self.assertEqual(transaction1.status, "error")
         self.assertIn("Ungültiger Transaktionstyp.", transaction1.errors)
 
+    def test_execute_transaction_with_stale_team_instances(self):
+        # Two members of one team trading at the same time load the team independently.
+        transactions = [
+            Transaction.objects.create(
+                team=Team.objects.get(pk=self.team.pk),
+                stock=self.stock,
+                transaction_type="buy",
+                amount=1,
+                price=Decimal("100.00"),
+                fee=Decimal("15.00"),
+            )
+            for _ in range(2)
+        ]
+        for transaction1 in transactions:
+            execute_transaction(transaction1)
+
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, 100000 - 2 * (100 + 15))
+        stock_holding = StockHolding.objects.get(team=self.team, stock=self.stock)
+        self.assertEqual(stock_holding.amount, 2)
+
+    def test_execute_transaction_buy_rechecks_balance_in_database(self):
+        transaction1 = Transaction.objects.create(
+            team=self.team,
+            stock=self.stock,
+            transaction_type="buy",
+            amount=600,
+            price=100.00,
+            fee=15.00,
+        )
+        Team.objects.filter(pk=self.team.pk).update(balance=50000)
+        execute_transaction(transaction1)
+        transaction1.refresh_from_db()
+        self.assertEqual(transaction1.status, "error")
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.balance, 50000)
+
+    def test_execute_transaction_sell_rechecks_amount_in_database(self):
+        stock_holding = StockHolding.objects.create(
+            team=self.team, stock=self.stock, amount=5
+        )
+        transaction1 = Transaction.objects.create(
+            team=self.team,
+            stock=self.stock,
+            transaction_type="sell",
+            amount=5,
+            price=100.00,
+            fee=15.00,
+        )
+        StockHolding.objects.filter(pk=stock_holding.pk).update(amount=3)
+        execute_transaction(transaction1)
+        transaction1.refresh_from_db()
+        self.assertEqual(transaction1.status, "error")
+        self.assertIn("Sie besitzen nur 3 Aktien von Test Stock.", transaction1.errors)
+
     def test_transaction_error(self):
         transaction1 = Transaction.objects.create(
             team=self.team,
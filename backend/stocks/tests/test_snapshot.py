@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from stocks.models import Stock, StockHolding, Team, get_portfolio_values
+from stocks.snapshot import MarketSnapshot, get_market_snapshot
+from stocks.versions import MARKET_KEY, bump_version
+
+ROWS = [(3, "SAP", Decimal("180.50")), (1, "AAPL", Decimal("200.10"))]
+
+
+class MarketSnapshotTests(TestCase):
+    def setUp(self):
+        self.snapshot = MarketSnapshot.from_rows(1, ROWS)
+
+    def test_get_prices(self):
+        self.assertEqual(
+            self.snapshot.get_prices([1, 2, 3]),
+            {1: Decimal("200.10"), 3: Decimal("180.50")},
+        )
+
+    def test_get_price_by_ticker(self):
+        self.assertEqual(self.snapshot.get_price_by_ticker("SAP"), Decimal("180.50"))
+        self.assertIsNone(self.snapshot.get_price_by_ticker("MSFT"))
+
+    def test_value(self):
+        self.assertEqual(self.snapshot.value({1: 2, 3: 1}), Decimal("580.70"))
+        self.assertEqual(self.snapshot.value({}), 0)
+
+    def test_value_with_unknown_stock(self):
+        self.assertIsNone(self.snapshot.value({1: 2, 2: 1}))
+
+    def test_immutable(self):
+        with self.assertRaises(ValueError):
+            self.snapshot.prices[0] = 1
+
+    def test_empty(self):
+        self.assertEqual(MarketSnapshot.from_rows(1, []).get_prices([1]), {})
+
+
+class GetMarketSnapshotTests(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(name="Stock", ticker="STK", current_price=100)
+
+    def test_none_before_first_update(self):
+        self.assertIsNone(get_market_snapshot())
+
+    def test_loaded_once_per_version(self):
+        bump_version(MARKET_KEY)
+        snapshot = get_market_snapshot()
+        self.assertEqual(snapshot.get_prices([self.stock.pk]), {self.stock.pk: 100})
+
+        # Only the version is checked.
+        with self.assertNumQueries(1):
+            self.assertIs(get_market_snapshot(), snapshot)
+
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=120)
+        self.assertIs(get_market_snapshot(), snapshot)
+        bump_version(MARKET_KEY)
+        self.assertEqual(
+            get_market_snapshot().get_prices([self.stock.pk]), {self.stock.pk: 120}
+        )
+
+    def test_dropped_when_stock_saved(self):
+        bump_version(MARKET_KEY)
+        snapshot = get_market_snapshot()
+        self.stock.current_price = 110
+        self.stock.save()
+        self.assertIsNot(get_market_snapshot(), snapshot)
+
+
+class PortfolioValuesTests(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(name="Stock", ticker="STK", current_price=100)
+        self.teams = [
+            Team.objects.create(name=f"Team {i}", balance=1000) for i in range(3)
+        ]
+        for amount, team in enumerate(self.teams):
+            StockHolding.objects.create(team=team, stock=self.stock, amount=amount)
+        bump_version(MARKET_KEY)
+        self.snapshot = get_market_snapshot()
+
+    def test_one_query_for_all_teams(self):
+        with self.assertNumQueries(1):
+            values = get_portfolio_values(self.teams, self.snapshot)
+        self.assertEqual([values[team.pk] for team in self.teams], [1000, 1100, 1200])
+
+    def test_prices_of_the_snapshot(self):
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=200)
+        values = get_portfolio_values(self.teams, self.snapshot)
+        self.assertEqual(values[self.teams[2].pk], 1200)
+        self.assertEqual(self.teams[2].get_portfolio_value(self.snapshot), 1200)
+
+    def test_stock_missing_in_snapshot(self):
+        other = Stock.objects.create(name="Other", ticker="OTH", current_price=50)
+        StockHolding.objects.create(team=self.teams[0], stock=other, amount=2)
+        values = get_portfolio_values(self.teams, self.snapshot)
+        self.assertEqual(values[self.teams[0].pk], 1100)
+
+    def test_without_snapshot(self):
+        values = get_portfolio_values(self.teams, None)
+        self.assertEqual(values[self.teams[1].pk], 1100)
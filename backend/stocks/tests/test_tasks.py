@@ -0,0 +1,19 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from stocks import tasks
+from stocks.models import Stock, StockStats
+
+
+class UpdateStockStatsTests(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(name="Stock", ticker="STK", current_price=10)
+
+    def test_failed_download_is_logged(self):
+        with mock.patch.object(
+            tasks.yf, "download", side_effect=ConnectionError("timeout")
+        ), mock.patch("builtins.print") as log:
+            tasks.update_stock_stats([self.stock], [self.stock.ticker])
+        log.assert_called_once_with("Error while downloading stock stats: timeout")
+        self.assertFalse(StockStats.objects.exists())
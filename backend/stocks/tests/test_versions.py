@@ -0,0 +1,27 @@
+from django.test import TestCase
+
+from stocks.models import DataVersion, Stock, Team, Watchlist
+from stocks.versions import MARKET_KEY, bump_version, get_versions, team_key
+
+
+class VersionTests(TestCase):
+    def test_bump_version_creates_counter(self):
+        bump_version(MARKET_KEY)
+        self.assertEqual(DataVersion.objects.get(key=MARKET_KEY).version, 1)
+
+    def test_bump_version_increments_counter(self):
+        bump_version(MARKET_KEY)
+        bump_version(MARKET_KEY)
+        self.assertEqual(get_versions(MARKET_KEY)[MARKET_KEY][0], 2)
+
+    def test_get_versions_unknown_key(self):
+        self.assertEqual(get_versions("unknown"), {"unknown": (0, None)})
+
+    def test_team_changes_bump_team_version(self):
+        team = Team.objects.create(name="Test Team")
+        stock = Stock.objects.create(name="Test Stock", ticker="TST")
+        key = team_key(team.pk)
+        version = get_versions(key)[key][0]
+
+        Watchlist.objects.create(team=team, stock=stock)
+        self.assertGreater(get_versions(key)[key][0], version)
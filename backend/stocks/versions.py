@@ -0,0 +1,45 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from stocks.models import DataVersion
+
+MARKET_KEY = "market"
+
+
+def team_key(team_id):
+    """Returns the version key for everything that belongs to a single team."""
+    return f"team:{team_id}"
+
+
+def bump_version(key):
+    """Increments the version stored under `key`, creating the counter if necessary."""
+    updated = DataVersion.objects.filter(key=key).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(key=key, version=1)
+    except IntegrityError:
+        # Another process created the counter in the meantime.
+        DataVersion.objects.filter(key=key).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+
+
+def get_versions(*keys):
+    """
+    Loads the versions for the given keys with a single query.
+
+    Returns:
+        dict: Maps each key to a `(version, updated_at)` tuple. Unknown keys map to `(0, None)`.
+    """
+    versions = {key: (0, None) for key in keys}
+    for key, version, updated_at in DataVersion.objects.filter(
+        key__in=keys
+    ).values_list("key", "version", "updated_at"):
+        versions[key] = (version, updated_at)
+    return versions